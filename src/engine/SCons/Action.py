@@ -112,6 +112,7 @@ import subprocess
 from SCons.Debug import logInstanceCreation
 import SCons.Errors
 import SCons.Executor
+import SCons.Remote
 import SCons.Util
 import SCons.Subst
 
@@ -799,10 +800,24 @@ class CommandAction(_ActionAction):
             source = executor.get_all_sources()
         cmd_list, ignore, silent = self.process(target, list(map(rfile, source)), env, executor)
 
-        # Use len() to filter out any "command" that's zero-length.
-        for cmd_line in filter(len, cmd_list):
-            # Escape the command line for the interpreter we are using.
-            cmd_line = escape_list(cmd_line, escape)
+        # Use len() to filter out any "command" that's zero-length,
+        # and escape the command lines for the interpreter we are using.
+        cmd_list = [escape_list(c, escape) for c in filter(len, cmd_list)]
+
+        if SCons.Remote.workers and cmd_list:
+            remote = SCons.Remote.execute(cmd_list, ENV, ignore,
+                                          target, source, env)
+            if remote is not None:
+                result, cmd_line = remote
+                if result:
+                    msg = "Error %s" % result
+                    return SCons.Errors.BuildError(errstr=msg,
+                                                   status=result,
+                                                   action=self,
+                                                   command=cmd_line)
+                return 0
+
+        for cmd_line in cmd_list:
             result = spawn(shell, escape, cmd_line[0], cmd_line, ENV)
             if not ignore and result:
                 msg = "Error %s" % result
@@ -116,6 +116,14 @@ class _Null(object):
 
 _null = _Null
 
+# Counts the changes to the source suffixes and source Builders of all
+# Builders, which can show up many src_builder levels away.
+_src_changes = 0
+
+def _src_changed():
+    global _src_changes
+    _src_changes = _src_changes + 1
+
 def match_splitext(path, suffixes = []):
     if suffixes:
         matchsuf = [S for S in suffixes if path[-len(S):] == S]
@@ -401,7 +409,7 @@ class BuilderBase(object):
         self.overrides = overrides
 
         self.set_suffix(suffix)
-        self.set_src_suffix(src_suffix)
+        self._set_src_suffix(src_suffix)
         self.ensure_suffix = ensure_suffix
 
         self.target_factory = target_factory
@@ -653,13 +661,18 @@ class BuilderBase(object):
             suffix = suffix(env, sources)
         return env.subst(suffix)
 
-    def set_src_suffix(self, src_suffix):
+    def _set_src_suffix(self, src_suffix):
         if not src_suffix:
             src_suffix = []
         elif not SCons.Util.is_List(src_suffix):
             src_suffix = [ src_suffix ]
         self.src_suffix = [callable(suf) and suf or self.adjust_suffix(suf) for suf in src_suffix]
 
+    def set_src_suffix(self, src_suffix):
+        self._set_src_suffix(src_suffix)
+        self._memo = {}
+        _src_changed()
+
     def get_src_suffix(self, env):
         """Get the first src_suffix in the list of src_suffixes."""
         ret = self.src_suffixes(env)
@@ -686,6 +699,12 @@ class BuilderBase(object):
         """
         self._memo = {}
         self.src_builder.append(builder)
+        _src_changed()
+
+    def _get_sdict_key(self, env):
+        return env.get_version()
+
+    memoizer_counters.append(SCons.Memoize.CountDict('_get_sdict', _get_sdict_key))
 
     def _get_sdict(self, env):
         """
@@ -694,23 +713,28 @@ class BuilderBase(object):
         should be called first.
 
         This dictionary is used for each target specified, so we save a
-        lot of extra computation by memoizing it for each construction
-        environment.
-
-        Note that this is re-computed each time, not cached, because there
-        might be changes to one of our source Builders (or one of their
-        source Builders, and so on, and so on...) that we can't "see."
-
-        The underlying methods we call cache their computed values,
-        though, so we hope repeatedly aggregating them into a dictionary
-        like this won't be too big a hit.  We may need to look for a
-        better way to do this if performance data show this has turned
-        into a significant bottleneck.
+        lot of extra computation by memoizing it for each version of
+        the construction environment's variables.  There might be changes
+        to one of our source Builders (or one of their source Builders,
+        and so on, and so on...) that we can't "see" from here, so the
+        memoized values get thrown out whenever any Builder's sources
+        change.
         """
+        memo_key = env.get_version()
+        if self._memo.get('_src_changes') != _src_changes:
+            self._memo['_src_changes'] = _src_changes
+            self._memo['_get_sdict'] = {}
+        memo_dict = self._memo['_get_sdict']
+        try:
+            return memo_dict[memo_key]
+        except KeyError:
+            pass
+
         sdict = {}
         for bld in self.get_src_builders(env):
             for suf in bld.src_suffixes(env):
                 sdict[suf] = bld
+        memo_dict[memo_key] = sdict
         return sdict
 
     def src_builder_sources(self, env, source, overwarn={}):
@@ -757,7 +781,7 @@ class BuilderBase(object):
         return env.arg2nodes(result, source_factory)
 
     def _get_src_builders_key(self, env):
-        return id(env)
+        return env.get_version()
 
     memoizer_counters.append(SCons.Memoize.CountDict('get_src_builders', _get_src_builders_key))
 
@@ -769,7 +793,7 @@ class BuilderBase(object):
         strings in the 'BUILDER' variable of the construction
         environment and cache the result.
         """
-        memo_key = id(env)
+        memo_key = env.get_version()
         try:
             memo_dict = self._memo['get_src_builders']
         except KeyError:
@@ -794,7 +818,7 @@ class BuilderBase(object):
         return builders
 
     def _subst_src_suffixes_key(self, env):
-        return id(env)
+        return env.get_version()
 
     memoizer_counters.append(SCons.Memoize.CountDict('subst_src_suffixes', _subst_src_suffixes_key))
 
@@ -802,10 +826,10 @@ class BuilderBase(object):
         """
         The suffix list may contain construction variable expansions,
         so we have to evaluate the individual strings.  To avoid doing
-        this over and over, we memoize the results for each construction
-        environment.
+        this over and over, we memoize the results for each version of
+        the construction environment's variables.
         """
-        memo_key = id(env)
+        memo_key = env.get_version()
         try:
             memo_dict = self._memo['subst_src_suffixes']
         except KeyError:
@@ -830,7 +854,7 @@ class BuilderBase(object):
         src_builder many levels deep that we can't see.)
         """
         sdict = {}
-        suffixes = self.subst_src_suffixes(env)
+        suffixes = self.subst_src_suffixes(env)[:]
         for s in suffixes:
             sdict[s] = 1
         for builder in self.get_src_builders(env):
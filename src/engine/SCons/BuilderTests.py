@@ -71,8 +71,11 @@ scons_env = SCons.Environment.Environment()
 
 env_arg2nodes_called = None
 
+last_version = 0
+
 class Environment(object):
     def __init__(self, **kw):
+        self.changed()
         self.d = {}
         self.d['SHELL'] = scons_env['SHELL']
         self.d['SPAWN'] = scons_env['SPAWN']
@@ -115,8 +118,15 @@ class Environment(object):
         return {}
     def autogenerate(self, dir=''):
         return {}
+    def changed(self):
+        global last_version
+        last_version = last_version + 1
+        self.version = last_version
+    def get_version(self):
+        return self.version
     def __setitem__(self, item, var):
         self.d[item] = var
+        self.changed()
     def __getitem__(self, item):
         return self.d[item]
     def __contains__(self, item):
@@ -134,6 +144,7 @@ class Environment(object):
         return env
     def _update(self, dict):
         self.d.update(dict)
+        self.changed()
     def items(self):
         return list(self.d.items())
     def sig_dict(self):
@@ -839,6 +850,34 @@ class BuilderTestCase(unittest.TestCase):
         s = list(map(str, tgt.sources[0].sources[0].sources))
         assert s == ['test.i'], s
 
+    def test_get_sdict(self):
+        """Test memoizing the source suffixes of src_builders"""
+        env = Environment(BAR = '.bar')
+        builder1 = SCons.Builder.Builder(action='foo',
+                                         src_suffix='$BAR',
+                                         suffix='.foo')
+        builder2 = SCons.Builder.Builder(action='foo',
+                                         src_builder = builder1,
+                                         src_suffix = '.foo')
+        sdict = builder2._get_sdict(env)
+        assert sdict == {'.bar' : builder1}, sdict
+        assert builder2._get_sdict(env) is sdict
+
+        env['BAR'] = '.baz'
+        sdict = builder2._get_sdict(env)
+        assert sdict == {'.baz' : builder1}, sdict
+
+        # Changes to the Builders get noticed, too.
+        builder0 = SCons.Builder.Builder(action='foo',
+                                         src_suffix='.zzz',
+                                         suffix='.baz')
+        builder1.add_src_builder(builder0)
+        sdict = builder2._get_sdict(env)
+        assert sdict == {'.baz' : builder1, '.zzz' : builder1}, sdict
+        builder0.set_src_suffix('.yyy')
+        sdict = builder2._get_sdict(env)
+        assert sdict == {'.baz' : builder1, '.yyy' : builder1}, sdict
+
     def test_target_scanner(self):
         """Testing ability to set target and source scanners through a builder."""
         global instanced
@@ -25,105 +25,833 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 __doc__ = """
 CacheDir support
+
+A CacheDir() with a max_size is managed:  every file pushed to or
+retrieved from it is recorded (with its size and the time) in a
+journal in the cache directory, and once enough has been pushed since
+the last time, a background thread folds the journal into the cache's
+index and removes the least recently used files until the cache fits
+in max_size again.  Only one process at a time (the one holding the
+index's lock file) does this, so any number of builds can share the
+cache.  If there's no index yet, it's rebuilt from the files in the
+cache, using their access times.
+
+A CacheDir() with mode='link' tries not to copy files at all:  it
+makes a reflink (a copy-on-write clone) where the file system supports
+them, then a hard link, and only then falls back to copying.  What
+works is remembered for each pair of file systems.  Files are only
+hard linked out of the cache, not into it.  Files in such a cache are
+read-only, so that a hard-linked target can't be changed in place
+behind the cache's back.
+
+A CacheDir() with a compress format stores every file compressed (with
+the format's suffix added to its name, so compressed and uncompressed
+caches can share a directory), compressing and decompressing as the
+file is streamed into and out of the cache.
+
+As soon as a target's task is ready to execute (and so its build
+signature is known), a small pool of lookup threads starts looking for
+the target's file in the cache, which saves waiting on a slow network
+file system in the middle of the task.  A CacheDir() remembers what it
+found until the target is retrieved or pushed.
+
+A TieredCacheDir, for a CacheDir() given a list of directories, puts a
+fast cache (on a local disk, say) in front of slower ones (shared over
+the network).  Files come from the first tier that has them and are
+copied into the faster tiers, and are pushed to the first tier at once
+and to the slower ones in the background, which the main script waits
+for at the end of the build.
+
+A CacheDir() given an http:// URL is an HTTPCacheDir (see the
+SCons.HTTPCache module), which overrides the methods that look for,
+fetch and store files.  Files are pushed to it in the background, too.
 """
 
+import SCons.compat
+
+import errno
 import os.path
+# compat layer imports "cPickle" for us if it's available.
+import pickle
+import shutil
 import stat
 import sys
+import time
 
 import SCons.Action
+import SCons.Errors
+import SCons.Util
+import SCons.Warnings
 
 cache_enabled = True
 cache_debug = False
 cache_force = False
 cache_show = False
 
-def CacheRetrieveFunc(target, source, env):
-    t = target[0]
-    fs = t.fs
-    cd = env.get_CacheDir()
-    cachedir, cachefile = cd.cachepath(t)
-    if not fs.exists(cachefile):
-        cd.CacheDebug('CacheRetrieve(%s):  %s not in cache\n', t, cachefile)
-        return 1
-    cd.CacheDebug('CacheRetrieve(%s):  retrieving from %s\n', t, cachefile)
-    if SCons.Action.execute_actions:
-        if fs.islink(cachefile):
-            fs.symlink(fs.readlink(cachefile), t.path)
+# Statistics for --cache-stats, for all of the CacheDirs a build uses.
+stats = {
+    'hits'            : 0,
+    'misses'          : 0,
+    'pushes'          : 0,
+    'bytes_retrieved' : 0,
+    'bytes_pushed'    : 0,
+    'evictions'       : 0,
+    'bytes_evicted'   : 0,
+}
+
+try:
+    import threading
+except ImportError:
+    threading = None
+    _stats_lock = None
+else:
+    _stats_lock = threading.Lock()
+
+class _NoThreadsCondition(object):
+    # Stands in for the condition variable guarding a CacheDir's
+    # lookups when there's no threading module (and so no lookups
+    # going on in the background).
+    def acquire(self):
+        pass
+    def release(self):
+        pass
+    def notifyAll(self):
+        pass
+
+def count(name, n=1):
+    if _stats_lock:
+        _stats_lock.acquire()
+    try:
+        stats[name] = stats[name] + n
+    finally:
+        if _stats_lock:
+            _stats_lock.release()
+
+_size_suffixes = {
+    'K' : 1024,
+    'M' : 1024*1024,
+    'G' : 1024*1024*1024,
+    'T' : 1024*1024*1024*1024,
+}
+
+def parse_size(size):
+    """Returns the number of bytes in a size given as a number or a
+    string like "500M" or "10G"."""
+    value = size
+    if SCons.Util.is_String(value):
+        value = value.strip().upper()
+        if value.endswith('B'):
+            value = value[:-1]
+        multiplier = 1
+        if value[-1:] in _size_suffixes:
+            multiplier = _size_suffixes[value[-1]]
+            value = value[:-1]
+        try:
+            value = int(float(value) * multiplier)
+        except ValueError:
+            value = -1
+    if value < 0:
+        raise SCons.Errors.UserError("Invalid CacheDir size: %s" % repr(size))
+    return value
+
+Valid_modes = ['copy', 'link']
+
+def parse_mode(mode):
+    """Returns the CacheDir mode for mode, which may be None for the
+    default."""
+    if mode is None:
+        return 'copy'
+    if not mode in Valid_modes:
+        raise SCons.Errors.UserError("Invalid CacheDir mode: %s" % repr(mode))
+    return mode
+
+# The ways a CacheDir() with mode='link' tries to get a file into or
+# out of the cache, best first, and a dictionary mapping a (source
+# device, destination device) pair to the index in link_methods of
+# the first one that works between them.
+link_methods = ['reflink', 'hardlink', 'copy']
+link_method_index = {}
+
+# The Linux ioctl() request that makes a file a copy-on-write clone
+# of another one (on btrfs, XFS and the like).
+FICLONE = 0x40049409
+
+# The errors that mean a reflink or hard link isn't possible between
+# two places, as opposed to something being wrong with the file.
+_unsupported_errnos = []
+for name in ['EXDEV', 'EOPNOTSUPP', 'ENOTSUP', 'ENOTTY', 'EINVAL',
+             'ENOSYS', 'EPERM', 'EACCES', 'EMLINK']:
+    try:
+        _unsupported_errnos.append(getattr(errno, name))
+    except AttributeError:
+        pass
+
+def reflink(src, dst):
+    """Makes dst a copy-on-write clone of src, with the same times
+    and permissions."""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EINVAL, "reflinks are not supported", dst)
+    fsrc = open(src, 'rb')
+    try:
+        fdst = open(dst, 'wb')
+        try:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            finally:
+                fdst.close()
+        except EnvironmentError:
+            os.unlink(dst)
+            raise
+    finally:
+        fsrc.close()
+    shutil.copystat(src, dst)
+
+def _device(fs, path):
+    return fs.stat(os.path.dirname(os.path.abspath(path)))[stat.ST_DEV]
+
+def link_file(fs, src, dst, copy, hardlink=1):
+    """
+    Gets file src to dst (which is replaced if it exists) by the best
+    method that works between their file systems, calling copy(src, dst)
+    if nothing better does.  Without hardlink, src and dst always end
+    up as separate files.  Returns the name of the method used.
+    """
+    key = (_device(fs, src), _device(fs, dst))
+    for i in range(link_method_index.get(key, 0), len(link_methods)):
+        method = link_methods[i]
+        if method == 'hardlink' and not hardlink:
+            continue
+        try:
+            if method == 'reflink':
+                reflink(src, dst)
+            elif method == 'hardlink':
+                if fs.exists(dst) or fs.islink(dst):
+                    fs.unlink(dst)
+                fs.link(src, dst)
+            else:
+                copy(src, dst)
+        except EnvironmentError, e:
+            if method == 'copy' or not e.errno in _unsupported_errnos:
+                raise
+            link_method_index[key] = i + 1
         else:
-            env.copy_from_cache(cachefile, t.path)
-        st = fs.stat(cachefile)
-        fs.chmod(t.path, stat.S_IMODE(st[stat.ST_MODE]) | stat.S_IWRITE)
-    return 0
+            return method
+
+def _open_gzip(path, mode):
+    import gzip
+    return gzip.GzipFile(path, mode, 6)
+
+def _open_bz2(path, mode):
+    import bz2
+    return bz2.BZ2File(path, mode)
+
+def _open_lzma(path, mode):
+    import lzma
+    return lzma.LZMAFile(path, mode)
+
+# The compress formats for a CacheDir():  the suffix of the cached
+# files, the module that has to be available, and the function that
+# opens a compressed file.
+compress_formats = {
+    'gzip' : ('.gz',  'zlib', _open_gzip),
+    'bz2'  : ('.bz2', 'bz2',  _open_bz2),
+    'lzma' : ('.xz',  'lzma', _open_lzma),
+}
+
+def parse_compress(compress):
+    """Checks a CacheDir compress format, which may be None for no
+    compression."""
+    if compress is None:
+        return None
+    try:
+        module = compress_formats[compress][1]
+    except (KeyError, TypeError):
+        raise SCons.Errors.UserError("Invalid CacheDir compress format: %s"
+                                     % repr(compress))
+    try:
+        __import__(module)
+    except ImportError:
+        raise SCons.Errors.UserError("CacheDir compress format %s needs the %s module, which is not available"
+                                     % (repr(compress), module))
+    return compress
+
+def _stream(fsrc, fdst, dst):
+    try:
+        try:
+            shutil.copyfileobj(fsrc, fdst, 65536)
+        finally:
+            fdst.close()
+    except:
+        # Whatever went wrong (including httplib's errors, which aren't
+        # EnvironmentErrors), don't leave half a file behind.  (A
+        # download that just stops short is caught by the caller.)
+        exc_info = sys.exc_info()
+        try:
+            os.unlink(dst)
+        except EnvironmentError:
+            pass
+        raise exc_info[0], exc_info[1], exc_info[2]
+
+def compress_file(src, dst, compress):
+    """Writes file src, compressed, to dst."""
+    fsrc = open(src, 'rb')
+    try:
+        _stream(fsrc, compress_formats[compress][2](dst, 'wb'), dst)
+    finally:
+        fsrc.close()
+
+def decompress_file(src, dst, compress):
+    """Writes the decompressed contents of file src to dst."""
+    fsrc = compress_formats[compress][2](src, 'rb')
+    try:
+        _stream(fsrc, open(dst, 'wb'), dst)
+    finally:
+        fsrc.close()
+
+def cachefile_path(path, sig):
+    """Returns the (directory, file) names of the file with signature
+    sig in the cache directory path."""
+    dir = os.path.join(path, sig[0].upper())
+    return dir, os.path.join(dir, sig)
+
+def CacheRetrieveFunc(target, source, env):
+    tiers = env.get_CacheDir().get_tiers()
+    for i in range(len(tiers)):
+        if tiers[i].retrieve_file(target, env) == 0:
+            if SCons.Action.execute_actions:
+                # Keep a copy in the faster tiers for next time.
+                for faster in tiers[:i]:
+                    faster.push_file(target)
+            return 0
+    return 1
 
 def CacheRetrieveString(target, source, env):
     t = target[0]
     fs = t.fs
-    cd = env.get_CacheDir()
-    cachedir, cachefile = cd.cachepath(t)
-    if t.fs.exists(cachefile):
-        return "Retrieved `%s' from cache" % t.path
+    for cd in env.get_CacheDir().get_tiers():
+        cachedir, cachefile = cd.cachepath(t)
+        if cd.lookup(fs, cachefile):
+            return "Retrieved `%s' from cache" % t.path
     return None
 
 CacheRetrieve = SCons.Action.Action(CacheRetrieveFunc, CacheRetrieveString)
 
 CacheRetrieveSilent = SCons.Action.Action(CacheRetrieveFunc, None)
 
-def CachePushFunc(target, source, env):
-    t = target[0]
-    if t.nocache:
+class Pusher(object):
+    """
+    Pushes files to the slower tiers of a TieredCacheDir (and to remote
+    caches) in background threads, so that tasks don't wait on a shared
+    network cache.
+    """
+    def __init__(self, num):
+        import queue
+        self.requests = queue.Queue(0)
+        self.cv = threading.Condition(threading.Lock())
+        self.pending = 0
+        self.threads = []
+        for i in range(num):
+            t = threading.Thread(target=self.run)
+            t.setDaemon(1)
+            t.start()
+            self.threads.append(t)
+
+    def put(self, cd, target):
+        self.cv.acquire()
+        try:
+            self.pending = self.pending + 1
+        finally:
+            self.cv.release()
+        self.requests.put((cd, target))
+
+    def run(self):
+        while True:
+            cd, target = self.requests.get()
+            if cd is None:
+                break
+            try:
+                try:
+                    cd.push_file(target)
+                except Exception, e:
+                    # There's no task left to fail, and the build is
+                    # still correct without the file in this tier.
+                    SCons.Warnings.warn(SCons.Warnings.CacheWriteErrorWarning,
+                                        str(e))
+            finally:
+                self.cv.acquire()
+                try:
+                    self.pending = self.pending - 1
+                    if not self.pending:
+                        self.cv.notifyAll()
+                finally:
+                    self.cv.release()
+
+    def wait(self):
+        """Waits until every file put so far has been pushed."""
+        self.cv.acquire()
+        try:
+            while self.pending:
+                self.cv.wait()
+        finally:
+            self.cv.release()
+
+    def stop(self):
+        """Shuts down the worker threads, once every file put so far
+        has been pushed."""
+        for t in self.threads:
+            self.requests.put((None, None))
+        for t in self.threads:
+            t.join()
+        self.threads = []
+
+# The number of threads pushing files to slower tiers, and the
+# Pusher, once there's something for it to do.
+push_threads = 2
+pusher = None
+
+def push_later(cd, target):
+    """Pushes target[0] to the cache directory cd in the background."""
+    global pusher
+    if not threading or push_threads < 1:
+        cd.push_file(target)
         return
-    fs = t.fs
-    cd = env.get_CacheDir()
-    cachedir, cachefile = cd.cachepath(t)
-    if fs.exists(cachefile):
-        # Don't bother copying it if it's already there.  Note that
-        # usually this "shouldn't happen" because if the file already
-        # existed in cache, we'd have retrieved the file from there,
-        # not built it.  This can happen, though, in a race, if some
-        # other person running the same build pushes their copy to
-        # the cache after we decide we need to build it but before our
-        # build completes.
-        cd.CacheDebug('CachePush(%s):  %s already exists in cache\n', t, cachefile)
+    if pusher is None:
+        pusher = Pusher(push_threads)
+    pusher.put(cd, target)
+
+def wait_for_pushes():
+    """Waits for the background pushes to finish, and shuts down the
+    threads doing them, so that they aren't left blocked on the queue
+    when the interpreter exits."""
+    global pusher
+    if pusher is not None:
+        pusher.wait()
+        pusher.stop()
+        pusher = None
+
+def CachePushFunc(target, source, env):
+    if target[0].nocache:
         return
+    tiers = env.get_CacheDir().get_tiers()
+    if tiers[0].remote:
+        # Don't hold up the task while the file is uploaded.
+        push_later(tiers[0], target)
+    else:
+        tiers[0].push_file(target)
+    for cd in tiers[1:]:
+        push_later(cd, target)
+
+CachePush = SCons.Action.Action(CachePushFunc, None)
 
-    cd.CacheDebug('CachePush(%s):  pushing to %s\n', t, cachefile)
+index_name = 'index'
+journal_name = 'journal'
+lock_name = 'index.lock'
 
-    tempfile = cachefile+'.tmp'+str(os.getpid())
-    errfmt = "Unable to copy %s to cache. Cache file is %s"
+# Start evicting files in the background whenever this fraction of a
+# managed cache's max_size has been pushed since the last time, and
+# stop once the cache is down to evict_to_ratio of its max_size (so
+# that we don't have to evict again right after the next push).
+evict_after_ratio = 0.1
+evict_to_ratio = 0.9
+
+# A lock file older than this (in seconds) was left behind by a build
+# that died while evicting.  A build that's evicting touches its lock
+# file every lock_refresh seconds, so that it never gets that old.
+lock_timeout = 600
+lock_refresh = 60
+
+# How long (in seconds) a finished build waits for an eviction still
+# in progress before asking it to stop after the file it's removing.
+# The next build that uses the cache carries on where it left off.
+evict_exit_wait = 2
+
+class CacheIndex(object):
+    """
+    The index of a managed cache directory:  a pickled dictionary,
+    mapping the signature of every file in the cache to its size and
+    when it was last pushed or retrieved.
+
+    Builds append a line to the journal for every file they push or
+    retrieve, instead of updating the index themselves, so they never
+    wait on each other.  Whoever holds the lock file folds the journal
+    into the index while evicting.
+    """
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self.index_file = os.path.join(path, index_name)
+        self.journal_file = os.path.join(path, journal_name)
+        self.lock_file = os.path.join(path, lock_name)
+        self.pushed = 0
+        self.thread = None
+        self.evicting = False
+        self.again = False
+        self.stopping = False
+        self.locked_at = None
+        if threading is not None:
+            self.thread_lock = threading.Lock()
+        # What the cache held after the last eviction we did.
+        self.size = None
+        self.entries = None
 
-    if not fs.isdir(cachedir):
+    def record(self, sig, size, pushed):
+        """Records that a file was pushed to or retrieved from the
+        cache, and starts evicting files if it's time to."""
+        line = '%s %d %d\n' % (sig, size, int(time.time()))
         try:
-            fs.makedirs(cachedir)
+            fd = os.open(self.journal_file,
+                         os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0666)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
         except EnvironmentError:
-            # We may have received an exception because another process
-            # has beaten us creating the directory.
-            if not fs.isdir(cachedir):
-                msg = errfmt % (str(target), cachefile)
-                raise SCons.Errors.EnvironmentError(msg)
+            # The cache still works; this file just won't be evicted
+            # in LRU order.
+            pass
+        if pushed:
+            self.pushed = self.pushed + size
+            if self.pushed >= self.max_size * evict_after_ratio:
+                self.pushed = 0
+                self.start_eviction()
 
-    try:
-        if fs.islink(t.path):
-            fs.symlink(fs.readlink(t.path), tempfile)
-        else:
-            fs.copy2(t.path, tempfile)
-        fs.rename(tempfile, cachefile)
-        st = fs.stat(t.path)
-        fs.chmod(cachefile, stat.S_IMODE(st[stat.ST_MODE]) | stat.S_IWRITE)
-    except EnvironmentError:
-        # It's possible someone else tried writing the file at the
-        # same time we did, or else that there was some problem like
-        # the CacheDir being on a separate file system that's full.
-        # In any case, inability to push a file to cache doesn't affect
-        # the correctness of the build, so just print a warning.
-        msg = errfmt % (str(target), cachefile)
-        SCons.Warnings.warn(SCons.Warnings.CacheWriteErrorWarning, msg)
+    def start_eviction(self):
+        """Evicts files in a background thread, if we aren't already.
+        The thread is a daemon, so a build never waits on it for
+        longer than stop() allows."""
+        if threading is None:
+            self.evict()
+            return
+        self.thread_lock.acquire()
+        try:
+            if self.evicting:
+                # Go around again once it's done, to take in what's
+                # been pushed since it started.
+                self.again = True
+                return
+            self.evicting = True
+            self.again = False
+            self.stopping = False
+        finally:
+            self.thread_lock.release()
+        self.thread = threading.Thread(target=self.keep_evicting)
+        self.thread.setDaemon(1)
+        self.thread.start()
 
-CachePush = SCons.Action.Action(CachePushFunc, None)
+    def keep_evicting(self):
+        again = True
+        try:
+            while again:
+                self.evict()
+                self.thread_lock.acquire()
+                try:
+                    again = self.again and not self.stopping
+                    self.again = False
+                    self.evicting = again
+                finally:
+                    self.thread_lock.release()
+        finally:
+            if again:
+                # evict() raised an exception.
+                self.evicting = False
+
+    def wait(self):
+        """Waits for any eviction in progress to finish."""
+        if self.thread is not None:
+            self.thread.join()
+
+    def stop(self, timeout):
+        """Gives any eviction in progress timeout seconds to finish,
+        then has it stop after the file it's removing and waits for
+        it to let go of the lock file."""
+        if self.thread is None:
+            return
+        self.thread.join(timeout)
+        self.stopping = True
+        self.thread.join()
+
+    def lock(self):
+        try:
+            fd = os.open(self.lock_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0666)
+        except EnvironmentError:
+            try:
+                age = time.time() - os.stat(self.lock_file)[stat.ST_MTIME]
+            except EnvironmentError:
+                return False
+            if age < lock_timeout:
+                # Someone else is evicting.
+                return False
+            try:
+                os.unlink(self.lock_file)
+                fd = os.open(self.lock_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0666)
+            except EnvironmentError:
+                return False
+        os.write(fd, '%d\n' % os.getpid())
+        os.close(fd)
+        self.locked_at = time.time()
+        return True
+
+    def refresh_lock(self):
+        """Touches the lock file if it's been a while, so that other
+        builds don't take it for one left behind."""
+        now = time.time()
+        if self.locked_at is None or now - self.locked_at < lock_refresh:
+            return
+        try:
+            os.utime(self.lock_file, None)
+        except EnvironmentError:
+            pass
+        self.locked_at = now
+
+    def unlock(self):
+        self.locked_at = None
+        try:
+            os.unlink(self.lock_file)
+        except EnvironmentError:
+            pass
+
+    def read_index(self):
+        try:
+            f = open(self.index_file, 'rb')
+        except EnvironmentError:
+            return None
+        try:
+            try:
+                return pickle.load(f)
+            except Exception:
+                return None
+        finally:
+            f.close()
+
+    def write_index(self, entries):
+        tmp = self.index_file + '.tmp' + str(os.getpid())
+        f = open(tmp, 'wb')
+        try:
+            pickle.dump(entries, f, 1)
+        finally:
+            f.close()
+        os.rename(tmp, self.index_file)
+
+    def scan(self):
+        """Rebuilds the index from the files in the cache, taking
+        their access times as the last time they were used."""
+        entries = {}
+        try:
+            subdirs = os.listdir(self.path)
+        except EnvironmentError:
+            return entries
+        for subdir in subdirs:
+            dir = os.path.join(self.path, subdir)
+            if len(subdir) != 1 or not os.path.isdir(dir):
+                continue
+            self.refresh_lock()
+            for sig in os.listdir(dir):
+                if '.tmp' in sig:
+                    continue
+                try:
+                    st = os.lstat(os.path.join(dir, sig))
+                except EnvironmentError:
+                    continue
+                used = max(st[stat.ST_ATIME], st[stat.ST_MTIME])
+                entries[sig] = (st[stat.ST_SIZE], used)
+        return entries
+
+    def read_journal(self, journal, entries):
+        """Folds the lines of one journal file into the index entries."""
+        try:
+            f = open(journal, 'r')
+            try:
+                lines = f.readlines()
+            finally:
+                f.close()
+        except EnvironmentError:
+            return False
+        for line in lines:
+            try:
+                sig, size, used = line.split()
+                size = int(size)
+                used = int(used)
+            except ValueError:
+                # A line cut short by a build that died.
+                continue
+            try:
+                old = entries[sig][1]
+            except KeyError:
+                old = 0
+            entries[sig] = (size, max(old, used))
+        return True
+
+    def read_journals(self, entries):
+        """Folds the journal (and any left behind by a build that died
+        while evicting) into the index entries."""
+        mine = self.journal_file + '.' + str(os.getpid())
+        try:
+            os.rename(self.journal_file, mine)
+        except EnvironmentError:
+            pass
+        prefix = journal_name + '.'
+        for name in os.listdir(self.path):
+            if not name.startswith(prefix):
+                continue
+            journal = os.path.join(self.path, name)
+            if not self.read_journal(journal, entries):
+                continue
+            try:
+                os.unlink(journal)
+            except EnvironmentError:
+                pass
+
+    def usage(self):
+        """Returns the total size and number of the files in the cache,
+        going by the index and the journals not yet folded into it.
+        This doesn't take the lock or change anything, so the files
+        evicted by an eviction in progress may still be counted."""
+        entries = self.read_index()
+        if entries is None:
+            entries = self.scan()
+        prefix = journal_name + '.'
+        for name in sorted(os.listdir(self.path)):
+            if name == journal_name or name.startswith(prefix):
+                self.read_journal(os.path.join(self.path, name), entries)
+        total = 0
+        for size, used in entries.values():
+            total = total + size
+        return total, len(entries)
+
+    def evict(self):
+        """Brings the index up to date and removes the least recently
+        used files until the cache fits in max_size.  Does nothing if
+        another build is already at it."""
+        if not self.lock():
+            return
+        try:
+            entries = self.read_index()
+            if entries is None:
+                entries = self.scan()
+            self.read_journals(entries)
+            total = 0
+            for size, used in entries.values():
+                total = total + size
+            if total > self.max_size:
+                goal = self.max_size * evict_to_ratio
+                lru = sorted([(used, sig) for sig, (size, used) in entries.items()])
+                for used, sig in lru:
+                    if total <= goal or self.stopping:
+                        break
+                    self.refresh_lock()
+                    size = entries[sig][0]
+                    cachefile = cachefile_path(self.path, sig)[1]
+                    try:
+                        os.unlink(cachefile)
+                    except EnvironmentError:
+                        if os.path.exists(cachefile):
+                            continue
+                    else:
+                        count('evictions')
+                        count('bytes_evicted', size)
+                    del entries[sig]
+                    total = total - size
+            self.write_index(entries)
+            self.size = total
+            self.entries = len(entries)
+        finally:
+            self.unlock()
+
+# The indexes of the managed caches we've used, by path, so that all
+# of the CacheDir objects for the same directory share one.
+indexes = {}
+
+# The number of threads looking for files in caches ahead of the tasks
+# that retrieve them (see CacheDir.prefetch()), and the queue of
+# (CacheDir, fs, cachefile) requests they take their work from.
+lookup_threads = 4
+_lookup_requests = None
+_lookup_workers = []
+
+def _lookup_worker(requests):
+    while True:
+        cd, fs, cachefile = requests.get()
+        if cd is None:
+            break
+        try:
+            exists = cd.exists(fs, cachefile)
+        except Exception:
+            # Leave it to the task to look for itself (and report
+            # whatever went wrong).
+            exists = None
+        cd.looked_up(cachefile, exists)
+
+def lookup_requests():
+    """Returns the queue of requests for the lookup threads, starting
+    the threads the first time."""
+    global _lookup_requests
+    if _lookup_requests is None:
+        import queue
+        _lookup_requests = queue.Queue(0)
+        for i in range(lookup_threads):
+            t = threading.Thread(target=_lookup_worker,
+                                 args=(_lookup_requests,))
+            t.setDaemon(1)
+            t.start()
+            _lookup_workers.append(t)
+    return _lookup_requests
+
+def stop_lookups():
+    """Shuts down the lookup threads at the end of a build, so that
+    they aren't left blocked on the queue when the interpreter exits."""
+    global _lookup_requests
+    if _lookup_requests is None:
+        return
+    for t in _lookup_workers:
+        _lookup_requests.put((None, None, None))
+    for t in _lookup_workers:
+        t.join()
+    del _lookup_workers[:]
+    _lookup_requests = None
+
+def stop_evictions():
+    """Stops the evictions still in progress at the end of a build,
+    after giving them evict_exit_wait seconds to finish."""
+    for index in indexes.values():
+        index.stop(evict_exit_wait)
+
+def stats_report():
+    """Returns the lines of the --cache-stats report."""
+    requests = stats['hits'] + stats['misses']
+    if requests:
+        hit_rate = 100.0 * stats['hits'] / requests
+    else:
+        hit_rate = 0.0
+    lines = [
+        "CacheDir statistics:",
+        "  Requests:         %d" % requests,
+        "  Hits:             %d (%.1f%%)" % (stats['hits'], hit_rate),
+        "  Misses:           %d" % stats['misses'],
+        "  Bytes retrieved:  %d" % stats['bytes_retrieved'],
+        "  Files pushed:     %d" % stats['pushes'],
+        "  Bytes pushed:     %d" % stats['bytes_pushed'],
+        "  Files evicted:    %d" % stats['evictions'],
+        "  Bytes evicted:    %d" % stats['bytes_evicted'],
+    ]
+    paths = sorted(indexes.keys())
+    for path in paths:
+        index = indexes[path]
+        try:
+            size, files = index.usage()
+        except EnvironmentError:
+            continue
+        lines.append("  %s:  %d bytes in %d files (max_size %d)"
+                     % (path, size, files, index.max_size))
+    return lines
 
 class CacheDir(object):
 
-    def __init__(self, path):
+    # Whether the cache is on a server, rather than in a directory.
+    remote = False
+
+    def __init__(self, path, max_size=None, mode=None, compress=None):
         try:
             import hashlib
         except ImportError:
@@ -132,6 +860,23 @@ class CacheDir(object):
             self.path = None
         else:
             self.path = path
+            # Files cached under other hash formats go in their own
+            # subdirectory, so signatures can never be confused.
+            if path is not None and SCons.Util.hash_format_suffix():
+                self.path = os.path.join(path, SCons.Util.hash_format)
+        if max_size is not None:
+            max_size = parse_size(max_size)
+        self.max_size = max_size
+        self.mode = parse_mode(mode)
+        self.compress = parse_compress(compress)
+        self.index = None
+        # Whether the cache files we've looked for exist, or _pending
+        # while a lookup thread is still looking.
+        self.lookups = {}
+        if threading:
+            self.lookups_cv = threading.Condition(threading.Lock())
+        else:
+            self.lookups_cv = _NoThreadsCondition()
         self.current_cache_debug = None
         self.debugFP = None
 
@@ -157,9 +902,241 @@ class CacheDir(object):
             return None, None
 
         sig = node.get_cachedir_bsig()
-        subdir = sig[0].upper()
-        dir = os.path.join(self.path, subdir)
-        return dir, os.path.join(dir, sig)
+        if self.compress:
+            sig = sig + compress_formats[self.compress][0]
+        return cachefile_path(self.path, sig)
+
+    def exists(self, fs, cachefile):
+        """Returns whether cachefile is in the cache."""
+        return fs.exists(cachefile)
+
+    _pending = 'pending'
+
+    def prefetch(self, node):
+        """
+        Starts looking for the node's file in the cache in one of the
+        lookup threads, so that the answer is (more likely to be) ready
+        by the time the node's task goes to retrieve it.  This is only
+        called from the main thread, once the node's build signature
+        is known.
+        """
+        if not self.is_enabled() or not threading or lookup_threads < 1:
+            return
+        cachefile = self.cachepath(node)[1]
+        self.lookups_cv.acquire()
+        try:
+            if cachefile in self.lookups:
+                return
+            self.lookups[cachefile] = self._pending
+        finally:
+            self.lookups_cv.release()
+        lookup_requests().put((self, node.fs, cachefile))
+
+    def looked_up(self, cachefile, exists):
+        self.lookups_cv.acquire()
+        try:
+            self.lookups[cachefile] = exists
+            self.lookups_cv.notifyAll()
+        finally:
+            self.lookups_cv.release()
+
+    def lookup(self, fs, cachefile, forget=0):
+        """
+        Returns whether cachefile exists, waiting for a lookup thread
+        that's looking for it, or remembering what we find ourselves
+        for the next time we're asked.  With forget, the next lookup
+        looks again.
+        """
+        self.lookups_cv.acquire()
+        try:
+            while self.lookups.get(cachefile) is self._pending:
+                self.lookups_cv.wait()
+            try:
+                exists = self.lookups[cachefile]
+            except KeyError:
+                exists = None
+            if forget:
+                self.lookups.pop(cachefile, None)
+        finally:
+            self.lookups_cv.release()
+        if exists is None:
+            exists = self.exists(fs, cachefile)
+            if not forget:
+                self.looked_up(cachefile, exists)
+        return exists
+
+    def forget(self, cachefile):
+        """Forgets whether cachefile exists, once a lookup thread is
+        done looking for it."""
+        self.lookups_cv.acquire()
+        try:
+            while self.lookups.get(cachefile) is self._pending:
+                self.lookups_cv.wait()
+            self.lookups.pop(cachefile, None)
+        finally:
+            self.lookups_cv.release()
+
+    def get_tiers(self):
+        """Returns the cache directories files are retrieved from and
+        pushed to, fastest first."""
+        return [self]
+
+    def get_index(self):
+        """Returns the index of a managed cache, or None."""
+        if self.index is None and self.max_size is not None:
+            path = os.path.abspath(self.path)
+            try:
+                self.index = indexes[path]
+            except KeyError:
+                self.index = CacheIndex(path, self.max_size)
+                indexes[path] = self.index
+                # Get the cache under max_size before we add to it.
+                self.index.start_eviction()
+        return self.index
+
+    def record(self, cachefile, size, stat_name):
+        """Counts the bytes of a file pushed to or retrieved from the
+        cache, and records it in the index of a managed cache."""
+        count(stat_name, size)
+        index = self.get_index()
+        if index is not None:
+            index.record(os.path.basename(cachefile), size,
+                         stat_name == 'bytes_pushed')
+
+    def retrieve_file(self, target, env):
+        """Retrieves target[0] from the cache, returning 0 if it was
+        there (or would have been, with -n), and 1 if not."""
+        t = target[0]
+        fs = t.fs
+        cachedir, cachefile = self.cachepath(t)
+        if not self.lookup(fs, cachefile, forget=1):
+            self.CacheDebug('CacheRetrieve(%s):  %s not in cache\n', t, cachefile)
+            return 1
+        self.CacheDebug('CacheRetrieve(%s):  retrieving from %s\n', t, cachefile)
+        if SCons.Action.execute_actions:
+            try:
+                size = self.fetch(fs, cachefile, t, env)
+            except EnvironmentError:
+                # Another build evicted it from a managed cache after we
+                # looked.  We'll just have to build it after all.
+                self.CacheDebug('CacheRetrieve(%s):  %s not in cache\n', t, cachefile)
+                return 1
+            self.record(cachefile, size, 'bytes_retrieved')
+        return 0
+
+    def fetch(self, fs, cachefile, t, env):
+        """Gets cachefile out of the cache and into the target t's
+        file, returning the number of bytes that came from the cache."""
+        method = None
+        if fs.islink(cachefile):
+            fs.symlink(fs.readlink(cachefile), t.path)
+        elif self.compress:
+            decompress_file(cachefile, t.path, self.compress)
+            shutil.copystat(cachefile, t.path)
+        elif self.mode == 'link':
+            method = link_file(fs, cachefile, t.path, env.copy_from_cache)
+        else:
+            env.copy_from_cache(cachefile, t.path)
+        st = fs.stat(cachefile)
+        if method:
+            self.CacheDebug('CacheRetrieve(%s):  used ' + method + ' for %s\n',
+                            t, cachefile)
+        if method != 'hardlink':
+            # A hard link has to stay as read-only as the cache file.
+            fs.chmod(t.path, stat.S_IMODE(st[stat.ST_MODE]) | stat.S_IWRITE)
+        return st[stat.ST_SIZE]
+
+    def push_file(self, target):
+        """Pushes target[0] to the cache."""
+        t = target[0]
+        fs = t.fs
+        cachedir, cachefile = self.cachepath(t)
+        # Whatever a lookup found before the target was built is out of
+        # date now; look again.
+        self.forget(cachefile)
+        if self.exists(fs, cachefile):
+            # Don't bother copying it if it's already there.  Note that
+            # usually this "shouldn't happen" because if the file already
+            # existed in cache, we'd have retrieved the file from there,
+            # not built it.  This can happen, though, in a race, if some
+            # other person running the same build pushes their copy to
+            # the cache after we decide we need to build it but before our
+            # build completes.
+            self.CacheDebug('CachePush(%s):  %s already exists in cache\n', t, cachefile)
+            return
+
+        self.CacheDebug('CachePush(%s):  pushing to %s\n', t, cachefile)
+
+        try:
+            size = self.store(fs, target, cachedir, cachefile)
+            if size is not None:
+                count('pushes')
+                self.record(cachefile, size, 'bytes_pushed')
+        except EnvironmentError:
+            # It's possible someone else tried writing the file at the
+            # same time we did, or else that there was some problem like
+            # the CacheDir being on a separate file system that's full.
+            # In any case, inability to push a file to cache doesn't affect
+            # the correctness of the build, so just print a warning.
+            msg = self.errfmt % (str(target), cachefile)
+            SCons.Warnings.warn(SCons.Warnings.CacheWriteErrorWarning, msg)
+
+    errfmt = "Unable to copy %s to cache. Cache file is %s"
+
+    def store(self, fs, target, cachedir, cachefile):
+        """Puts target[0]'s file in the cache as cachefile, returning
+        the number of bytes it takes up there, or None if it wasn't
+        put there after all."""
+        t = target[0]
+        tempfile = cachefile+'.tmp'+str(os.getpid())
+
+        if not fs.isdir(cachedir):
+            try:
+                fs.makedirs(cachedir)
+            except EnvironmentError:
+                # We may have received an exception because another process
+                # has beaten us creating the directory.
+                if not fs.isdir(cachedir):
+                    msg = self.errfmt % (str(target), cachefile)
+                    raise SCons.Errors.EnvironmentError(msg)
+
+        method = None
+        if fs.islink(t.path):
+            fs.symlink(fs.readlink(t.path), tempfile)
+        elif self.compress:
+            compress_file(t.path, tempfile, self.compress)
+            shutil.copystat(t.path, tempfile)
+        elif self.mode == 'link':
+            # Not a hard link:  the cached file is made read-only below,
+            # which would make the target read-only as well.
+            method = link_file(fs, t.path, tempfile, fs.copy2, hardlink=0)
+        else:
+            fs.copy2(t.path, tempfile)
+        fs.rename(tempfile, cachefile)
+        st = fs.stat(t.path)
+        mode = stat.S_IMODE(st[stat.ST_MODE])
+        size = st[stat.ST_SIZE]
+        if self.compress and not fs.islink(cachefile):
+            # What matters for the cache is the compressed size.
+            size = fs.stat(cachefile)[stat.ST_SIZE]
+            self.compress_debug(t, cachefile, st[stat.ST_SIZE], size)
+        if method:
+            self.CacheDebug('CachePush(%s):  used ' + method + ' for %s\n',
+                            t, cachefile)
+            mode = mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+            fs.chmod(cachefile, mode)
+        else:
+            fs.chmod(cachefile, mode | stat.S_IWRITE)
+        return size
+
+    def compress_debug(self, t, cachefile, size, compressed_size):
+        if size:
+            ratio = 100.0 * compressed_size / size
+        else:
+            ratio = 100.0
+        self.CacheDebug('CachePush(%%s):  compressed %d bytes to %d (%.1f%%%%) in %%s\n'
+                        % (size, compressed_size, ratio),
+                        t, cachefile)
 
     def retrieve(self, node):
         """
@@ -193,11 +1170,14 @@ class CacheDir(object):
         if cache_show:
             if CacheRetrieveSilent(node, [], env, execute=1) == 0:
                 node.build(presub=0, execute=0)
+                count('hits')
                 return True
         else:
             if CacheRetrieve(node, [], env, execute=1) == 0:
+                count('hits')
                 return True
 
+        count('misses')
         return False
 
     def push(self, node):
@@ -209,6 +1189,53 @@ class CacheDir(object):
         if cache_force:
             return self.push(node)
 
+def _tier_value(value, i):
+    # A list has a value for each tier; anything else is for all tiers.
+    if SCons.Util.is_List(value):
+        if i < len(value):
+            return value[i]
+        return None
+    return value
+
+class TieredCacheDir(CacheDir):
+    """
+    A CacheDir made of a list of cache directories, like a fast local
+    one in front of one shared by a team.  Files are retrieved from the
+    first tier that has them, and copied into the tiers in front of
+    that one.  Files are pushed to the first tier right away, and to
+    the others in the background.  Each tier has its own max_size,
+    mode and compress format, and is evicted on its own.
+    """
+    def __init__(self, paths, max_size=None, mode=None, compress=None):
+        CacheDir.__init__(self, paths[0])
+        self.tiers = []
+        for i in range(len(paths)):
+            tier = create(paths[i],
+                          _tier_value(max_size, i),
+                          _tier_value(mode, i),
+                          _tier_value(compress, i))
+            # All the tiers write to our --cache-debug file.
+            tier.CacheDebug = self.CacheDebug
+            self.tiers.append(tier)
+
+    def get_tiers(self):
+        return self.tiers
+
+    def cachepath(self, node):
+        return self.tiers[0].cachepath(node)
+
+    def prefetch(self, node):
+        for tier in self.tiers:
+            tier.prefetch(node)
+
+def create(path, max_size=None, mode=None, compress=None):
+    """Returns the CacheDir for a cache directory, or for the URL
+    of a cache server."""
+    if SCons.Util.is_String(path) and path.startswith('http://'):
+        from SCons.HTTPCache import HTTPCacheDir
+        return HTTPCacheDir(path, max_size, mode, compress)
+    return CacheDir(path, max_size, mode, compress)
+
 # Local Variables:
 # tab-width:4
 # indent-tabs-mode:nil
@@ -26,11 +26,13 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import os.path
 import shutil
 import sys
+import time
 import unittest
 
 from TestCmd import TestCmd
 
 import SCons.CacheDir
+import SCons.Errors
 
 built_it = None
 
@@ -105,6 +107,438 @@ class CacheDirTestCase(BaseTestCase):
         finally:
             SCons.Util.MD5collect = save_collect
 
+    def test_parse_size(self):
+        """Test parsing CacheDir sizes"""
+        parse_size = SCons.CacheDir.parse_size
+        assert parse_size(1000) == 1000
+        assert parse_size('1000') == 1000
+        assert parse_size('2k') == 2048
+        assert parse_size('1.5M') == 1536 * 1024
+        assert parse_size('10GB') == 10 * 1024 * 1024 * 1024
+        for bad in ['', 'lots', '-5', -5]:
+            try:
+                parse_size(bad)
+            except SCons.Errors.UserError:
+                pass
+            else:
+                self.fail("did not catch bad size %s" % repr(bad))
+
+class ManagedCacheTestCase(unittest.TestCase):
+    """
+    Test the index and eviction of caches with a max_size.
+    """
+    def setUp(self):
+        self.test = TestCmd(workdir='')
+        self.test.subdir('cache')
+        self.path = self.test.workpath('cache')
+        self.save_stats = SCons.CacheDir.stats.copy()
+
+    def tearDown(self):
+        SCons.CacheDir.stats.update(self.save_stats)
+
+    def push(self, index, sig, size, used):
+        dir, cachefile = SCons.CacheDir.cachefile_path(self.path, sig)
+        if not os.path.isdir(dir):
+            os.mkdir(dir)
+        self.test.write(cachefile, 'x' * size)
+        os.utime(cachefile, (used, used))
+        return cachefile
+
+    def journal(self, *lines):
+        journal = os.path.join(self.path, SCons.CacheDir.journal_name)
+        f = open(journal, 'a')
+        for line in lines:
+            f.write('%s %d %d\n' % line)
+        f.close()
+
+    def test_scan(self):
+        """Test rebuilding a missing index from access times"""
+        index = SCons.CacheDir.CacheIndex(self.path, 150)
+        f1 = self.push(index, 'a1', 100, 1000)
+        f2 = self.push(index, 'b2', 100, 3000)
+        f3 = self.push(index, 'c3', 100, 2000)
+        self.test.write(os.path.join(self.path, 'A', 'a9.tmp123'), 'x' * 1000)
+        index.evict()
+        # 300 bytes down to no more than 90% of 150, oldest first.
+        assert not os.path.exists(f1)
+        assert not os.path.exists(f3)
+        assert os.path.exists(f2)
+        assert index.size == 100, index.size
+        assert index.entries == 1, index.entries
+        assert SCons.CacheDir.stats['evictions'] == self.save_stats['evictions'] + 2
+        entries = index.read_index()
+        assert entries == {'b2' : (100, 3000)}, entries
+
+    def test_journal(self):
+        """Test that recorded accesses decide what gets evicted"""
+        index = SCons.CacheDir.CacheIndex(self.path, 1000)
+        f1 = self.push(index, 'a1', 100, 1000)
+        f2 = self.push(index, 'b2', 100, 2000)
+        index.evict()
+        assert index.size == 200, index.size
+
+        # Someone retrieves a1, and pushes c3 and d4.
+        f3 = self.push(index, 'c3', 400, 3000)
+        f4 = self.push(index, 'd4', 450, 4000)
+        self.journal(('a1', 100, 5000), ('c3', 400, 3000), ('d4', 450, 4000))
+        # A line cut short by a build that died is ignored.
+        journal = os.path.join(self.path, SCons.CacheDir.journal_name)
+        open(journal, 'a').write('e5 4')
+        index.evict()
+        # 1050 bytes down to no more than 900, least recently used first.
+        assert os.path.exists(f1)
+        assert not os.path.exists(f2)
+        assert not os.path.exists(f3)
+        assert os.path.exists(f4)
+        assert index.size == 550, index.size
+        assert not os.path.exists(journal)
+
+    def test_usage(self):
+        """Test reporting what the cache holds without evicting"""
+        index = SCons.CacheDir.CacheIndex(self.path, 150)
+        f1 = self.push(index, 'a1', 100, 1000)
+        assert index.usage() == (100, 1), index.usage()
+        index.evict()
+        f2 = self.push(index, 'b2', 200, 2000)
+        self.journal(('b2', 200, 2000))
+        assert index.usage() == (300, 2), index.usage()
+        assert os.path.exists(f1)
+        assert os.path.exists(f2)
+        assert index.size == 100, index.size
+
+    def test_record(self):
+        """Test recording accesses and evicting in the background"""
+        index = SCons.CacheDir.CacheIndex(self.path, 1000)
+        f1 = self.push(index, 'a1', 50, 1000)
+        index.record('a1', 50, True)
+        assert index.thread is None
+        f2 = self.push(index, 'b2', 1100, 2000)
+        index.record('b2', 1100, True)
+        assert index.thread.isDaemon()
+        index.wait()
+        assert not os.path.exists(f1)
+        assert not os.path.exists(f2)
+        assert index.size == 0, index.size
+
+    def test_lock(self):
+        """Test that only one build at a time evicts"""
+        index = SCons.CacheDir.CacheIndex(self.path, 10)
+        f1 = self.push(index, 'a1', 100, 1000)
+        self.test.write(index.lock_file, "12345\n")
+        index.evict()
+        assert os.path.exists(f1)
+        assert index.size is None
+
+        # A lock left behind long ago doesn't count.
+        old = time.time() - SCons.CacheDir.lock_timeout - 10
+        os.utime(index.lock_file, (old, old))
+        index.evict()
+        assert not os.path.exists(f1)
+        assert not os.path.exists(index.lock_file)
+
+    def test_stop(self):
+        """Test that a stopped eviction leaves the rest for next time"""
+        index = SCons.CacheDir.CacheIndex(self.path, 10)
+        f1 = self.push(index, 'a1', 100, 1000)
+        f2 = self.push(index, 'b2', 100, 2000)
+        index.stopping = True
+        index.evict()
+        assert os.path.exists(f1)
+        assert os.path.exists(f2)
+        assert index.size == 200, index.size
+        assert not os.path.exists(index.lock_file)
+
+        index.start_eviction()
+        index.stop(0)
+        index.start_eviction()
+        index.wait()
+        assert not os.path.exists(f1)
+        assert not os.path.exists(f2)
+
+    def test_refresh_lock(self):
+        """Test that a build that's evicting keeps its lock file fresh"""
+        index = SCons.CacheDir.CacheIndex(self.path, 10)
+        assert index.lock()
+        old = int(time.time()) - SCons.CacheDir.lock_timeout + 10
+        os.utime(index.lock_file, (old, old))
+        index.refresh_lock()
+        assert os.stat(index.lock_file).st_mtime == old
+        save_lock_refresh = SCons.CacheDir.lock_refresh
+        SCons.CacheDir.lock_refresh = 0
+        try:
+            index.refresh_lock()
+        finally:
+            SCons.CacheDir.lock_refresh = save_lock_refresh
+        assert os.stat(index.lock_file).st_mtime > old + 5
+        index.unlock()
+
+    def test_retrieve_evicted(self):
+        """Test retrieving a file evicted after we looked for it"""
+        import SCons.Node.FS
+        fs = SCons.Node.FS.FS(self.test.workpath(''))
+        cd = SCons.CacheDir.CacheDir(self.path, 1000)
+        f1 = fs.File('f1')
+        f1.builder_set(Builder(Environment(cd), Action()))
+        f1.cachesig = 'a1'
+        def copy_from_cache(src, dst):
+            raise IOError(2, "No such file or directory")
+        env = Environment(cd)
+        env.copy_from_cache = copy_from_cache
+        self.push(None, 'a1', 10, 1000)
+        r = SCons.CacheDir.CacheRetrieveFunc([f1], [], env)
+        assert r == 1, r
+
+class LinkTestCase(unittest.TestCase):
+    """
+    Test getting files into and out of caches with mode='link'.
+    """
+    def setUp(self):
+        self.test = TestCmd(workdir='')
+        import SCons.Node.FS
+        self.fs = SCons.Node.FS.LocalFS()
+        self.save_link_method_index = SCons.CacheDir.link_method_index
+        SCons.CacheDir.link_method_index = {}
+
+    def tearDown(self):
+        SCons.CacheDir.link_method_index = self.save_link_method_index
+
+    def test_parse_mode(self):
+        """Test checking CacheDir modes"""
+        parse_mode = SCons.CacheDir.parse_mode
+        assert parse_mode(None) == 'copy'
+        assert parse_mode('link') == 'link'
+        self.assertRaises(SCons.Errors.UserError, parse_mode, 'reflink')
+
+    def test_link_file(self):
+        """Test linking a file by the best method available"""
+        src = self.test.workpath('src')
+        dst = self.test.workpath('dst')
+        self.test.write(src, 'src\n')
+        self.test.write(dst, 'old\n')
+        def copy(src, dst):
+            self.fail("copied a file that could be linked")
+        method = SCons.CacheDir.link_file(self.fs, src, dst, copy)
+        assert method in ['reflink', 'hardlink'], method
+        assert self.test.read(dst) == 'src\n'
+        if method == 'hardlink':
+            assert os.path.samefile(src, dst)
+            # We remember not to try reflinks here again.
+            assert list(SCons.CacheDir.link_method_index.values()) == [1]
+
+    def test_link_file_no_hardlink(self):
+        """Test getting a file to a separate file by the best method"""
+        src = self.test.workpath('src')
+        dst = self.test.workpath('dst')
+        self.test.write(src, 'src\n')
+        copied = []
+        def copy(src, dst):
+            copied.append(dst)
+            shutil.copy2(src, dst)
+        method = SCons.CacheDir.link_file(self.fs, src, dst, copy, hardlink=0)
+        assert method in ['reflink', 'copy'], method
+        assert not os.path.samefile(src, dst)
+        assert self.test.read(dst) == 'src\n'
+
+    def test_fallback(self):
+        """Test falling back to copying a file"""
+        import errno
+        src = self.test.workpath('src')
+        dst = self.test.workpath('dst')
+        self.test.write(src, 'src\n')
+        fs = self.fs
+        class CrossDeviceFS(object):
+            def __getattr__(self, name):
+                return getattr(fs, name)
+            def link(self, src, dst):
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+        copied = []
+        def copy(src, dst):
+            copied.append(dst)
+            shutil.copy2(src, dst)
+        save_reflink = SCons.CacheDir.reflink
+        def reflink(src, dst):
+            raise IOError(errno.EOPNOTSUPP, "Operation not supported")
+        SCons.CacheDir.reflink = reflink
+        try:
+            method = SCons.CacheDir.link_file(CrossDeviceFS(), src, dst, copy)
+            assert method == 'copy', method
+            assert copied == [dst], copied
+            assert self.test.read(dst) == 'src\n'
+            assert list(SCons.CacheDir.link_method_index.values()) == [2]
+
+            # Other errors aren't taken to mean links don't work.
+            SCons.CacheDir.link_method_index = {}
+            def reflink(src, dst):
+                raise IOError(errno.ENOENT, "No such file or directory")
+            SCons.CacheDir.reflink = reflink
+            self.assertRaises(IOError, SCons.CacheDir.link_file,
+                              fs, src, dst, copy)
+            assert SCons.CacheDir.link_method_index == {}
+        finally:
+            SCons.CacheDir.reflink = save_reflink
+
+class CompressTestCase(BaseTestCase):
+    """
+    Test caches that store files compressed.
+    """
+    def test_parse_compress(self):
+        """Test checking CacheDir compress formats"""
+        parse_compress = SCons.CacheDir.parse_compress
+        assert parse_compress(None) is None
+        assert parse_compress('gzip') == 'gzip'
+        self.assertRaises(SCons.Errors.UserError, parse_compress, 'zip')
+        self.assertRaises(SCons.Errors.UserError, parse_compress, 1)
+
+    def test_cachepath(self):
+        """Test the names of compressed files in the cache"""
+        cd = SCons.CacheDir.CacheDir('cache', compress = 'gzip')
+        f = self.File('f', 'a_fake_bsig')
+        result = cd.cachepath(f)
+        dirname = os.path.join('cache', 'A')
+        assert result == (dirname, os.path.join(dirname, 'a_fake_bsig.gz')), result
+
+    def test_round_trip(self):
+        """Test compressing and decompressing files"""
+        contents = 'x' * 100000
+        src = self.test.workpath('src')
+        self.test.write(src, contents)
+        for compress in ['gzip', 'bz2', 'lzma']:
+            try:
+                SCons.CacheDir.parse_compress(compress)
+            except SCons.Errors.UserError:
+                continue
+            cached = self.test.workpath('cached.' + compress)
+            dst = self.test.workpath('dst.' + compress)
+            SCons.CacheDir.compress_file(src, cached, compress)
+            size = os.path.getsize(cached)
+            assert 0 < size < len(contents) / 10, (compress, size)
+            SCons.CacheDir.decompress_file(cached, dst, compress)
+            assert self.test.read(dst) == contents, compress
+
+    def test_corrupt(self):
+        """Test that a failed decompression leaves no file behind"""
+        cached = self.test.workpath('cached')
+        dst = self.test.workpath('dst')
+        self.test.write(cached, 'not compressed at all')
+        self.assertRaises(IOError, SCons.CacheDir.decompress_file,
+                          cached, dst, 'gzip')
+        assert not os.path.exists(dst)
+
+class LookupTestCase(BaseTestCase):
+    """
+    Test looking for files in the cache, in the background or not.
+    """
+    def test_lookup(self):
+        """Test remembering whether files are in the cache"""
+        looked = []
+        class FS(object):
+            def exists(self, path):
+                looked.append(path)
+                return path == 'yes'
+        fs = FS()
+        cd = self._CacheDir
+        assert cd.lookup(fs, 'yes')
+        assert cd.lookup(fs, 'yes')
+        assert not cd.lookup(fs, 'no')
+        assert looked == ['yes', 'no'], looked
+        assert cd.lookup(fs, 'yes', forget=1)
+        assert looked == ['yes', 'no'], looked
+        assert cd.lookup(fs, 'yes')
+        assert looked == ['yes', 'no', 'yes'], looked
+        cd.forget('no')
+        assert not cd.lookup(fs, 'no')
+        assert looked == ['yes', 'no', 'yes', 'no'], looked
+
+    def test_prefetch(self):
+        """Test looking for files in the background"""
+        cd = SCons.CacheDir.CacheDir(self.test.workpath('cache'))
+        f1 = self.File('f1', 'a_fake_bsig')
+        cachedir, cachefile = cd.cachepath(f1)
+        self.test.subdir('cache', ['cache', 'A'])
+        self.test.write(cachefile, 'f1\n')
+
+        cd.prefetch(f1)
+        assert cachefile in cd.lookups, cd.lookups
+        class FS(object):
+            def exists(self, path):
+                raise AssertionError("looked for %s again" % path)
+        assert cd.lookup(FS(), cachefile, forget=1)
+        assert cd.lookups == {}, cd.lookups
+
+        save_lookup_threads = SCons.CacheDir.lookup_threads
+        SCons.CacheDir.lookup_threads = 0
+        try:
+            cd.prefetch(f1)
+            assert cd.lookups == {}, cd.lookups
+        finally:
+            SCons.CacheDir.lookup_threads = save_lookup_threads
+
+    def test_stop_lookups(self):
+        """Test shutting down the lookup threads"""
+        cd = SCons.CacheDir.CacheDir(self.test.workpath('cache'))
+        f1 = self.File('f1', 'a_fake_bsig')
+        cd.prefetch(f1)
+        workers = SCons.CacheDir._lookup_workers[:]
+        assert len(workers) == SCons.CacheDir.lookup_threads, workers
+        SCons.CacheDir.stop_lookups()
+        for t in workers:
+            assert not t.isAlive(), t
+        assert SCons.CacheDir._lookup_workers == []
+        assert not cd.lookup(self.fs, cd.cachepath(f1)[1])
+
+class TieredTestCase(BaseTestCase):
+    """
+    Test a cache directory in front of another one.
+    """
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.local = self.test.workpath('local')
+        self.shared = self.test.workpath('shared')
+        self._CacheDir = SCons.CacheDir.TieredCacheDir([self.local, self.shared],
+                                                      max_size = [None, '1M'],
+                                                      compress = [None, 'gzip'])
+        self.env = Environment(self._CacheDir)
+        self.env.copy_from_cache = shutil.copy2
+
+    def test_tiers(self):
+        """Test the settings of each tier"""
+        local, shared = self._CacheDir.get_tiers()
+        assert local.path == self.local, local.path
+        assert local.max_size is None, local.max_size
+        assert local.compress is None, local.compress
+        assert shared.path == self.shared, shared.path
+        assert shared.max_size == 1024*1024, shared.max_size
+        assert shared.compress == 'gzip', shared.compress
+
+    def test_push_retrieve(self):
+        """Test pushing to and retrieving from all the tiers"""
+        local, shared = self._CacheDir.get_tiers()
+        f1 = self.File(self.test.workpath('f1'), 'a_fake_bsig')
+        self.test.write('f1', 'f1\n')
+
+        SCons.CacheDir.CachePushFunc([f1], [], self.env)
+        pusher = SCons.CacheDir.pusher
+        SCons.CacheDir.wait_for_pushes()
+        assert pusher.threads == [], pusher.threads
+        assert SCons.CacheDir.pusher is None
+        local_file = local.cachepath(f1)[1]
+        shared_file = shared.cachepath(f1)[1]
+        assert os.path.exists(local_file), local_file
+        assert os.path.exists(shared_file), shared_file
+
+        # A file only in the shared tier gets copied into the local one.
+        os.unlink(local_file)
+        os.unlink(self.test.workpath('f1'))
+        r = SCons.CacheDir.CacheRetrieveFunc([f1], [], self.env)
+        assert r == 0, r
+        assert self.test.read('f1') == 'f1\n'
+        assert self.test.read(local_file) == 'f1\n'
+
+        os.unlink(local_file)
+        os.unlink(shared_file)
+        r = SCons.CacheDir.CacheRetrieveFunc([f1], [], self.env)
+        assert r == 1, r
+
 class FileTestCase(BaseTestCase):
     """
     Test calling CacheDir code through Node.FS.File interfaces.
@@ -282,6 +716,11 @@ if __name__ == "__main__":
     suite = unittest.TestSuite()
     tclasses = [
         CacheDirTestCase,
+        ManagedCacheTestCase,
+        LinkTestCase,
+        CompressTestCase,
+        LookupTestCase,
+        TieredTestCase,
         FileTestCase,
     ]
     for tclass in tclasses:
@@ -93,6 +93,9 @@ def DefaultEnvironment(*args, **kw):
         global DefaultEnvironment
         DefaultEnvironment = _fetch_DefaultEnvironment
         _default_env._CacheDir_path = None
+        _default_env._CacheDir_max_size = None
+        _default_env._CacheDir_mode = None
+        _default_env._CacheDir_compress = None
     return _default_env
 
 # Emitters for setting the shared attribute on object files,
@@ -35,6 +35,7 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 
 import copy
+import itertools
 import os
 import sys
 import re
@@ -64,6 +65,12 @@ class _Null(object):
 
 _null = _Null
 
+# Every change to the construction variables of an environment gives
+# it a new version number from this sequence, so a version number
+# stands for one set of variable values.  (A clone has the same version
+# as the original until one of them is changed.)
+_versions = itertools.count(1)
+
 _warn_copy_deprecated = True
 _warn_source_signatures_deprecated = True
 _warn_target_signatures_deprecated = True
@@ -314,10 +321,12 @@ class BuilderDict(UserDict):
             self.env.RemoveMethod(method)
         UserDict.__setitem__(self, item, val)
         BuilderWrapper(self.env, val, item)
+        self.env._changed()
 
     def __delitem__(self, item):
         UserDict.__delitem__(self, item)
         delattr(self.env, item)
+        self.env._changed()
 
     def update(self, dict):
         for i, v in dict.items():
@@ -372,6 +381,8 @@ class SubstitutionEnvironment(object):
         self.ans = SCons.Node.Alias.default_ans
         self.lookup_list = SCons.Node.arg2nodes_lookups
         self._dict = kw.copy()
+        self._shared = set()
+        self._version = _versions.next()
         self._init_special()
         self.added_methods = []
         #self._memo = {}
@@ -398,7 +409,44 @@ class SubstitutionEnvironment(object):
     def __cmp__(self, other):
         return cmp(self._dict, other._dict)
 
+    def _unshare(self, key):
+        """Make our own copy of a variable's value that we've been
+        sharing with other environments (see Base.Clone()), before
+        it gets handed out or changed.
+        """
+        if key in self._shared:
+            self._shared.remove(key)
+            try:
+                self._dict[key] = semi_deepcopy(self._dict[key])
+            except KeyError:
+                pass
+            else:
+                # Our copy is about to be handed out and maybe changed
+                # in place, which we'd never see.
+                self._version = _versions.next()
+
+    def _unshare_all(self):
+        for key in list(self._shared):
+            self._unshare(key)
+
+    def _changed(self):
+        self._version = _versions.next()
+
+    def get_version(self):
+        """Return the version number of our construction variables,
+        which changes whenever a variable is set, added to or deleted.
+
+        This can be used to key cached values that depend on the
+        variables.  (Changes made in place to values fetched from the
+        environment, like env['LIST'].append(x), don't get seen,
+        except for the first one after a Clone(), so a cached value
+        that depends on a list should key on the list's value.)
+        """
+        return self._version
+
     def __delitem__(self, key):
+        self._shared.discard(key)
+        self._version = _versions.next()
         special = self._special_del.get(key)
         if special:
             special(self, key)
@@ -406,6 +454,8 @@ class SubstitutionEnvironment(object):
             del self._dict[key]
 
     def __getitem__(self, key):
+        if key in self._shared:
+            self._unshare(key)
         return self._dict[key]
 
     def __setitem__(self, key, value):
@@ -421,6 +471,8 @@ class SubstitutionEnvironment(object):
         # So right now it seems like a good trade-off, but feel free to
         # revisit this with bench/env.__setitem__.py as needed (and
         # as newer versions of Python come out).
+        self._shared.discard(key)
+        self._version = _versions.next()
         if key in self._special_set_keys:
             self._special_set[key](self, key, value)
         else:
@@ -435,6 +487,8 @@ class SubstitutionEnvironment(object):
 
     def get(self, key, default=None):
         """Emulates the get() method of dictionaries."""
+        if key in self._shared:
+            self._unshare(key)
         return self._dict.get(key, default)
 
     def has_key(self, key):
@@ -444,6 +498,7 @@ class SubstitutionEnvironment(object):
         return self._dict.__contains__(key)
 
     def items(self):
+        self._unshare_all()
         return list(self._dict.items())
 
     def arg2nodes(self, args, node_factory=_null, lookup_list=_null, **kw):
@@ -934,6 +989,9 @@ class Base(SubstitutionEnvironment):
         self.ans = SCons.Node.Alias.default_ans
         self.lookup_list = SCons.Node.arg2nodes_lookups
         self._dict = semi_deepcopy(SCons.Defaults.ConstructionEnvironment)
+        self._shared = set()
+        self._clone_values = {}
+        self._version = _versions.next()
         self._init_special()
         self.added_methods = []
 
@@ -1003,6 +1061,7 @@ class Base(SubstitutionEnvironment):
         # should override any values set by the tools.
         for key, val in save.items():
             self._dict[key] = val
+        self._changed()
 
         # Finally, apply any flags to be merged in
         if parse_flags: self.MergeFlags(parse_flags)
@@ -1023,15 +1082,25 @@ class Base(SubstitutionEnvironment):
     def get_CacheDir(self):
         try:
             path = self._CacheDir_path
+            max_size = self._CacheDir_max_size
+            mode = self._CacheDir_mode
+            compress = self._CacheDir_compress
         except AttributeError:
-            path = SCons.Defaults.DefaultEnvironment()._CacheDir_path
+            default = SCons.Defaults.DefaultEnvironment()
+            path = default._CacheDir_path
+            max_size = default._CacheDir_max_size
+            mode = default._CacheDir_mode
+            compress = default._CacheDir_compress
         try:
-            if path == self._last_CacheDir_path:
+            if (path, max_size, mode, compress) == self._last_CacheDir_path:
                 return self._last_CacheDir
         except AttributeError:
             pass
-        cd = SCons.CacheDir.CacheDir(path)
-        self._last_CacheDir_path = path
+        if SCons.Util.is_List(path):
+            cd = SCons.CacheDir.TieredCacheDir(path, max_size, mode, compress)
+        else:
+            cd = SCons.CacheDir.create(path, max_size, mode, compress)
+        self._last_CacheDir_path = (path, max_size, mode, compress)
         self._last_CacheDir = cd
         return cd
 
@@ -1117,7 +1186,10 @@ class Base(SubstitutionEnvironment):
         """Update an environment's values directly, bypassing the normal
         checks that occur when users try to set items.
         """
-        self._dict.update(dict)
+        if dict:
+            self._dict.update(dict)
+            self._shared.difference_update(dict)
+            self._changed()
 
     def get_src_sig_type(self):
         try:
@@ -1150,6 +1222,7 @@ class Base(SubstitutionEnvironment):
         """
         kw = copy_non_reserved_keywords(kw)
         for key, val in kw.items():
+            self._unshare(key)
             # It would be easier on the eyes to write this using
             # "continue" statements whenever we finish processing an item,
             # but Python 1.5.2 apparently doesn't let you use "continue"
@@ -1217,6 +1290,7 @@ class Base(SubstitutionEnvironment):
                                     orig[k] = v
                             else:
                                 orig[val] = None
+        self._changed()
         self.scanner_map_delete(kw)
 
     # allow Dirs and strings beginning with # for top-relative
@@ -1240,6 +1314,7 @@ class Base(SubstitutionEnvironment):
         will not be moved to the end (it will be left where it is).
         """
 
+        self._unshare(envname)
         orig = ''
         if envname in self._dict and name in self._dict[envname]:
             orig = self._dict[envname][name]
@@ -1251,6 +1326,7 @@ class Base(SubstitutionEnvironment):
             self._dict[envname] = {}
 
         self._dict[envname][name] = nv
+        self._changed()
 
     def AppendUnique(self, delete_existing=0, **kw):
         """Append values to existing construction variables
@@ -1260,6 +1336,7 @@ class Base(SubstitutionEnvironment):
         """
         kw = copy_non_reserved_keywords(kw)
         for key, val in kw.items():
+            self._unshare(key)
             if SCons.Util.is_List(val):
                 val = _delete_duplicates(val, delete_existing)
             if key not in self._dict or self._dict[key] in ('', None):
@@ -1364,6 +1441,7 @@ class Base(SubstitutionEnvironment):
                     if delete_existing:
                         dk = [x for x in dk if x not in val]
                     self._dict[key] = dk + val
+        self._changed()
         self.scanner_map_delete(kw)
 
     def Clone(self, tools=[], toolpath=None, parse_flags = None, **kw):
@@ -1373,9 +1451,33 @@ class Base(SubstitutionEnvironment):
         a reference is copied when an object is not deep-copyable
         (like a function).  There are no references to any mutable
         objects in the original Environment.
+
+        The copying is put off, though.  The clone shares the values
+        of the variables with us (and any other clones) until it hands
+        one out or changes it, and only then makes its own copy
+        (see _unshare()).  The values we've handed out ourselves could
+        get changed behind our backs, so they're copied right away, but
+        the copies get reused by later clones for as long as the values
+        stay the same.
         """
         clone = copy.copy(self)
-        clone._dict = semi_deepcopy(self._dict)
+        clone._dict = self._dict.copy()
+        # (The BUILDERS get a new BuilderDict of their own below.)
+        keys = set(self._dict).difference(self._shared)
+        keys.discard('BUILDERS')
+        for key in keys:
+            value = self._dict[key]
+            try:
+                orig, value_copy = self._clone_values[key]
+            except KeyError:
+                orig = value_copy = None
+            if orig is not value or value != value_copy:
+                value_copy = semi_deepcopy(value)
+                self._clone_values[key] = (value, value_copy)
+            clone._dict[key] = value_copy
+        clone._shared = set(clone._dict)
+        clone._shared.discard('BUILDERS')
+        clone._clone_values = {}
 
         try:
             cbd = clone._dict['BUILDERS']
@@ -1383,6 +1485,9 @@ class Base(SubstitutionEnvironment):
             pass
         else:
             clone._dict['BUILDERS'] = BuilderDict(cbd, clone)
+        # A version of its own, since values that get changed in place
+        # now belong to one or the other of us.
+        clone._version = _versions.next()
 
         # Check the methods added via AddMethod() and re-bind them to
         # the cloned environment.  Only do this if the attribute hasn't
@@ -1477,6 +1582,15 @@ class Base(SubstitutionEnvironment):
 
         self.copy_from_cache = copy_function
 
+    def decides_by_content(self):
+        """Returns whether this environment decides whether source
+        files changed by their content signatures (Decider('MD5')),
+        which means they get computed for every source file anyway."""
+        decide = self.decide_source
+        if decide is default_decide_source:
+            decide = SCons.Defaults.DefaultEnvironment().decide_source
+        return getattr(decide, 'im_func', None) is Base._changed_content.im_func
+
     def Detect(self, progs):
         """Return the first available program in progs.
         """
@@ -1489,7 +1603,10 @@ class Base(SubstitutionEnvironment):
 
     def Dictionary(self, *args):
         if not args:
+            self._unshare_all()
             return self._dict
+        for x in args:
+            self._unshare(x)
         dlist = [self._dict[x] for x in args]
         if len(dlist) == 1:
             dlist = dlist[0]
@@ -1600,6 +1717,7 @@ class Base(SubstitutionEnvironment):
         """
         kw = copy_non_reserved_keywords(kw)
         for key, val in kw.items():
+            self._unshare(key)
             # It would be easier on the eyes to write this using
             # "continue" statements whenever we finish processing an item,
             # but Python 1.5.2 apparently doesn't let you use "continue"
@@ -1657,6 +1775,7 @@ class Base(SubstitutionEnvironment):
                                     orig[k] = v
                             else:
                                 orig[val] = None
+        self._changed()
         self.scanner_map_delete(kw)
 
     def PrependENVPath(self, name, newpath, envname = 'ENV', sep = os.pathsep,
@@ -1671,6 +1790,7 @@ class Base(SubstitutionEnvironment):
         will not be moved to the front (it will be left where it is).
         """
 
+        self._unshare(envname)
         orig = ''
         if envname in self._dict and name in self._dict[envname]:
             orig = self._dict[envname][name]
@@ -1682,6 +1802,7 @@ class Base(SubstitutionEnvironment):
             self._dict[envname] = {}
 
         self._dict[envname][name] = nv
+        self._changed()
 
     def PrependUnique(self, delete_existing=0, **kw):
         """Prepend values to existing construction variables
@@ -1691,6 +1812,7 @@ class Base(SubstitutionEnvironment):
         """
         kw = copy_non_reserved_keywords(kw)
         for key, val in kw.items():
+            self._unshare(key)
             if SCons.Util.is_List(val):
                 val = _delete_duplicates(val, not delete_existing)
             if key not in self._dict or self._dict[key] in ('', None):
@@ -1722,6 +1844,7 @@ class Base(SubstitutionEnvironment):
                     if delete_existing:
                         dk = [x for x in dk if x not in val]
                     self._dict[key] = val + dk
+        self._changed()
         self.scanner_map_delete(kw)
 
     def Replace(self, **kw):
@@ -1914,11 +2037,28 @@ class Base(SubstitutionEnvironment):
         nkw = self.subst_kw(kw)
         return SCons.Builder.Builder(**nkw)
 
-    def CacheDir(self, path):
+    def CacheDir(self, path, max_size=None, mode=None, compress=None):
         import SCons.CacheDir
-        if path is not None:
+        def convert(value, parse, subst=self.subst):
+            # Complain about bad values right away, not when we first
+            # go to use the cache.  A list has a value for each tier
+            # of a list of cache directories.
+            if value is None:
+                return None
+            if SCons.Util.is_List(value):
+                return [convert(v, parse) for v in value]
+            return parse(subst(value))
+        if SCons.Util.is_List(path):
+            path = [self.subst(p) for p in path]
+        elif path is not None:
             path = self.subst(path)
+        max_size = convert(max_size, SCons.CacheDir.parse_size)
+        mode = convert(mode, SCons.CacheDir.parse_mode)
+        compress = convert(compress, SCons.CacheDir.parse_compress)
         self._CacheDir_path = path
+        self._CacheDir_max_size = max_size
+        self._CacheDir_mode = mode
+        self._CacheDir_compress = compress
 
     def Clean(self, targets, files):
         global CleanTargets
@@ -2272,6 +2412,7 @@ class OverrideEnvironment(Base):
         if __debug__: logInstanceCreation(self, 'Environment.OverrideEnvironment')
         self.__dict__['__subject'] = subject
         self.__dict__['overrides'] = overrides
+        self.__dict__['_override_version'] = _versions.next()
 
     # Methods that make this class act like a proxy.
     def __getattr__(self, name):
@@ -2289,6 +2430,7 @@ class OverrideEnvironment(Base):
         if not is_valid_construction_var(key):
             raise SCons.Errors.UserError("Illegal construction variable `%s'" % key)
         self.__dict__['overrides'][key] = value
+        self.__dict__['_override_version'] = _versions.next()
     def __delitem__(self, key):
         try:
             del self.__dict__['overrides'][key]
@@ -2296,6 +2438,7 @@ class OverrideEnvironment(Base):
             deleted = 0
         else:
             deleted = 1
+            self.__dict__['_override_version'] = _versions.next()
         try:
             result = self.__dict__['__subject'].__delitem__(key)
         except KeyError:
@@ -2327,6 +2470,9 @@ class OverrideEnvironment(Base):
     def items(self):
         """Emulates the items() method of dictionaries."""
         return list(self.Dictionary().items())
+    def get_version(self):
+        return (self.__dict__['__subject'].get_version(),
+                self.__dict__['_override_version'])
 
     # Overridden private construction environment methods.
     def _update(self, dict):
@@ -2334,6 +2480,7 @@ class OverrideEnvironment(Base):
         checks that occur when users try to set items.
         """
         self.__dict__['overrides'].update(dict)
+        self.__dict__['_override_version'] = _versions.next()
 
     def gvars(self):
         return self.__dict__['__subject'].gvars()
@@ -2347,6 +2494,7 @@ class OverrideEnvironment(Base):
     def Replace(self, **kw):
         kw = copy_non_reserved_keywords(kw)
         self.__dict__['overrides'].update(semi_deepcopy(kw))
+        self.__dict__['_override_version'] = _versions.next()
 
 # The entry point that will be used by the external world
 # to refer to a construction environment.  This allows the wrapper
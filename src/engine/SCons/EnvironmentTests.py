@@ -34,6 +34,7 @@ import unittest
 from collections import UserDict as UD, UserList as UL
 
 from SCons.Environment import *
+import SCons.CacheDir
 import SCons.Warnings
 
 def diff_env(env1, env2):
@@ -1869,6 +1870,91 @@ def generate(env):
         env = env.Clone(KEY_THAT_I_WANT=6, tools=[my_tool])
         assert env['KEY_THAT_I_WANT'] == real_value[0], env['KEY_THAT_I_WANT']
 
+    def test_Clone_copy_on_write(self):
+        """Test that cloned environments share values until they're used"""
+        env1 = self.TestEnvironment(LIST = ['a'], DICT = {'x' : ['1']})
+        handed_out = env1['LIST']
+        env2 = env1.Clone()
+        env3 = env1.Clone()
+        # The values env1 handed out get copied once for all the clones.
+        assert env2._dict['LIST'] is not handed_out
+        assert env2._dict['LIST'] is env3._dict['LIST']
+        env4 = env2.Clone()
+        assert env4._dict['LIST'] is env2._dict['LIST']
+
+        # Whoever changes a value first gets their own copy.
+        handed_out.append('b')
+        env2['LIST'].append('c')
+        env3.Append(LIST = ['d'])
+        env2['DICT']['x'].append('2')
+        env3.AppendENVPath('PATH', '/bin', envname = 'DICT')
+        assert env1['LIST'] == ['a', 'b'], env1['LIST']
+        assert env2['LIST'] == ['a', 'c'], env2['LIST']
+        assert env3['LIST'] == ['a', 'd'], env3['LIST']
+        assert env4['LIST'] == ['a'], env4['LIST']
+        assert env1['DICT'] == {'x' : ['1']}, env1['DICT']
+        assert env2['DICT'] == {'x' : ['1', '2']}, env2['DICT']
+        assert env3['DICT'] == {'x' : ['1'], 'PATH' : '/bin'}, env3['DICT']
+        assert env4.Dictionary()['DICT'] == {'x' : ['1']}, env4['DICT']
+
+        # A value changed in place after a clone gets copied again.
+        env5 = env1.Clone()
+        assert env5['LIST'] == ['a', 'b'], env5['LIST']
+
+    def test_get_version(self):
+        """Test the version numbers of construction variables"""
+        env = self.TestEnvironment(XXX = 'x', LIST = ['a'])
+        versions = [env.get_version()]
+        def changed(env=env, versions=versions):
+            v = env.get_version()
+            result = v not in versions
+            versions.append(v)
+            return result
+
+        env['XXX']
+        env.Dictionary()
+        assert not changed()
+        env['XXX'] = 'y'
+        assert changed()
+        env.Append(LIST = ['b'])
+        assert changed()
+        env.PrependUnique(LIST = ['b'])
+        assert changed()
+        env.AppendENVPath('PATH', '/bin')
+        assert changed()
+        env.Replace()
+        assert not changed()
+        env.Replace(YYY = 'y')
+        assert changed()
+        env['BUILDERS']['Foo'] = SCons.Builder.Builder(action = 'foo')
+        assert changed()
+        del env['YYY']
+        assert changed()
+
+        # A clone gets a version of its own, and a new one once it
+        # hands out a value it was sharing, since that value may get
+        # changed in place.
+        clone = env.Clone()
+        assert clone.get_version() != env.get_version()
+        assert not changed()
+        v = clone.get_version()
+        clone['LIST'].append('c')
+        assert clone.get_version() != v
+        v = clone.get_version()
+        clone['LIST'].append('d')
+        assert clone.get_version() == v
+        assert env['LIST'] == ['a', 'b'], env['LIST']
+        clone = env.Clone(XXX = 'z')
+        assert clone.get_version() != env.get_version()
+
+        o = env.Override({'XXX' : 'o'})
+        v = o.get_version()
+        o['YYY'] = 'o'
+        assert o.get_version() != v
+        v = o.get_version()
+        env['ZZZ'] = 'z'
+        assert o.get_version() != v
+
 
     def test_Copy(self):
         """Test copying using the old env.Copy() method"""
@@ -1882,6 +1968,22 @@ def generate(env):
         assert env1 != env2
         assert env1 == env1copy
 
+    def test_decides_by_content(self):
+        """Test asking whether an environment decides by content"""
+        env = self.TestEnvironment()
+        # The default is the default environment's, which is MD5.
+        assert env.decides_by_content()
+        env.Decider('timestamp-newer')
+        assert not env.decides_by_content()
+        env.Decider('MD5-timestamp')
+        assert not env.decides_by_content()
+        env.Decider('content')
+        assert env.decides_by_content()
+        env2 = env.Clone()
+        assert env2.decides_by_content()
+        env.Decider(lambda dependency, target, prev_ni: 1)
+        assert not env.decides_by_content()
+
     def test_Detect(self):
         """Test Detect()ing tools"""
         test = TestCmd.TestCmd(workdir = '')
@@ -2742,6 +2844,45 @@ def generate(env):
 
         env.CacheDir('$CD')
         assert env._CacheDir_path == 'CacheDir', env._CacheDir_path
+        assert env._CacheDir_max_size is None, env._CacheDir_max_size
+
+        env = self.TestEnvironment(SIZE = '2M')
+        env.CacheDir('foo', '$SIZE')
+        assert env._CacheDir_max_size == 2*1024*1024, env._CacheDir_max_size
+        assert env.get_CacheDir().max_size == 2*1024*1024
+        assert env.get_CacheDir().mode == 'copy', env.get_CacheDir().mode
+
+        env.CacheDir('foo', mode = 'link')
+        assert env._CacheDir_mode == 'link', env._CacheDir_mode
+        assert env.get_CacheDir().mode == 'link', env.get_CacheDir().mode
+
+        try:
+            env.CacheDir('foo', mode = 'symlink')
+        except SCons.Errors.UserError:
+            pass
+        else:
+            self.fail("did not catch an invalid CacheDir mode")
+
+        env.CacheDir('foo', compress = 'gzip')
+        assert env._CacheDir_compress == 'gzip', env._CacheDir_compress
+        assert env.get_CacheDir().compress == 'gzip', env.get_CacheDir().compress
+
+        try:
+            env.CacheDir('foo', compress = 'zip')
+        except SCons.Errors.UserError:
+            pass
+        else:
+            self.fail("did not catch an invalid CacheDir compress format")
+
+        env = self.TestEnvironment(LOCAL = 'local', SIZE = '2M')
+        env.CacheDir(['$LOCAL', 'shared'], ['$SIZE', None], mode = ['link'])
+        assert env._CacheDir_path == ['local', 'shared'], env._CacheDir_path
+        assert env._CacheDir_max_size == [2*1024*1024, None], env._CacheDir_max_size
+        cd = env.get_CacheDir()
+        assert isinstance(cd, SCons.CacheDir.TieredCacheDir), cd
+        tiers = [(t.path, t.max_size, t.mode) for t in cd.get_tiers()]
+        assert tiers == [('local', 2*1024*1024, 'link'),
+                         ('shared', None, 'copy')], tiers
 
     def test_Clean(self):
         """Test the Clean() method"""
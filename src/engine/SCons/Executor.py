@@ -280,14 +280,34 @@ class Executor(object):
             result.extend(target.side_effects)
         return result
 
-    memoizer_counters.append(SCons.Memoize.CountValue('get_build_env'))
+    def _get_build_env_key(self):
+        import SCons.Defaults
+        env = self.env or SCons.Defaults.DefaultEnvironment()
+        try:
+            return env.get_version()
+        except AttributeError:
+            return None
+
+    memoizer_counters.append(SCons.Memoize.CountDict('get_build_env', _get_build_env_key))
 
     def get_build_env(self):
         """Fetch or create the appropriate build Environment
         for this Executor.
+
+        The overrides get evaluated against the environment's
+        construction variables, so this is memoized for each version
+        of them.
         """
+        import SCons.Defaults
+        env = self.env or SCons.Defaults.DefaultEnvironment()
+        try:
+            memo_key = env.get_version()
+        except AttributeError:
+            # Something that's not a construction environment (and so
+            # doesn't track changes).
+            memo_key = None
         try:
-            return self._memo['get_build_env']
+            return self._memo['get_build_env'][memo_key]
         except KeyError:
             pass
 
@@ -300,11 +320,10 @@ class Executor(object):
         for odict in self.overridelist:
             overrides.update(odict)
 
-        import SCons.Defaults
-        env = self.env or SCons.Defaults.DefaultEnvironment()
         build_env = env.Override(overrides)
 
-        self._memo['get_build_env'] = build_env
+        # Only the one for the current version is worth keeping.
+        self._memo['get_build_env'] = {memo_key : build_env}
 
         return build_env
 
@@ -486,6 +505,24 @@ class Executor(object):
         for tgt in self.get_all_targets():
             tgt.add_to_implicit(deps)
 
+    def prefetch_sources(self, scanner):
+        """Starts reading and searching the sources that scan_sources()
+        will scan, in the background (see Scanner.Base.prefetch())."""
+        if not self.batches[0].sources:
+            return
+        env = self.get_build_env()
+        if scanner:
+            for node in self.get_all_sources():
+                s = scanner.select(node)
+                if s:
+                    s.prefetch(node, env)
+        else:
+            kw = self.get_kw()
+            for node in self.get_all_sources():
+                s = node.get_env_scanner(env, kw)
+                if s:
+                    s.prefetch(node, env)
+
     def _get_unignored_sources_key(self, node, ignore=()):
         return (node,) + tuple(ignore)
 
@@ -99,6 +99,9 @@ class MyScanner(object):
         return ()
     def select(self, node):
         return self
+    def prefetch(self, node, env=None):
+        node.prefetched = self.prefix
+        node.prefetched_for = env
 
 class ExecutorTestCase(unittest.TestCase):
 
@@ -171,6 +174,22 @@ class ExecutorTestCase(unittest.TestCase):
         assert be['O'] == 'ob3', be['O']
         assert be['Y'] == 'yyy', be['Y']
 
+        # A build environment gets re-created when the variables change.
+        class VersionedEnvironment(MyEnvironment):
+            version = 1
+            def get_version(self):
+                return self.version
+        env = VersionedEnvironment(Y='yyy')
+        x = SCons.Executor.Executor(MyAction(), env, [{'O':'o4'}], ['t'], ['s'])
+        be = x.get_build_env()
+        assert x.get_build_env() is be
+        env._update({'Y' : 'y4'})
+        assert x.get_build_env() is be
+        env.version = 2
+        be = x.get_build_env()
+        assert be['O'] == 'o4', be['O']
+        assert be['Y'] == 'y4', be['Y']
+
     def test_get_build_scanner_path(self):
         """Test fetching the path for the specified scanner."""
         t = MyNode('t')
@@ -430,6 +449,25 @@ class ExecutorTestCase(unittest.TestCase):
         assert t1.implicit == ['scanner-s1', 'scanner-s2'], t1.implicit
         assert t2.implicit == ['scanner-s1', 'scanner-s2'], t2.implicit
 
+    def test_prefetch_sources(self):
+        """Test prefetching the sources to be scanned"""
+        env = MyEnvironment(S='string')
+        t1 = MyNode('t1')
+        s1 = MyNode('s1')
+        s2 = MyNode('s2')
+        x = SCons.Executor.Executor(MyAction(), env, [{}], [t1], [s1, s2])
+
+        x.prefetch_sources(None)
+        assert s1.prefetched == 'dep-', s1.prefetched
+        assert s2.prefetched == 'dep-', s2.prefetched
+
+        x.prefetch_sources(MyScanner('scanner-'))
+        assert s1.prefetched == 'scanner-', s1.prefetched
+        assert s2.prefetched == 'scanner-', s2.prefetched
+        assert s1.prefetched_for is x.get_build_env(), s1.prefetched_for
+        # Nothing got scanned.
+        assert t1.implicit == [], t1.implicit
+
     def test_get_unignored_sources(self):
         """Test fetching the unignored source list"""
         env = MyEnvironment()
@@ -0,0 +1,439 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+__doc__ = """
+CacheDir servers
+
+A CacheDir() given an http:// URL keeps its files on a server instead
+of in a directory.  The protocol is plain HTTP on the same layout as
+a cache directory:  the file for build signature SIG is at URL/S/SIG
+(where S is the first character of SIG, upper-cased), and a HEAD
+request asks whether it's there, a GET fetches it, and a PUT stores
+it.  The X-SCons-Mode header carries the file's permissions.  Since
+the files are named by their contents' signature, a server never has
+to worry about two builds storing different files under one name.
+
+All of the threads of a build (the job threads, the threads looking
+for files ahead of the tasks that retrieve them, and the ones pushing
+files in the background) share a pool of keep-alive connections to
+the server.  If the server can't be reached, there's a warning, and
+the build goes on without the cache.
+
+serve() runs a small, threaded server for a local directory, which is
+enough for a team to share a cache without a network file system:
+
+    python -c "import SCons.HTTPCache; SCons.HTTPCache.serve('/var/cache/scons', '0.0.0.0:8080')"
+
+It doesn't evict anything or check who's asking, so it should only be
+reachable from trusted systems.  Unless given a host to listen on
+(0.0.0.0 for all interfaces, as above), it only listens on the
+loopback interface.
+"""
+
+import BaseHTTPServer
+import errno
+import httplib
+import os
+import re
+import shutil
+import socket
+import SocketServer
+import stat
+import sys
+import tempfile
+import threading
+
+import SCons.CacheDir
+import SCons.Errors
+import SCons.Util
+import SCons.Warnings
+
+# The header that carries a cached file's permissions, in octal.
+mode_header = 'X-SCons-Mode'
+
+# How long (in seconds) to wait on the server before giving up on it.
+timeout = 60
+
+_url_re = re.compile(r'http://([^/:]+)(?::(\d+))?(/.*)?$')
+
+# The interface serve() listens on if it's only given a port.
+default_serve_host = '127.0.0.1'
+
+# What can go wrong talking to a server.
+_errors = (httplib.HTTPException, socket.error)
+
+def parse_url(url):
+    """Splits a cache server URL into its host, port and path (which
+    always ends in a slash)."""
+    m = _url_re.match(url)
+    if not m:
+        raise SCons.Errors.UserError("Invalid CacheDir URL: %s" % url)
+    host, port, path = m.groups()
+    if port:
+        port = int(port)
+    else:
+        port = 80
+    if not path:
+        path = '/'
+    if not path.endswith('/'):
+        path = path + '/'
+    return host, port, path
+
+class HTTPCacheDir(SCons.CacheDir.CacheDir):
+    """
+    A CacheDir on a server.  The server decides what to keep, so a
+    max_size doesn't apply, and files always have to be copied, so
+    neither does mode='link'.  Files are pushed in the background, and
+    symbolic links aren't cached at all.
+    """
+    remote = True
+
+    def __init__(self, url, max_size=None, mode=None, compress=None):
+        SCons.CacheDir.CacheDir.__init__(self, url, None, mode, compress)
+        self.url = url
+        self.host, self.port, self.base = parse_url(url)
+        if SCons.Util.hash_format_suffix():
+            self.base = self.base + SCons.Util.hash_format + '/'
+        # The connections to the server that aren't in use, and whether
+        # we've given up on the server.
+        self.idle = []
+        self.lock = threading.Lock()
+        self.broken = 0
+
+    def cachepath(self, node):
+        if not self.is_enabled():
+            return None, None
+        sig = node.get_cachedir_bsig()
+        if self.compress:
+            sig = sig + SCons.CacheDir.compress_formats[self.compress][0]
+        dir = self.base + sig[0].upper()
+        return dir, dir + '/' + sig
+
+    def get_connection(self):
+        """Returns an idle connection to the server, or a new one, and
+        whether it's been used before."""
+        self.lock.acquire()
+        try:
+            if self.idle:
+                return self.idle.pop(), 1
+        finally:
+            self.lock.release()
+        conn = httplib.HTTPConnection(self.host, self.port, timeout=timeout)
+        conn.connect()
+        # Requests and replies are small and go back and forth, so
+        # don't let them wait on each other's acknowledgements.
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn, 0
+
+    def release(self, conn, response):
+        """Gives back a connection once its response has been read."""
+        if response.will_close:
+            conn.close()
+            return
+        self.lock.acquire()
+        try:
+            self.idle.append(conn)
+        finally:
+            self.lock.release()
+
+    def request(self, method, url, body=None, headers={}):
+        """
+        Sends a request to the server, and returns the connection it
+        went over and the response.  The response has to be read to
+        the end before the connection is given back with release().
+        """
+        while True:
+            conn, reused = self.get_connection()
+            try:
+                if body is not None:
+                    body.seek(0)
+                conn.request(method, url, body, headers)
+                return conn, conn.getresponse()
+            except _errors:
+                conn.close()
+                if not reused:
+                    raise
+                # The server closed a connection that sat idle for too
+                # long; try another one.
+
+    def unreachable(self, e):
+        """Gives up on the server, with a warning the first time."""
+        self.lock.acquire()
+        try:
+            if self.broken:
+                return
+            self.broken = 1
+        finally:
+            self.lock.release()
+        msg = "Could not reach CacheDir server %s (%s); not using it." % (self.url, e)
+        SCons.Warnings.warn(SCons.Warnings.CacheServerWarning, msg)
+
+    def exists(self, fs, cachefile):
+        if self.broken:
+            return False
+        try:
+            conn, response = self.request('HEAD', cachefile)
+            response.read()
+            self.release(conn, response)
+        except _errors, e:
+            self.unreachable(e)
+            return False
+        return response.status == 200
+
+    def fetch(self, fs, cachefile, t, env):
+        if self.compress:
+            path = t.path + '.tmp' + str(os.getpid())
+        else:
+            path = t.path
+        try:
+            if self.broken:
+                raise IOError(errno.ENOENT, "not in cache", cachefile)
+            try:
+                conn, response = self.request('GET', cachefile)
+                if response.status != 200:
+                    response.read()
+                    self.release(conn, response)
+                    raise IOError(errno.ENOENT, "not in cache", cachefile)
+                if fs.exists(path) or fs.islink(path):
+                    fs.unlink(path)
+                length = response.getheader('content-length')
+                SCons.CacheDir._stream(response, open(path, 'wb'), path)
+                size = fs.stat(path)[stat.ST_SIZE]
+                if length is not None and size != int(length):
+                    # httplib just stops reading when the server closes
+                    # the connection early, so a download cut short has
+                    # to be caught here.  Rebuild rather than use it.
+                    conn.close()
+                    fs.unlink(path)
+                    raise IOError(errno.EIO,
+                                  "got %d of %s bytes" % (size, length),
+                                  cachefile)
+                self.release(conn, response)
+            except _errors, e:
+                self.unreachable(e)
+                raise IOError(errno.EIO, str(e), cachefile)
+            if self.compress:
+                SCons.CacheDir.decompress_file(path, t.path, self.compress)
+        finally:
+            if self.compress and fs.exists(path):
+                fs.unlink(path)
+        mode = response.getheader(mode_header)
+        if mode:
+            mode = int(mode, 8)
+        else:
+            mode = 0644
+        fs.chmod(t.path, stat.S_IMODE(mode) | stat.S_IWRITE)
+        return size
+
+    def store(self, fs, target, cachedir, cachefile):
+        t = target[0]
+        if self.broken or fs.islink(t.path):
+            return None
+        st = fs.stat(t.path)
+        path = t.path
+        if self.compress:
+            path = t.path + '.tmp' + str(os.getpid())
+            SCons.CacheDir.compress_file(t.path, path, self.compress)
+        try:
+            size = fs.stat(path)[stat.ST_SIZE]
+            headers = {
+                'Content-Length' : str(size),
+                'Content-Type'   : 'application/octet-stream',
+                mode_header      : '%o' % stat.S_IMODE(st[stat.ST_MODE]),
+            }
+            f = open(path, 'rb')
+            try:
+                try:
+                    conn, response = self.request('PUT', cachefile, f, headers)
+                    response.read()
+                    self.release(conn, response)
+                except _errors, e:
+                    self.unreachable(e)
+                    raise IOError(errno.EIO, str(e), cachefile)
+            finally:
+                f.close()
+        finally:
+            if self.compress:
+                fs.unlink(path)
+        if response.status not in (200, 201, 204):
+            raise IOError(errno.EIO,
+                          "%d %s" % (response.status, response.reason),
+                          cachefile)
+        if self.compress:
+            self.compress_debug(t, cachefile, st[stat.ST_SIZE], size)
+        return size
+
+# The server side.
+
+# The names of files (and the directories they're in) a server will
+# touch; in particular, nothing starting with a dot.
+_name_re = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_.-]*$')
+
+class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serves the files in a server's root directory:  HEAD and GET
+    fetch them, and PUT stores them."""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def local_path(self):
+        """Returns the file the request is for, or None if it's for
+        something we won't serve."""
+        names = [n for n in self.path.split('?')[0].split('/') if n]
+        if not names:
+            return None
+        for name in names:
+            if not _name_re.match(name):
+                return None
+        return os.path.join(self.server.root, *names)
+
+    def reply(self, code, length=0, mode=None):
+        self.send_response(code)
+        self.send_header('Content-Length', str(length))
+        if mode is not None:
+            self.send_header(mode_header, '%o' % mode)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.send_file(0)
+
+    def do_GET(self):
+        self.send_file(1)
+
+    def send_file(self, body):
+        path = self.local_path()
+        if path is None:
+            self.reply(404)
+            return
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            self.reply(404)
+            return
+        try:
+            st = os.fstat(f.fileno())
+            self.reply(200, st[stat.ST_SIZE], stat.S_IMODE(st[stat.ST_MODE]))
+            if body:
+                shutil.copyfileobj(f, self.wfile, 65536)
+        finally:
+            f.close()
+
+    def do_PUT(self):
+        try:
+            length = int(self.headers['Content-Length'])
+        except (KeyError, TypeError, ValueError):
+            self.close_connection = 1
+            self.reply(411)
+            return
+        path = self.local_path()
+        if path is None:
+            self.close_connection = 1
+            self.reply(403)
+            return
+        dir = os.path.dirname(path)
+        if not os.path.isdir(dir):
+            try:
+                os.makedirs(dir)
+            except OSError:
+                # Another request may have beaten us to it.
+                if not os.path.isdir(dir):
+                    raise
+        # Write to a temporary file first, so that nobody ever gets a
+        # partial file.
+        fd, temp = tempfile.mkstemp(prefix='.put', dir=dir)
+        try:
+            f = os.fdopen(fd, 'wb')
+            try:
+                while length > 0:
+                    data = self.rfile.read(min(length, 65536))
+                    if not data:
+                        raise IOError(errno.EIO, "short request body")
+                    f.write(data)
+                    length = length - len(data)
+            finally:
+                f.close()
+            mode = self.headers.get(mode_header)
+            if mode:
+                mode = int(mode, 8)
+            else:
+                mode = 0644
+            os.chmod(temp, stat.S_IMODE(mode) | stat.S_IRUSR | stat.S_IWUSR)
+            os.rename(temp, path)
+        except:
+            os.unlink(temp)
+            raise
+        self.reply(201)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """A cache server for the directory root, serving each connection
+    in its own thread."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, root, address, verbose=0):
+        BaseHTTPServer.HTTPServer.__init__(self, address, RequestHandler)
+        self.root = root
+        self.verbose = verbose
+
+def parse_address(address):
+    """Splits a "[HOST:]PORT" string into a (host, port) tuple."""
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+    else:
+        host, port = default_serve_host, address
+    try:
+        return host, int(port)
+    except ValueError:
+        raise SCons.Errors.UserError("Invalid CacheDir server address: %s" % address)
+
+def serve(root, address, stdout=None, verbose=0):
+    """Runs a cache server for the directory root, listening on the
+    "[HOST:]PORT" address.  Never returns."""
+    if stdout is None:
+        stdout = sys.stdout
+    server = Server(root, parse_address(address), verbose)
+    host, port = server.server_address[:2]
+    stdout.write("scons: CacheDir server for %s listening on %s:%d\n"
+                 % (root, host, port))
+    stdout.flush()
+    server.serve_forever()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.stderr.write("Usage: %s DIRECTORY [HOST:]PORT\n" % sys.argv[0])
+        sys.exit(2)
+    serve(sys.argv[1], sys.argv[2], verbose=1)
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
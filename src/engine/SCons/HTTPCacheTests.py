@@ -0,0 +1,269 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import httplib
+import os
+import socket
+import stat
+import sys
+import threading
+import unittest
+
+from TestCmd import TestCmd
+
+import SCons.CacheDir
+import SCons.Errors
+import SCons.HTTPCache
+import SCons.Node.FS
+import SCons.Warnings
+
+class Builder(object):
+    def __init__(self, environment):
+        self.env = environment
+        self.overrides = {}
+        self.source_scanner = None
+        self.target_scanner = None
+
+class Environment(object):
+    def __init__(self, cachedir):
+        self.cachedir = cachedir
+    def Override(self, overrides):
+        return self
+    def get_CacheDir(self):
+        return self.cachedir
+
+class URLTestCase(unittest.TestCase):
+
+    def test_parse_url(self):
+        """Test parsing cache server URLs"""
+        parse_url = SCons.HTTPCache.parse_url
+        assert parse_url('http://host:8080/') == ('host', 8080, '/')
+        assert parse_url('http://host') == ('host', 80, '/')
+        assert parse_url('http://host/a/b') == ('host', 80, '/a/b/')
+        for bad in ['host:8080', 'http://host:port/', 'ftp://host/']:
+            try:
+                parse_url(bad)
+            except SCons.Errors.UserError:
+                pass
+            else:
+                self.fail("did not catch bad URL %s" % repr(bad))
+
+    def test_parse_address(self):
+        """Test parsing the addresses for serve()"""
+        parse_address = SCons.HTTPCache.parse_address
+        assert parse_address('8080') == ('127.0.0.1', 8080)
+        assert parse_address('0.0.0.0:8080') == ('0.0.0.0', 8080)
+        self.assertRaises(SCons.Errors.UserError, parse_address, 'x:y')
+
+    def test_create(self):
+        """Test creating a CacheDir for a URL"""
+        cd = SCons.CacheDir.create('http://localhost:8080/cache')
+        assert isinstance(cd, SCons.HTTPCache.HTTPCacheDir), cd
+        assert cd.remote
+        cd = SCons.CacheDir.create('cache')
+        assert not isinstance(cd, SCons.HTTPCache.HTTPCacheDir), cd
+
+class ServerTestCase(unittest.TestCase):
+    """
+    Test an HTTPCacheDir talking to a server in another thread.
+    """
+    def setUp(self):
+        self.test = TestCmd(workdir='')
+        self.test.subdir('root')
+        self.root = self.test.workpath('root')
+        self.server = SCons.HTTPCache.Server(self.root, ('127.0.0.1', 0))
+        t = threading.Thread(target=self.server.serve_forever)
+        t.setDaemon(1)
+        t.start()
+        self.url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+        self.fs = SCons.Node.FS.FS()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def File(self, cd, name, bsig):
+        node = self.fs.File(self.test.workpath(name))
+        node.builder_set(Builder(Environment(cd)))
+        node.cachesig = bsig
+        return node
+
+    def test_push_retrieve(self):
+        """Test pushing files to and retrieving them from a server"""
+        cd = SCons.HTTPCache.HTTPCacheDir(self.url)
+        env = Environment(cd)
+        f1 = self.File(cd, 'f1', 'a_fake_bsig')
+        self.test.write('f1', 'f1\n')
+        os.chmod(self.test.workpath('f1'), 0755)
+
+        assert not cd.exists(self.fs, cd.cachepath(f1)[1])
+        cd.push_file([f1])
+        assert cd.exists(self.fs, cd.cachepath(f1)[1])
+        assert self.test.read(['root', 'A', 'a_fake_bsig']) == 'f1\n'
+
+        os.unlink(self.test.workpath('f1'))
+        assert cd.retrieve_file([f1], env) == 0
+        assert self.test.read('f1') == 'f1\n'
+        mode = stat.S_IMODE(os.stat(self.test.workpath('f1'))[stat.ST_MODE])
+        assert mode == 0755, oct(mode)
+
+        f2 = self.File(cd, 'f2', 'another_fake_bsig')
+        assert cd.retrieve_file([f2], env) == 1
+        assert not os.path.exists(self.test.workpath('f2'))
+
+        # All of that went over one connection.
+        assert len(cd.idle) == 1, cd.idle
+
+    def test_compress(self):
+        """Test a compressed cache on a server"""
+        cd = SCons.HTTPCache.HTTPCacheDir(self.url, compress = 'gzip')
+        env = Environment(cd)
+        f1 = self.File(cd, 'f1', 'a_fake_bsig')
+        self.test.write('f1', 'f1\n' * 1000)
+
+        cd.push_file([f1])
+        size = os.path.getsize(self.test.workpath('root', 'A', 'a_fake_bsig.gz'))
+        assert size < 3000, size
+
+        os.unlink(self.test.workpath('f1'))
+        assert cd.retrieve_file([f1], env) == 0
+        assert self.test.read('f1') == 'f1\n' * 1000
+        # The compressed download is gone.
+        files = sorted(os.listdir(self.test.workpath()))
+        assert files == ['f1', 'root'], files
+
+    def test_incomplete_read(self):
+        """Test that a download cut short leaves no file behind"""
+        class Response(object):
+            reads = 0
+            def read(self, size):
+                self.reads = self.reads + 1
+                if self.reads > 1:
+                    raise httplib.IncompleteRead('part')
+                return 'part'
+        path = self.test.workpath('f1')
+        self.assertRaises(httplib.IncompleteRead, SCons.CacheDir._stream,
+                          Response(), open(path, 'wb'), path)
+        assert not os.path.exists(path)
+
+    def test_stale_connection(self):
+        """Test that a connection the server closed gets replaced"""
+        cd = SCons.HTTPCache.HTTPCacheDir(self.url)
+        assert not cd.exists(self.fs, '/A/a_fake_bsig')
+        assert len(cd.idle) == 1, cd.idle
+        cd.idle[0].sock.shutdown(socket.SHUT_RDWR)
+        assert not cd.exists(self.fs, '/A/a_fake_bsig')
+        assert not cd.broken
+
+    def test_unsafe_paths(self):
+        """Test that the server only touches files under its root"""
+        conn = httplib.HTTPConnection('127.0.0.1', self.server.server_address[1])
+        for path in ['/../outside', '/A/.hidden', '/']:
+            conn.request('PUT', path, 'x', {'Content-Length' : '1'})
+            response = conn.getresponse()
+            response.read()
+            assert response.status == 403, (path, response.status)
+            conn.close()
+        assert not os.path.exists(self.test.workpath('outside'))
+        assert os.listdir(self.root) == [], os.listdir(self.root)
+
+class UnreachableTestCase(unittest.TestCase):
+
+    def test_unreachable(self):
+        """Test giving up on a server that can't be reached"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        cd = SCons.HTTPCache.HTTPCacheDir('http://127.0.0.1:%d/' % port)
+        SCons.Warnings.enableWarningClass(SCons.Warnings.CacheServerWarning)
+        save_warningAsException = SCons.Warnings.warningAsException(1)
+        try:
+            try:
+                cd.exists(None, '/A/a_fake_bsig')
+            except SCons.Warnings.CacheServerWarning, e:
+                assert 'not using it' in str(e), e
+            else:
+                self.fail("did not warn about an unreachable server")
+            assert cd.broken
+            assert not cd.exists(None, '/A/a_fake_bsig')
+        finally:
+            SCons.Warnings.warningAsException(save_warningAsException)
+
+class TruncatedTestCase(unittest.TestCase):
+
+    def test_truncated(self):
+        """Test that a download cut short isn't used"""
+        test = TestCmd(workdir='')
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(1)
+        port = sock.getsockname()[1]
+        def serve():
+            # Says it has the file, then sends 5 of its 100 bytes.
+            for body in ['', 'TRUNC']:
+                conn, addr = sock.accept()
+                conn.recv(4096)
+                conn.sendall('HTTP/1.1 200 OK\r\n'
+                             'Content-Length: 100\r\n'
+                             'Connection: close\r\n'
+                             '\r\n' + body)
+                conn.close()
+        t = threading.Thread(target=serve)
+        t.setDaemon(1)
+        t.start()
+
+        cd = SCons.HTTPCache.HTTPCacheDir('http://127.0.0.1:%d/' % port)
+        fs = SCons.Node.FS.FS()
+        f1 = fs.File(test.workpath('f1'))
+        f1.builder_set(Builder(Environment(cd)))
+        f1.cachesig = 'a_fake_bsig'
+        try:
+            assert cd.retrieve_file([f1], Environment(cd)) == 1
+        finally:
+            t.join()
+            sock.close()
+        assert not os.path.exists(test.workpath('f1'))
+        assert cd.idle == [], cd.idle
+
+if __name__ == "__main__":
+    suite = unittest.TestSuite()
+    tclasses = [ URLTestCase,
+                 ServerTestCase,
+                 UnreachableTestCase,
+                 TruncatedTestCase,
+               ]
+    for tclass in tclasses:
+        names = unittest.getTestCaseNames(tclass, 'test_')
+        suite.addTests(list(map(tclass, names)))
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
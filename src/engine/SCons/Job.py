@@ -34,9 +34,15 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import SCons.compat
 
 import os
+# compat layer imports "cPickle" for us if it's available.
+import pickle
 import signal
+import sys
+import time
 
+import SCons.Action
 import SCons.Errors
+import SCons.Node.FS
 
 # The default stack size (in kilobytes) of the threads used to execute
 # jobs in parallel.
@@ -51,6 +57,83 @@ default_stack_size = 256
 
 interrupt_msg = 'Build interrupted.'
 
+# How parallel builds execute tasks:
+#
+#   thread      Every task runs in a worker thread.
+#
+#   process     Targets built only by Python function actions that
+#               can be pickled are built in a pool of worker processes
+#               (forked once the SConscript files have been read, so
+#               they have their own copies of the dependency graph),
+#               so they don't hold each other (or the worker threads)
+#               up on the global interpreter lock.  Everything else runs
+#               in worker threads as usual.
+backend_types = ['thread', 'process']
+backend = 'thread'
+
+# Like GNU make's -l option, parallel builds don't start any new jobs
+# while there are others running and the system load average is at
+# least max_load, or (on systems with a /proc/meminfo file) while less
+# than min_free_memory megabytes of memory are available.  Both are set
+# from the command line; None means no limit.
+max_load = None
+min_free_memory = None
+
+# How often (in seconds) a throttled parallel build checks whether it
+# can start more jobs, when none of its running jobs have finished.
+throttle_interval = 1.0
+
+meminfo_file = '/proc/meminfo'
+
+def load_average():
+    """Returns the system's one-minute load average, or None if it's
+    not available on this system."""
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+def free_memory():
+    """Returns how many megabytes of memory are available for starting
+    new jobs, or None if we can't tell on this system."""
+    try:
+        f = open(meminfo_file, 'r')
+        try:
+            lines = f.readlines()
+        finally:
+            f.close()
+    except (IOError, OSError):
+        return None
+    kbytes = {}
+    for line in lines:
+        try:
+            name, value = line.split(':', 1)
+            kbytes[name] = int(value.split()[0])
+        except (ValueError, IndexError):
+            pass
+    try:
+        available = kbytes['MemAvailable']
+    except KeyError:
+        # Older Linux kernels don't estimate it for us.
+        try:
+            available = kbytes['MemFree'] + \
+                        kbytes.get('Buffers', 0) + kbytes.get('Cached', 0)
+        except KeyError:
+            return None
+    return available // 1024
+
+def overloaded():
+    """Returns whether the system is too busy to start another job."""
+    if max_load:
+        load = load_average()
+        if load is not None and load >= max_load:
+            return True
+    if min_free_memory:
+        free = free_memory()
+        if free is not None and free < min_free_memory:
+            return True
+    return False
+
 
 class InterruptState(object):
    def __init__(self):
@@ -113,6 +196,12 @@ class Jobs(object):
             postfunc()
             self._reset_sig_handler()
 
+    def dispatch_latencies(self):
+        """Returns how long (in seconds) each task executed in parallel
+        waited to be picked up by a worker after one was free to run
+        it.  Serial jobs don't wait, so this is empty for them."""
+        return self.job.dispatch_latencies
+
     def were_interrupted(self):
         """Returns whether the jobs were interrupted by a signal."""
         return self.job.interrupted()
@@ -182,6 +271,7 @@ class Serial(object):
         
         self.taskmaster = taskmaster
         self.interrupted = InterruptState()
+        self.dispatch_latencies = []
 
     def start(self):
         """Start the job. This will begin pulling tasks from the taskmaster
@@ -219,31 +309,165 @@ class Serial(object):
         self.taskmaster.cleanup()
 
 
+# The process backend needs both the multiprocessing module and fork(),
+# since the worker processes find the targets to build in the copy of
+# the dependency graph they inherit from us.  We only import it when
+# someone asks for the process backend.
+multiprocessing = None
+
+def have_multiprocessing():
+    """Returns whether the process backend is available, importing the
+    multiprocessing module the first time through."""
+    global multiprocessing
+    if multiprocessing is None:
+        if not hasattr(os, 'fork'):
+            multiprocessing = False
+            return False
+        # The multiprocessing module subclasses the pure-Python
+        # pickle.Pickler, which the compat layer replaces with cPickle,
+        # so put the real pickle module back while we import the parts
+        # of it we use.
+        import imp
+        save_pickle = sys.modules.get('pickle')
+        try:
+            try:
+                imp.load_module('pickle', *imp.find_module('pickle'))
+                import multiprocessing.forking
+                import multiprocessing.pool
+            except ImportError:
+                multiprocessing = False
+        finally:
+            sys.modules['pickle'] = save_pickle
+    return bool(multiprocessing)
+
+def _init_process_worker():
+    # The parent SCons process handles interrupts for everybody.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _build_in_process(path):
+    """
+    Builds the target with the specified path in a worker process.
+
+    Returns None if the target was built, False if this process doesn't
+    know how to build it (it was created after we were forked), or an
+    (errstr, status, exitstatus, filename) tuple describing the error.
+    """
+    node = SCons.Node.FS.get_default_fs().Entry(path)
+    if not node.has_builder():
+        return False
+    executor = node.get_executor()
+    # Forget anything we remember about files that were built (by
+    # the parent process or other workers) since we were forked.
+    for n in executor.get_all_targets() + executor.get_all_sources():
+        n.clear_memoized_values()
+    try:
+        try:
+            node.build()
+        except KeyboardInterrupt:
+            raise
+        except Exception, e:
+            e = SCons.Errors.convert_to_BuildError(e)
+            return (e.errstr, e.status, e.exitstatus, e.filename)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    return None
+
+class ProcessPool(object):
+    """This class decides which targets can be built in worker
+    processes, and builds them there."""
+
+    def __init__(self, num):
+        self.pool = multiprocessing.Pool(num, _init_process_worker)
+        # id(action) => (action, whether it can be shipped)
+        self.shippable = {}
+
+    def _can_ship(self, action):
+        try:
+            return self.shippable[id(action)][1]
+        except KeyError:
+            pass
+        if isinstance(action, SCons.Action.ListAction):
+            result = True
+            for a in action.list:
+                if not self._can_ship(a):
+                    result = False
+                    break
+        elif isinstance(action, SCons.Action.FunctionAction):
+            # A function that can't be pickled (a lambda, a nested
+            # function, or one defined in an SConscript file) may
+            # depend on state that the worker processes don't share.
+            try:
+                pickle.dumps(action.execfunction, 1)
+            except KeyboardInterrupt:
+                raise
+            except Exception:
+                result = False
+            else:
+                result = True
+        else:
+            result = False
+        self.shippable[id(action)] = (action, result)
+        return result
+
+    def can_build(self, node):
+        """Returns whether the specified target can be built in a
+        worker process."""
+        if not isinstance(node, SCons.Node.FS.Base):
+            return False
+        actions = node.get_executor().get_action_list()
+        if not actions:
+            return False
+        for action in actions:
+            if not self._can_ship(action):
+                return False
+        return True
+
+    def build(self, node):
+        """Builds the specified target in a worker process, if it can
+        be.  Returns whether it was built."""
+        if not self.can_build(node):
+            return False
+        result = self.pool.apply(_build_in_process, (node.get_abspath(),))
+        if result is False:
+            return False
+        if result is not None:
+            errstr, status, exitstatus, filename = result
+            raise SCons.Errors.BuildError(node, errstr, status, exitstatus,
+                                          filename)
+        return True
+
+    def cleanup(self):
+        self.pool.close()
+        self.pool.join()
+
 # Trap import failure so that everything in the Job module but the
 # Parallel class (and its dependent classes) will work if the interpreter
 # doesn't support threads.
 try:
+    import collections
     import queue
     import threading
 except ImportError:
     pass
 else:
     class Worker(threading.Thread):
-        """A worker thread waits on a task to be posted to its request queue,
-        dequeues the task, executes it, and posts a tuple including the task
-        and a boolean indicating whether the task executed successfully. """
+        """A worker thread waits on a task to be posted to its pool's
+        requests, executes it, and posts a tuple including the task and
+        a boolean indicating whether the task executed successfully
+        to its pool's results. """
 
-        def __init__(self, requestQueue, resultsQueue, interrupted):
+        def __init__(self, pool, interrupted):
             threading.Thread.__init__(self)
             self.setDaemon(1)
-            self.requestQueue = requestQueue
-            self.resultsQueue = resultsQueue
+            self.pool = pool
             self.interrupted = interrupted
             self.start()
 
         def run(self):
+            pool = self.pool
             while True:
-                task = self.requestQueue.get()
+                task = pool.next_request()
 
                 if task is None:
                     # The "None" value is used as a sentinel by
@@ -262,19 +486,38 @@ else:
                 else:
                     ok = True
 
-                self.resultsQueue.put((task, ok))
+                pool.post_result(task, ok)
 
     class ThreadPool(object):
-        """This class is responsible for spawning and managing worker threads."""
+        """This class is responsible for spawning and managing worker threads.
+
+        Requests and results are handed back and forth on deques (which
+        threads can append to and pop from without locking) instead of
+        queue.Queue objects.  Idle workers wait on a semaphore for
+        requests; the main thread waits for results on a lock that's
+        held whenever it has seen all of the results posted so far.
+        """
 
         def __init__(self, num, stack_size, interrupted):
-            """Create the request and reply queues, and 'num' worker threads.
+            """Create the request and reply deques, and 'num' worker threads.
             
             One must specify the stack size of the worker threads. The
             stack size is specified in kilobytes.
             """
-            self.requestQueue = queue.Queue(0)
-            self.resultsQueue = queue.Queue(0)
+            self.requests = collections.deque()
+            self.requests_posted = threading.Semaphore(0)
+            self.results = collections.deque()
+            self.results_posted = threading.Lock()
+            self.results_posted.acquire()
+
+            # When each worker went idle, oldest first, so we can tell
+            # how long each task waited to be started once a worker was
+            # free to run it.  Time spent with nothing ready to run
+            # doesn't count.
+            now = time.time()
+            self.idle_since = collections.deque([now] * num)
+            self.starved_since = now
+            self.dispatch_latencies = []
 
             try:
                 prev_size = threading.stack_size(stack_size*1024) 
@@ -292,44 +535,89 @@ else:
             # Create worker threads
             self.workers = []
             for _ in range(num):
-                worker = Worker(self.requestQueue, self.resultsQueue, interrupted)
+                worker = Worker(self, interrupted)
                 self.workers.append(worker)
 
             if 'prev_size' in locals():
                 threading.stack_size(prev_size)
 
         def put(self, task):
-            """Put task into request queue."""
-            self.requestQueue.put(task)
+            """Post a task for a worker to execute."""
+            try:
+                since = max(self.idle_since.popleft(), self.starved_since)
+            except IndexError:
+                since = time.time()
+            self.requests.append((task, since))
+            self.requests_posted.release()
+
+        def starved(self):
+            """Note that idle workers have had no tasks ready for them
+            to execute until now."""
+            self.starved_since = time.time()
+
+        def next_request(self):
+            """Wait for, remove and return the next posted task.  Called
+            by the worker threads."""
+            self.requests_posted.acquire()
+            task, since = self.requests.popleft()
+            if task is not None:
+                self.dispatch_latencies.append(time.time() - since)
+            return task
+
+        def post_result(self, task, ok):
+            """Post the result of executing a task.  Called by the
+            worker threads."""
+            self.idle_since.append(time.time())
+            self.results.append((task, ok))
+            try:
+                self.results_posted.release()
+            except threading.ThreadError:
+                # The main thread hasn't gotten around to waiting
+                # since someone else posted a result.
+                pass
+
+        def get(self, timeout=None):
+            """Remove and return a result tuple, waiting for one if
+            necessary.
 
-        def get(self):
-            """Remove and return a result tuple from the results queue."""
-            return self.resultsQueue.get()
+            If a timeout (in seconds) is specified, raises queue.Empty
+            if no result shows up by then."""
+            results = self.results
+            if timeout is None:
+                while not results:
+                    self.results_posted.acquire()
+            else:
+                deadline = time.time() + timeout
+                while not results:
+                    if self.results_posted.acquire(False):
+                        continue
+                    if time.time() >= deadline:
+                        raise queue.Empty
+                    time.sleep(0.01)
+            return results.popleft()
 
         def preparation_failed(self, task):
-            self.resultsQueue.put((task, False))
+            self.post_result(task, False)
 
         def cleanup(self):
             """
             Shuts down the thread pool, giving each worker thread a
             chance to shut down gracefully.
             """
-            # For each worker thread, put a sentinel "None" value
-            # on the requestQueue (indicating that there's no work
-            # to be done) so that each worker thread will get one and
-            # terminate gracefully.
+            # For each worker thread, post a sentinel "None" value
+            # (indicating that there's no work to be done) so that each
+            # worker thread will get one and terminate gracefully.
             for _ in self.workers:
-                self.requestQueue.put(None)
+                self.requests.append((None, None))
+                self.requests_posted.release()
 
             # Wait for all of the workers to terminate.
             # 
             # If we don't do this, later Python versions (2.4, 2.5) often
-            # seem to raise exceptions during shutdown.  This happens
-            # in requestQueue.get(), as an assertion failure that
-            # requestQueue.not_full is notified while not acquired,
-            # seemingly because the main thread has shut down (or is
-            # in the process of doing so) while the workers are still
-            # trying to pull sentinels off the requestQueue.
+            # seem to raise exceptions during shutdown, seemingly because
+            # the main thread has shut down (or is in the process of
+            # doing so) while the workers are still trying to pull
+            # sentinels off the requests.
             #
             # Normally these terminations should happen fairly quickly,
             # but we'll stick a one-second timeout on here just in case
@@ -362,7 +650,12 @@ else:
 
             self.taskmaster = taskmaster
             self.interrupted = InterruptState()
+            # Fork the worker processes before we start any threads.
+            self.process_pool = None
+            if backend == 'process' and have_multiprocessing():
+                self.process_pool = ProcessPool(num)
             self.tp = ThreadPool(num, stack_size, self.interrupted)
+            self.dispatch_latencies = self.tp.dispatch_latencies
 
             self.maxjobs = num
 
@@ -377,9 +670,17 @@ else:
             while True:
                 # Start up as many available tasks as we're
                 # allowed to.
+                throttled = False
+                starved = False
                 while jobs < self.maxjobs:
+                    if jobs and overloaded():
+                        # Let the jobs we've started finish (or the
+                        # load drop) before we start any more.
+                        throttled = True
+                        break
                     task = self.taskmaster.next_task()
                     if task is None:
+                        starved = True
                         break
 
                     try:
@@ -392,40 +693,52 @@ else:
                     else:
                         if task.needs_execute():
                             # dispatch task
+                            if self.process_pool is not None:
+                                task.process_pool = self.process_pool
                             self.tp.put(task)
                             jobs = jobs + 1
                         else:
                             task.executed()
                             task.postprocess()
 
-                if not task and not jobs: break
+                if not jobs: break
 
-                # Let any/all completed tasks finish up before we go
-                # back and put the next batch of tasks on the queue.
-                while True:
+                # Wait for the next task to finish, finish it up, and
+                # go right back to fill its slot.  If we're being
+                # throttled, don't wait long, so we can ramp back up as
+                # soon as the load falls.
+                if throttled:
+                    try:
+                        task, ok = self.tp.get(throttle_interval)
+                    except queue.Empty:
+                        continue
+                else:
                     task, ok = self.tp.get()
-                    jobs = jobs - 1
-
-                    if ok:
-                        task.executed()
-                    else:
-                        if self.interrupted():
-                            try:
-                                raise SCons.Errors.BuildError(
-                                    task.targets[0], errstr=interrupt_msg)
-                            except:
-                                task.exception_set()
-
-                        # Let the failed() callback function arrange
-                        # for the build to stop if that's appropriate.
-                        task.failed()
+                jobs = jobs - 1
+                if starved:
+                    # Nothing else can have become ready to run until
+                    # this task finished.
+                    self.tp.starved()
+
+                if ok:
+                    task.executed()
+                else:
+                    if self.interrupted():
+                        try:
+                            raise SCons.Errors.BuildError(
+                                task.targets[0], errstr=interrupt_msg)
+                        except:
+                            task.exception_set()
 
-                    task.postprocess()
+                    # Let the failed() callback function arrange
+                    # for the build to stop if that's appropriate.
+                    task.failed()
 
-                    if self.tp.resultsQueue.empty():
-                        break
+                task.postprocess()
 
             self.tp.cleanup()
+            if self.process_pool is not None:
+                self.process_pool.cleanup()
             self.taskmaster.cleanup()
 
 # Local Variables:
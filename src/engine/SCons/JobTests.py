@@ -29,6 +29,8 @@ import SCons.Job
 import sys
 import time
 
+import TestCmd
+
 # a large number
 num_sines = 10000
 
@@ -235,12 +237,13 @@ class ParallelTestCase(unittest.TestCase):
         self.failIf(taskmaster.num_failed,
                     "some task(s) failed to execute")
 
-        # Verify that parallel jobs will pull all of the completed tasks
-        # out of the queue at once, instead of one by one.  We do this by
-        # replacing the default ThreadPool class with one that records the
-        # order in which tasks are put() and get() to/from the pool, and
-        # which sleeps a little bit before call get() to let the initial
-        # tasks complete and get their notifications on the resultsQueue.
+        # Verify that parallel jobs start another task as soon as each
+        # one completes, instead of waiting to collect every completed
+        # task first.  We do this by replacing the default ThreadPool
+        # class with one that records the order in which tasks are put()
+        # and get() to/from the pool, and which sleeps a little bit before
+        # call get() to let the initial tasks complete and post their
+        # results.
 
         class SleepTask(Task):
             def _do_something(self):
@@ -266,16 +269,23 @@ class ParallelTestCase(unittest.TestCase):
             jobs = SCons.Job.Jobs(2, taskmaster)
             jobs.run()
 
-            # The key here is that we get(1) and get(2) from the
-            # resultsQueue before we put(3), but get(1) and get(2) can
-            # be in either order depending on how the first two parallel
-            # tasks get scheduled by the operating system.
+            # The key here is that we put(3) right after the first get(),
+            # even though the other task has finished by then too, but
+            # get(1) and get(2) can be in either order depending on how
+            # the first two parallel tasks get scheduled by the operating
+            # system.
             expect = [
-                ['put(1)', 'put(2)', 'get(1)', 'get(2)', 'put(3)', 'get(3)'],
-                ['put(1)', 'put(2)', 'get(2)', 'get(1)', 'put(3)', 'get(3)'],
+                ['put(1)', 'put(2)', 'get(1)', 'put(3)', 'get(2)', 'get(3)'],
+                ['put(1)', 'put(2)', 'get(2)', 'put(3)', 'get(1)', 'get(3)'],
             ]
             assert ThreadPoolCallList in expect, ThreadPoolCallList
 
+            # Every task was timed from when a worker was free to run it.
+            latencies = jobs.dispatch_latencies()
+            assert len(latencies) == 3, latencies
+            for latency in latencies:
+                assert 0.0 <= latency < 1.0, latencies
+
         finally:
             SCons.Job.ThreadPool = SaveThreadPool
 
@@ -325,6 +335,68 @@ class NoParallelTestCase(unittest.TestCase):
             SCons.Job.Parallel = save_Parallel
 
 
+class OverloadedTestCase(unittest.TestCase):
+    def runTest(self):
+        "test not starting new jobs on a busy system"
+        test = TestCmd.TestCmd(workdir = '')
+        save_load_average = SCons.Job.load_average
+        save_meminfo_file = SCons.Job.meminfo_file
+        save_max_load = SCons.Job.max_load
+        save_min_free_memory = SCons.Job.min_free_memory
+        try:
+            test.write('meminfo', """\
+MemTotal:        8000000 kB
+MemFree:         1024000 kB
+MemAvailable:    2048000 kB
+""")
+            test.write('oldmeminfo', """\
+MemTotal:        8000000 kB
+MemFree:         1024000 kB
+Buffers:          102400 kB
+Cached:           512000 kB
+""")
+            SCons.Job.meminfo_file = test.workpath('meminfo')
+            self.failUnless(SCons.Job.free_memory() == 2000,
+                            SCons.Job.free_memory())
+            SCons.Job.meminfo_file = test.workpath('oldmeminfo')
+            self.failUnless(SCons.Job.free_memory() == 1600,
+                            SCons.Job.free_memory())
+            SCons.Job.meminfo_file = test.workpath('nonexistent')
+            self.failUnless(SCons.Job.free_memory() is None,
+                            SCons.Job.free_memory())
+
+            SCons.Job.load_average = lambda: 3.0
+            SCons.Job.meminfo_file = test.workpath('meminfo')
+            self.failIf(SCons.Job.overloaded(), "overloaded with no limits")
+            SCons.Job.max_load = 4
+            self.failIf(SCons.Job.overloaded(), "overloaded below max_load")
+            SCons.Job.max_load = 2.5
+            self.failUnless(SCons.Job.overloaded(), "not overloaded above max_load")
+            SCons.Job.max_load = None
+            SCons.Job.min_free_memory = 1000
+            self.failIf(SCons.Job.overloaded(), "overloaded with free memory")
+            SCons.Job.min_free_memory = 3000
+            self.failUnless(SCons.Job.overloaded(), "not overloaded without free memory")
+
+            # A parallel build on an overloaded system starts one job
+            # at a time.
+            SCons.Job.throttle_interval = 0.01
+            taskmaster = Taskmaster(num_tasks, self, RandomTask)
+            jobs = SCons.Job.Jobs(num_jobs, taskmaster)
+            jobs.run()
+            self.failUnless(taskmaster.tasks_were_serial(),
+                            "the tasks were not executed in series")
+            self.failUnless(taskmaster.all_tasks_are_postprocessed(),
+                            "all the tests were not postprocessed")
+        finally:
+            SCons.Job.load_average = save_load_average
+            SCons.Job.meminfo_file = save_meminfo_file
+            SCons.Job.max_load = save_max_load
+            SCons.Job.min_free_memory = save_min_free_memory
+            SCons.Job.throttle_interval = 1.0
+            test.cleanup()
+
+
 class SerialExceptionTestCase(unittest.TestCase):
     def runTest(self):
         "test a serial job with tasks that raise exceptions"
@@ -514,6 +586,7 @@ def suite():
     suite.addTest(ParallelTestCase())
     suite.addTest(SerialTestCase())
     suite.addTest(NoParallelTestCase())
+    suite.addTest(OverloadedTestCase())
     suite.addTest(SerialExceptionTestCase())
     suite.addTest(ParallelExceptionTestCase())
     suite.addTest(SerialTaskTest())
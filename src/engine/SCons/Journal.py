@@ -0,0 +1,249 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+__doc__ = """
+File-change journals for long-lived SCons processes.
+
+A journal remembers the set of paths it has been asked to watch, and
+can report which of them changed since the last time it was asked.
+The interactive and server modes use this to keep the cached stat()
+and content signature information of untouched Nodes from one build
+to the next, instead of throwing it all away and walking the whole
+tree again.
+
+The InotifyJournal uses the Linux inotify(7) interface through ctypes,
+so it costs nothing until something actually changes.  The
+PollingJournal works everywhere, by comparing the stat() results of
+every watched path with the ones it recorded.
+"""
+
+import os
+import stat
+import struct
+
+journal_types = ['auto', 'inotify', 'poll', 'none']
+
+class PollingJournal(object):
+    """
+    A journal that finds changes by re-stat()ing every watched path.
+    """
+    def __init__(self):
+        self.signatures = {}
+
+    def _signature(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        # The float st_mtime, not the whole seconds in ST_MTIME, so
+        # that an edit within the same second is noticed on file
+        # systems with finer time stamps.
+        return (st.st_mtime, st[stat.ST_SIZE],
+                st[stat.ST_INO], st[stat.ST_MODE])
+
+    def is_watched(self, path):
+        return path in self.signatures
+
+    def watch(self, path):
+        """Starts watching the specified path, if we aren't already."""
+        if path not in self.signatures:
+            self.signatures[path] = self._signature(path)
+
+    def changed(self):
+        """
+        Returns the set of watched paths that have changed since they
+        were first watched or since the last call.  (Unlike inotify,
+        stat()ing every path can't lose track, so this is never None.)
+        """
+        result = set()
+        for path, old in self.signatures.items():
+            new = self._signature(path)
+            if new != old:
+                self.signatures[path] = new
+                result.add(path)
+        return result
+
+    def close(self):
+        self.signatures = {}
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    libc = None
+else:
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        libc.inotify_init
+        libc.inotify_add_watch
+    except (OSError, AttributeError, TypeError):
+        # TypeError:  no use_errno keyword argument before Python 2.6.
+        libc = None
+
+# From <sys/inotify.h>.
+IN_MODIFY       = 0x00000002
+IN_ATTRIB       = 0x00000004
+IN_CLOSE_WRITE  = 0x00000008
+IN_MOVED_FROM   = 0x00000040
+IN_MOVED_TO     = 0x00000080
+IN_CREATE       = 0x00000100
+IN_DELETE       = 0x00000200
+IN_DELETE_SELF  = 0x00000400
+IN_MOVE_SELF    = 0x00000800
+IN_Q_OVERFLOW   = 0x00004000
+IN_IGNORED      = 0x00008000
+
+IN_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | \
+                IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+                IN_DELETE_SELF | IN_MOVE_SELF
+
+_event_format = 'iIII'
+_event_size = struct.calcsize(_event_format)
+
+class InotifyJournal(object):
+    """
+    A journal that has the Linux kernel tell us about changes.
+
+    The kernel watches directories, so we add a watch for the parent
+    directory of each path we're asked to watch, and report both the
+    entry named in each event and the directory itself as changed.
+    """
+    def __init__(self):
+        if libc is None:
+            raise EnvironmentError("inotify is not available")
+        self.fd = libc.inotify_init()
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise EnvironmentError(e, os.strerror(e))
+        import fcntl
+        flags = fcntl.fcntl(self.fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self.paths = set()
+        self.dirs = {}
+        self.wds = {}
+        self.lost_track = False
+
+    def is_watched(self, path):
+        return path in self.paths
+
+    def watch(self, path):
+        """Starts watching the specified path, if we aren't already."""
+        if path in self.paths:
+            return
+        dir = os.path.dirname(path) or os.curdir
+        if dir not in self.dirs:
+            wd = libc.inotify_add_watch(self.fd, dir, IN_WATCH_MASK)
+            if wd < 0:
+                # The directory doesn't exist (yet), or we've run out
+                # of watches.  Either way we can't vouch for this path.
+                return
+            self.dirs[dir] = wd
+            self.wds[wd] = dir
+        self.paths.add(path)
+
+    def _read_events(self):
+        data = ''
+        while True:
+            try:
+                chunk = os.read(self.fd, 65536)
+            except OSError:
+                # EAGAIN:  no more events queued.
+                break
+            if not chunk:
+                break
+            data = data + chunk
+        return data
+
+    def changed(self):
+        """
+        Returns the set of watched paths that have changed since the
+        last call, or None if the journal lost track and every path
+        must be assumed changed.
+        """
+        data = self._read_events()
+        result = set()
+        offset = 0
+        while offset + _event_size <= len(data):
+            header = data[offset:offset+_event_size]
+            wd, mask, cookie, length = struct.unpack(_event_format, header)
+            offset = offset + _event_size
+            name = data[offset:offset+length].rstrip('\0')
+            offset = offset + length
+            if mask & IN_Q_OVERFLOW:
+                self.lost_track = True
+                continue
+            try:
+                dir = self.wds[wd]
+            except KeyError:
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                # The watched directory itself went away, so forget
+                # everything we were watching in it.
+                del self.wds[wd]
+                del self.dirs[dir]
+                for path in [p for p in self.paths
+                             if (os.path.dirname(p) or os.curdir) == dir]:
+                    self.paths.discard(path)
+                    result.add(path)
+                result.add(dir)
+                continue
+            result.add(dir)
+            if name:
+                result.add(os.path.join(dir, name))
+        if self.lost_track:
+            self.lost_track = False
+            return None
+        return result
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.paths = set()
+        self.dirs = {}
+        self.wds = {}
+
+def Journal(type='auto'):
+    """
+    Returns a new journal of the specified type, or None if no
+    journal was requested.  The 'auto' type uses inotify when it's
+    available and falls back to polling otherwise.
+    """
+    if not type or type == 'none':
+        return None
+    if type in ('auto', 'inotify'):
+        try:
+            return InotifyJournal()
+        except EnvironmentError:
+            if type == 'inotify':
+                raise
+    return PollingJournal()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,147 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import os
+import sys
+import unittest
+
+import TestCmd
+
+import SCons.Journal
+
+class JournalTestMixin(object):
+    """
+    Tests common to all of the journal implementations.
+    """
+    def setUp(self):
+        self.test = TestCmd.TestCmd(workdir = '')
+        self.test.subdir('sub')
+        self.test.write('f1', "f1\n")
+        self.test.write('f2', "f2\n")
+        self.test.write(['sub', 'f3'], "f3\n")
+        self.f1 = self.test.workpath('f1')
+        self.f2 = self.test.workpath('f2')
+        self.f3 = self.test.workpath('sub', 'f3')
+        self.journal = self.Journal()
+        for path in [self.f1, self.f2, self.f3]:
+            self.journal.watch(path)
+
+    def tearDown(self):
+        self.journal.close()
+
+    def touch(self, path, contents):
+        # Make sure the modification time moves on even on file
+        # systems with coarse time stamps.
+        self.test.write(path, contents)
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+
+    def test_is_watched(self):
+        """Test the is_watched() method"""
+        assert self.journal.is_watched(self.f1)
+        assert self.journal.is_watched(self.f3)
+        assert not self.journal.is_watched(self.test.workpath('f4'))
+
+    def test_changed_nothing(self):
+        """Test changed() when nothing changed"""
+        assert self.journal.changed() == set(), self.journal.changed()
+
+    def test_changed_modified(self):
+        """Test changed() when watched files are modified"""
+        self.touch(self.f1, "f1 changed\n")
+        self.touch(self.f3, "f3 changed\n")
+        changed = self.journal.changed()
+        assert self.f1 in changed, changed
+        assert self.f3 in changed, changed
+        assert not self.f2 in changed, changed
+        changed = self.journal.changed()
+        assert not self.f1 in changed, changed
+        assert not self.f3 in changed, changed
+
+    def test_changed_removed(self):
+        """Test changed() when a watched file is removed"""
+        os.unlink(self.f2)
+        changed = self.journal.changed()
+        assert self.f2 in changed, changed
+        assert not self.f1 in changed, changed
+
+class PollingJournalTestCase(JournalTestMixin, unittest.TestCase):
+    Journal = SCons.Journal.PollingJournal
+
+    def test_changed_same_second(self):
+        """Test changed() for an edit within the same second"""
+        st = os.stat(self.f1)
+        mtime = int(st.st_mtime) + 0.25
+        os.utime(self.f1, (st.st_atime, mtime))
+        self.journal.changed()
+        self.test.write(self.f1, "F1\n")
+        os.utime(self.f1, (st.st_atime, mtime + 0.5))
+        changed = self.journal.changed()
+        assert self.f1 in changed, changed
+
+class InotifyJournalTestCase(JournalTestMixin, unittest.TestCase):
+    Journal = SCons.Journal.InotifyJournal
+
+    def test_directory_removed(self):
+        """Test changed() when a watched directory is removed"""
+        os.unlink(self.f3)
+        os.rmdir(self.test.workpath('sub'))
+        changed = self.journal.changed()
+        assert self.f3 in changed, changed
+        assert not self.journal.is_watched(self.f3)
+
+class JournalFactoryTestCase(unittest.TestCase):
+    def test_Journal(self):
+        """Test the Journal() factory function"""
+        assert SCons.Journal.Journal('none') is None
+        assert SCons.Journal.Journal(None) is None
+        j = SCons.Journal.Journal('poll')
+        assert isinstance(j, SCons.Journal.PollingJournal), j
+        j = SCons.Journal.Journal('auto')
+        if SCons.Journal.libc is None:
+            assert isinstance(j, SCons.Journal.PollingJournal), j
+        else:
+            assert isinstance(j, SCons.Journal.InotifyJournal), j
+        j.close()
+
+if __name__ == "__main__":
+    suite = unittest.TestSuite()
+    tclasses = [
+        PollingJournalTestCase,
+        JournalFactoryTestCase,
+    ]
+    if SCons.Journal.libc is not None:
+        tclasses.append(InotifyJournalTestCase)
+    for tclass in tclasses:
+        names = unittest.getTestCaseNames(tclass, 'test_')
+        suite.addTests(list(map(tclass, names)))
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
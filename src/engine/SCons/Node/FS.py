@@ -58,6 +58,20 @@ from SCons.Debug import Trace
 do_store_info = True
 print_duplicate = 0
 
+# The CSigPrefetcher, if any, computing the content signatures of
+# source files in the background.  Set by the main script for -j builds.
+csig_prefetcher = None
+
+# What's been parsed out of files' contents (see File.get_parsed()),
+# by what was parsed and the content signature of the file, so that
+# files with the same contents are only parsed once per build.
+parsed_cache = {}
+
+# Whether to keep what's parsed out of files in their .sconsign entries
+# as well, so that unchanged files are only parsed once, ever.  Set by
+# the main script from the --save-parsed option.
+save_parsed = 0
+
 
 class EntryProxyAttributeError(AttributeError):
     """
@@ -2341,6 +2355,166 @@ class FileBuildInfo(SCons.Node.BuildInfoBase):
         result.append('%s [%s]' % (self.bactsig, self.bact))
         return '\n'.join(result)
 
+# This attempts to figure out what the encoding of the text is
+# based upon the BOM bytes, and then decodes the contents so that
+# it's a valid python string.
+def decode_text(contents):
+    # The behavior of various decode() methods and functions
+    # w.r.t. the initial BOM bytes is different for different
+    # encodings and/or Python versions.  ('utf-8' does not strip
+    # them, but has a 'utf-8-sig' which does; 'utf-16' seems to
+    # strip them; etc.)  Just sidestep all the complication by
+    # explicitly stripping the BOM before we decode().
+    if contents.startswith(codecs.BOM_UTF8):
+        return contents[len(codecs.BOM_UTF8):].decode('utf-8')
+    if contents.startswith(codecs.BOM_UTF16_LE):
+        return contents[len(codecs.BOM_UTF16_LE):].decode('utf-16-le')
+    if contents.startswith(codecs.BOM_UTF16_BE):
+        return contents[len(codecs.BOM_UTF16_BE):].decode('utf-16-be')
+    return contents
+
+class CSigPrefetcher(object):
+    """
+    Computes the content signatures of source Files in a pool of
+    threads, so that they are ready (or well under way) by the time
+    the Taskmaster's up-to-date checks ask for them.  The MD5 module
+    releases the global interpreter lock while it hashes, so large
+    source files really do get hashed in parallel.
+
+    A File can also be queued with something to parse out of its
+    contents (see File.prefetch_parsed()), in which case the thread
+    reads it whole, hashes it, and leaves what it parsed in the
+    parsed_cache under that content signature, where get_parsed()
+    will find it.  That's how scanners get source files read and
+    searched for include lines ahead of the Taskmaster's scans.
+
+    Only the reading, hashing and parsing happen in the worker
+    threads.  Everything that touches a Node (deciding whether a
+    prefetch is worthwhile, storing the signature in the NodeInfo,
+    finding the files it includes) stays on the main thread.
+    """
+
+    _queued = 'queued'
+    _running = 'running'
+
+    def __init__(self, num):
+        import threading
+        import queue
+        self.lock = threading.Lock()
+        self.finished = threading.Condition(self.lock)
+        self.requests = queue.Queue(0)
+        self.state = {}
+        self.threads = []
+        for i in range(num):
+            t = threading.Thread(target=self.run)
+            t.setDaemon(1)
+            t.start()
+            self.threads.append(t)
+
+    def put(self, node, path, parse=None):
+        """Queues the file at path to be hashed on behalf of node.
+        If parse is given, it's a (name, function, stored_csig) tuple
+        for parsing the text of the file into the parsed_cache as well,
+        unless its content signature is stored_csig (in which case
+        get_parsed() will use what it parsed last time)."""
+        self.lock.acquire()
+        try:
+            if node in self.state:
+                return
+            self.state[node] = self._queued
+        finally:
+            self.lock.release()
+        self.requests.put((node, path, parse))
+
+    def claim(self, node):
+        """Marks a queued node as running, returning whether it still
+        needed hashing (the main thread may have claimed it first)."""
+        self.lock.acquire()
+        try:
+            if self.state.get(node) is not self._queued:
+                return False
+            self.state[node] = self._running
+            return True
+        finally:
+            self.lock.release()
+
+    def run(self):
+        while True:
+            node, path, parse = self.requests.get()
+            if node is None:
+                break
+            if not self.claim(node):
+                continue
+            try:
+                if parse:
+                    csig = self.parse(path, parse)
+                else:
+                    csig = SCons.Util.MD5filesignature(path,
+                        chunksize=File.md5_chunksize*1024)
+            except EnvironmentError:
+                # Leave it to the main thread to try again and
+                # report the error in context.
+                csig = None
+            self.lock.acquire()
+            try:
+                self.state[node] = (csig,)
+                self.finished.notifyAll()
+            finally:
+                self.lock.release()
+
+    def parse(self, path, parse):
+        """Reads the file at path, parses its text into the
+        parsed_cache and returns its content signature."""
+        f = open(path, "rb")
+        try:
+            contents = f.read()
+        finally:
+            f.close()
+        csig = SCons.Util.MD5signature(contents)
+        name, function, stored_csig = parse
+        if csig == stored_csig:
+            return csig
+        try:
+            result = function(decode_text(contents))
+        except Exception:
+            # Whatever went wrong will go wrong again when the
+            # main thread parses the file itself.
+            pass
+        else:
+            parsed_cache[(name, csig)] = result
+        return csig
+
+    def get(self, node):
+        """
+        Returns the prefetched signature for node, waiting for it if
+        a thread is hashing it right now.  Returns None if the caller
+        should compute the signature itself, which takes the node
+        off the queue if no thread has got to it yet.
+        """
+        self.lock.acquire()
+        try:
+            try:
+                state = self.state[node]
+            except KeyError:
+                return None
+            while state is self._running:
+                self.finished.wait()
+                state = self.state[node]
+            del self.state[node]
+            if state is self._queued:
+                return None
+            return state[0]
+        finally:
+            self.lock.release()
+
+    def stop(self):
+        """Shuts down the worker threads."""
+        for t in self.threads:
+            self.requests.put((None, None, None))
+        for t in self.threads:
+            t.join()
+        self.threads = []
+
 class File(Base):
     """A class for files in a file system.
     """
@@ -2422,24 +2596,8 @@ class File(Base):
             raise
         return contents
 
-    # This attempts to figure out what the encoding of the text is
-    # based upon the BOM bytes, and then decodes the contents so that
-    # it's a valid python string.
     def get_text_contents(self):
-        contents = self.get_contents()
-        # The behavior of various decode() methods and functions
-        # w.r.t. the initial BOM bytes is different for different
-        # encodings and/or Python versions.  ('utf-8' does not strip
-        # them, but has a 'utf-8-sig' which does; 'utf-16' seems to
-        # strip them; etc.)  Just sidestep all the complication by
-        # explicitly stripping the BOM before we decode().
-        if contents.startswith(codecs.BOM_UTF8):
-            return contents[len(codecs.BOM_UTF8):].decode('utf-8')
-        if contents.startswith(codecs.BOM_UTF16_LE):
-            return contents[len(codecs.BOM_UTF16_LE):].decode('utf-16-le')
-        if contents.startswith(codecs.BOM_UTF16_BE):
-            return contents[len(codecs.BOM_UTF16_BE):].decode('utf-16-be')
-        return contents
+        return decode_text(self.get_contents())
 
     def get_content_hash(self):
         """
@@ -2447,6 +2605,10 @@ class File(Base):
         """
         if not self.rexists():
             return SCons.Util.MD5signature('')
+        if csig_prefetcher is not None:
+            cs = csig_prefetcher.get(self)
+            if cs is not None:
+                return cs
         fname = self.rfile().abspath
         try:
             cs = SCons.Util.MD5filesignature(fname,
@@ -2650,6 +2812,46 @@ class File(Base):
     def rel_path(self, other):
         return self.dir.rel_path(other)
 
+    def get_parsed(self, name, parse):
+        """
+        Returns the result of parse(self), something parsed out of this
+        file's contents that name identifies (from one build to the
+        next).  Since it depends on nothing but the contents, it's
+        remembered by the file's content signature, and kept in the
+        .sconsign file for the next build if save_parsed is set.
+        """
+        csig = self.get_csig()
+        if not csig:
+            return parse(self)
+        key = (name, csig)
+        try:
+            result = parsed_cache[key]
+        except KeyError:
+            result = None
+            if save_parsed:
+                # Each result is stored with the content signature it
+                # goes with, since .sconsign entries get merged.  (The
+                # entries for configure checks have no ninfo at all.)
+                try:
+                    ninfo = self.get_stored_info().ninfo
+                    stored_csig, stored_result = ninfo.parsed[name]
+                except (AttributeError, KeyError):
+                    pass
+                else:
+                    if stored_csig == csig:
+                        result = stored_result
+            if result is None:
+                result = parse(self)
+            parsed_cache[key] = result
+        if save_parsed:
+            ninfo = self.get_ninfo()
+            try:
+                parsed = ninfo.parsed
+            except AttributeError:
+                parsed = ninfo.parsed = {}
+            parsed[name] = (csig, result)
+        return result
+
     def _get_found_includes_key(self, env, scanner, path):
         return (id(env), id(scanner), path)
 
@@ -2719,6 +2921,23 @@ class File(Base):
             return None
         return self.get_build_env().get_CacheDir().retrieve(self)
 
+    def prefetch_cache(self, early=0):
+        if self.nocache:
+            return
+        if not self.is_derived():
+            return
+        had_cachesig = hasattr(self, 'cachesig')
+        self.get_build_env().get_CacheDir().prefetch(self)
+        if early and not had_cachesig:
+            # Don't hold on to a signature worked out before the
+            # Taskmaster has had another look at the node.  retrieve()
+            # works it out again, and only takes the lookup's word
+            # for it if it comes out the same.
+            try:
+                del self.cachesig
+            except AttributeError:
+                pass
+
     def visited(self):
         if self.exists():
             self.get_build_env().get_CacheDir().push_if_forced(self)
@@ -2907,6 +3126,49 @@ class File(Base):
 
         return None
 
+    def prefetch_csig(self):
+        """
+        Starts hashing this file's contents in the background, if
+        we have a CSigPrefetcher and this looks like a source file
+        whose content signature get_csig() will have to read all
+        of it for.
+        """
+        if csig_prefetcher is None or self.has_builder():
+            return
+        if hasattr(self.get_ninfo(), 'csig') or not self.rexists():
+            return
+        # md5_chunksize is in kilobytes.
+        if self.get_size() < SCons.Node.FS.File.md5_chunksize * 1024:
+            return
+        if self.get_max_drift_csig() is not None:
+            return
+        csig_prefetcher.put(self, self.rfile().abspath)
+
+    def prefetch_parsed(self, name, parse_text):
+        """
+        Starts reading this file and parsing its text with parse_text()
+        in the background, so that get_parsed(name, ...) finds the
+        result waiting.  Only worth it for source files whose content
+        signature is still to be computed; those with a signature at
+        hand most likely have what was parsed in their .sconsign entry.
+        Files whose contents turn out to be what was parsed last time
+        are only hashed.
+        """
+        if csig_prefetcher is None or self.has_builder():
+            return
+        if hasattr(self.get_ninfo(), 'csig') or not self.rexists():
+            return
+        if self.get_max_drift_csig() is not None:
+            return
+        stored_csig = None
+        if save_parsed:
+            try:
+                stored_csig = self.get_stored_info().ninfo.parsed[name][0]
+            except (AttributeError, KeyError):
+                pass
+        csig_prefetcher.put(self, self.rfile().abspath,
+                            (name, parse_text, stored_csig))
+
     def get_csig(self):
         """
         Generate a node's content signature, the digested signature
@@ -2923,6 +3185,9 @@ class File(Base):
             pass
 
         csig = self.get_max_drift_csig()
+        if csig is None and csig_prefetcher is not None:
+            # It may have been read (and parsed) in the background.
+            csig = csig_prefetcher.get(self)
         if csig is None:
 
             try:
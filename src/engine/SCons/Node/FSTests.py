@@ -2415,6 +2415,132 @@ class FileTestCase(_tempdirTestCase):
         assert not build_f1.exists(), "%s did not realize that %s disappeared" % (build_f1, src_f1)
         assert not os.path.exists(build_f1.abspath), "%s did not get removed after %s was removed" % (build_f1, src_f1)
 
+    def test_prefetch_csig(self):
+        """Test computing File content signatures in the background"""
+        test = self.test
+        test.write('big', 'x' * 100000)
+        test.write('small', 'x')
+        test.write('medium', 'x' * 1000)
+        big = self.fs.File('big')
+        small = self.fs.File('small')
+        medium = self.fs.File('medium')
+        built = self.fs.File('built')
+        built.builder_set(Builder(self.fs.File))
+
+        big.prefetch_csig()
+
+        save_prefetcher = SCons.Node.FS.csig_prefetcher
+        p = SCons.Node.FS.CSigPrefetcher(2)
+        SCons.Node.FS.csig_prefetcher = p
+        try:
+            big.prefetch_csig()
+            small.prefetch_csig()
+            medium.prefetch_csig()
+            built.prefetch_csig()
+            # Only files of more than one md5_chunksize get hashed in
+            # the background.
+            assert list(p.state.keys()) == [big], p.state
+            csig = big.get_csig()
+            assert csig == SCons.Util.MD5signature('x' * 100000), csig
+            assert big.get_ninfo().csig == csig
+            assert p.state == {}, p.state
+            # Once it's known, it's not fetched again.
+            big.prefetch_csig()
+            assert p.state == {}, p.state
+        finally:
+            SCons.Node.FS.csig_prefetcher = save_prefetcher
+            p.stop()
+        assert p.threads == [], p.threads
+
+    def test_prefetch_parsed(self):
+        """Test parsing File contents in the background"""
+        test = self.test
+        test.write('pp1', '\xef\xbb\xbfone two\n')
+        test.write('pp2', 'three\n')
+        pp1 = self.fs.File('pp1')
+        pp2 = self.fs.File('pp2')
+        built = self.fs.File('pp_built')
+        built.builder_set(Builder(self.fs.File))
+        def parse_text(text):
+            return text.split()
+        def parse(node):
+            raise Exception("%s should have been parsed already" % node)
+
+        # Without a prefetcher, nothing happens.
+        pp1.prefetch_parsed('words', parse_text)
+
+        save_prefetcher = SCons.Node.FS.csig_prefetcher
+        save_parsed_cache = SCons.Node.FS.parsed_cache
+        p = SCons.Node.FS.CSigPrefetcher(2)
+        SCons.Node.FS.csig_prefetcher = p
+        SCons.Node.FS.parsed_cache = {}
+        try:
+            pp1.prefetch_parsed('words', parse_text)
+            built.prefetch_parsed('words', parse_text)
+            assert list(p.state.keys()) == [pp1], p.state
+            # Wait for the threads to finish with it.
+            p.lock.acquire()
+            try:
+                while p.state[pp1] in (p._queued, p._running):
+                    p.finished.wait()
+            finally:
+                p.lock.release()
+            assert pp1.get_parsed('words', parse) == [u'one', u'two']
+            assert pp1.get_csig() == SCons.Util.MD5signature('\xef\xbb\xbfone two\n')
+            assert p.state == {}, p.state
+            # Once the signature is known, it's up to get_parsed().
+            pp2.get_csig()
+            pp2.prefetch_parsed('words', parse_text)
+            assert p.state == {}, p.state
+        finally:
+            SCons.Node.FS.csig_prefetcher = save_prefetcher
+            SCons.Node.FS.parsed_cache = save_parsed_cache
+            p.stop()
+
+    def test_get_parsed(self):
+        """Test remembering what's parsed out of File contents"""
+        test = self.test
+        test.write('p1', 'same\n')
+        test.write('p2', 'same\n')
+        test.write('p3', 'other\n')
+        p1 = self.fs.File('p1')
+        p2 = self.fs.File('p2')
+        p3 = self.fs.File('p3')
+        parsed = []
+        def parse(node, parsed=parsed):
+            parsed.append(node)
+            return node.get_text_contents().split()
+
+        save_parsed_cache = SCons.Node.FS.parsed_cache
+        save_save_parsed = SCons.Node.FS.save_parsed
+        SCons.Node.FS.parsed_cache = {}
+        try:
+            # By default, nothing is kept in the .sconsign entries.
+            assert p1.get_parsed('words', parse) == ['same']
+            assert parsed == [p1], parsed
+            assert not hasattr(p1.get_ninfo(), 'parsed')
+
+            SCons.Node.FS.save_parsed = 1
+            # A file with the same contents isn't parsed again.
+            assert p2.get_parsed('words', parse) == ['same']
+            assert parsed == [p1], parsed
+            csig = p2.get_csig()
+            assert p2.get_ninfo().parsed == {'words' : (csig, ['same'])}
+
+            # The .sconsign entry's result gets used if the contents
+            # haven't changed since.
+            stored = p3.get_stored_info()
+            stored.ninfo.parsed = {'words' : (p3.get_csig(), ['stored'])}
+            assert p3.get_parsed('words', parse) == ['stored']
+            assert parsed == [p1], parsed
+            stored.ninfo.parsed = {'words' : ('changed', ['stored'])}
+            SCons.Node.FS.parsed_cache = {}
+            assert p3.get_parsed('words', parse) == ['other']
+            assert parsed == [p1, p3], parsed
+        finally:
+            SCons.Node.FS.parsed_cache = save_parsed_cache
+            SCons.Node.FS.save_parsed = save_save_parsed
+
 
 
 class GlobTestCase(_tempdirTestCase):
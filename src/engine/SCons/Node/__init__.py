@@ -89,6 +89,15 @@ implicit_deps_unchanged = 0
 # controls whether the cached implicit deps are ignored:
 implicit_deps_changed = 0
 
+# controls whether sources are read and searched for implicit deps in
+# the background ahead of their scans (set for -j builds):
+prefetch_scans = 0
+
+# controls whether Nodes are looked for in the CacheDir as soon as
+# their last child is built, while they wait for a job slot (set for
+# -j builds):
+prefetch_caches = 0
+
 # A variable that can be set to an interface-specific function be called
 # to annotate a Node with information about its creation.
 def do_nothing(node): pass
@@ -233,6 +242,11 @@ class Node(object):
     def disambiguate(self, must_exist=None):
         return self
 
+    def prefetch_csig(self):
+        """Hook for starting to compute this Node's content signature
+        in the background.  Only source Files do anything with it."""
+        pass
+
     def get_suffix(self):
         return ''
 
@@ -310,6 +324,14 @@ class Node(object):
         """
         return 0
 
+    def prefetch_cache(self, early=0):
+        """Start looking for the node in a cache in the background,
+        ahead of retrieve_from_cache().  If early, the Taskmaster
+        hasn't looked at the node again since its last child was
+        built.
+        """
+        pass
+
     #
     # Taskmaster interface subsystem
     #
@@ -550,7 +572,13 @@ class Node(object):
                 deps.extend(d)
                 for n in d:
                     seen[n] = 1
-                nodes.extend(scanner.recurse_nodes(d))
+                d = scanner.recurse_nodes(d)
+                if prefetch_scans:
+                    # Get the next level's files read and searched
+                    # while we work our way through them.
+                    for n in d:
+                        scanner.prefetch(n, env)
+                nodes.extend(d)
 
         return deps
 
@@ -642,6 +670,25 @@ class Node(object):
         if scanner:
             executor.scan_targets(scanner)
 
+    def prefetch_scan(self):
+        """Starts reading and searching this Node's sources for implicit
+        dependencies in the background, ahead of scan() (see
+        Scanner.Base.prefetch()), when the build wants that."""
+        if not prefetch_scans or self.implicit is not None:
+            return
+        if not self.has_builder():
+            return
+        if implicit_cache and not implicit_deps_changed:
+            # The stored implicit deps will most likely do.
+            return
+        try:
+            executor = self.get_executor()
+            executor.prefetch_sources(self.builder.source_scanner)
+        except Exception:
+            # Whatever the problem is, it'll come up again (and get
+            # reported properly) when the Node is really scanned.
+            pass
+
     def scanner_key(self):
         return None
 
@@ -709,6 +756,10 @@ class Node(object):
         if self.has_builder():
             binfo.bact = str(executor)
             binfo.bactsig = SCons.Util.MD5signature(executor.get_contents())
+            try:
+                binfo.exectime = self.exectime
+            except AttributeError:
+                pass
 
         if self._specific_sources:
             sources = []
@@ -775,6 +826,19 @@ class Node(object):
     def get_stored_info(self):
         return None
 
+    def get_stored_exectime(self):
+        """Fetch how long (in seconds) this node's action took to run
+        the last time it was built, or None if we don't know."""
+        try:
+            return self.exectime
+        except AttributeError:
+            pass
+        stored = self.get_stored_info()
+        try:
+            return stored.binfo.exectime
+        except AttributeError:
+            return None
+
     def get_stored_implicit(self):
         """Fetch the stored implicit dependencies"""
         return None
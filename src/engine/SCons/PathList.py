@@ -118,6 +118,16 @@ class _PathList(object):
 
     def __len__(self): return len(self.pathlist)
 
+    def needs_subst(self):
+        """
+        Returns whether any of the PathList's strings have construction
+        variables to expand (and so might be different for each target).
+        """
+        for type, value in self.pathlist:
+            if type == TYPE_STRING_SUBST:
+                return True
+        return False
+
     def __getitem__(self, i): return self.pathlist[i]
 
     def subst_path(self, env, target, source):
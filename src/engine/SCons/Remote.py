@@ -0,0 +1,434 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+__doc__ = """
+Remote execution of build commands.
+
+When a build is given the addresses of one or more remote workers
+(with --remote-exec), each command line a CommandAction would have
+handed to $SPAWN is instead sent to the least busy worker, along with
+the contents of the target's sources and implicit dependencies and
+the ENV it would have been run with.  The worker recreates those files
+in a scratch directory, runs the commands there, and sends back their
+exit status, output, and the contents of the targets they built, which
+get written into the local tree.  Since the commands themselves don't
+run locally, -j can usefully exceed the number of local processors.
+
+Only files inside the top-level directory are shipped; anything the
+commands use from elsewhere (compilers, system headers and the like)
+must be installed at the same place on the workers.  Commands whose
+targets or sources aren't all files inside the top-level directory,
+or that are run from outside it, or whose environment sets $REMOTE_EXEC
+to a false value, are always run locally.  So is everything else, with
+a warning, once none of the workers can be reached.
+
+"scons --remote-worker=[HOST:]PORT" runs a worker.  It serves each
+connection in its own thread, running at most -j commands at a time.
+Requests and replies are marshalled dictionaries, so workers should
+only listen on networks whose hosts are trusted to run commands.
+"""
+
+import marshal
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+
+import SCons.Errors
+import SCons.Warnings
+
+# The (host, port) addresses of the workers builds send commands to,
+# set from the command line.
+workers = []
+
+default_host = 'localhost'
+
+# Workers run whatever commands they are sent, so unless told to
+# listen on some other interface (0.0.0.0 for all of them) they only
+# accept connections from the local system.
+default_worker_host = '127.0.0.1'
+
+_header = '!L'
+_header_size = struct.calcsize(_header)
+
+def parse_address(address, host=default_host):
+    """Splits a "[HOST:]PORT" string into a (host, port) tuple."""
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+    else:
+        port = address
+    try:
+        return (host, int(port))
+    except ValueError:
+        raise SCons.Errors.UserError("Invalid remote worker address: %s" % address)
+
+def parse_addresses(addresses):
+    """Returns the list of (host, port) tuples for a comma-separated
+    list of "[HOST:]PORT" strings."""
+    return [parse_address(a.strip()) for a in addresses.split(',') if a.strip()]
+
+def send_message(sock, message):
+    data = marshal.dumps(message)
+    sock.sendall(struct.pack(_header, len(data)) + data)
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1024*1024))
+        if not chunk:
+            raise EOFError("connection closed")
+        chunks.append(chunk)
+        size = size - len(chunk)
+    return ''.join(chunks)
+
+def recv_message(sock):
+    size = struct.unpack(_header, _recv_exactly(sock, _header_size))[0]
+    return marshal.loads(_recv_exactly(sock, size))
+
+def _read_file(path):
+    f = open(path, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+def _safe_path(root, path):
+    """Returns path joined to root, making sure it stays inside."""
+    if os.path.isabs(path) or os.pardir in path.split(os.sep):
+        raise ValueError("Invalid path in request: %s" % path)
+    return os.path.join(root, path)
+
+def _write_file(path, mode, contents):
+    d = os.path.dirname(path)
+    if d and not os.path.isdir(d):
+        os.makedirs(d)
+    f = open(path, 'wb')
+    try:
+        f.write(contents)
+    finally:
+        f.close()
+    os.chmod(path, mode & 07777)
+
+def _tree_path(node):
+    """Returns the path of a File node relative to the top-level
+    directory, or None if it isn't a File inside it."""
+    import SCons.Node.FS
+    if not isinstance(node, SCons.Node.FS.File):
+        return None
+    path = node.path
+    if os.path.isabs(path) or path.split(os.sep)[0] == os.pardir:
+        return None
+    return path
+
+def _relative_cwd():
+    """Returns the current directory relative to the top-level
+    directory, or None if we're outside it."""
+    import SCons.Node.FS
+    top = SCons.Node.FS.get_default_fs().Top.abspath
+    cwd = os.getcwd()
+    if cwd == top:
+        return ''
+    if cwd.startswith(top + os.sep):
+        return cwd[len(top)+1:]
+    return None
+
+def build_request(commands, ENV, ignore, target, source):
+    """Returns the request that runs the command lines (lists of
+    already-escaped arguments) for the target and source Nodes, or None
+    if they have to be run locally."""
+    cwd = _relative_cwd()
+    if cwd is None:
+        return None
+
+    outputs = []
+    inputs = []
+    seen = {}
+    for t in target:
+        for node in [t] + list(t.side_effects):
+            path = _tree_path(node)
+            if path is None:
+                return None
+            outputs.append(path)
+            seen[path] = 1
+    for s in source:
+        if _tree_path(s) is None:
+            return None
+    deps = list(source)
+    for t in target:
+        deps.extend(t.implicit or [])
+        deps.extend(t.depends)
+        deps.extend(t.prerequisites)
+    for node in deps:
+        path = _tree_path(node)
+        if path is None or path in seen:
+            continue
+        seen[path] = 1
+        real = node.rfile().abspath
+        try:
+            contents = _read_file(real)
+            mode = os.stat(real)[0]
+        except (IOError, OSError):
+            # Not there (yet); the command will say so if it matters.
+            continue
+        inputs.append((path, mode, contents))
+
+    return {
+        'commands' : [' '.join(cmd_line) for cmd_line in commands],
+        'ENV'      : ENV,
+        'cwd'      : cwd,
+        'ignore'   : int(bool(ignore)),
+        'inputs'   : inputs,
+        'outputs'  : outputs,
+    }
+
+class Pool(object):
+    """
+    The remote workers available to a build, and how many requests
+    each of them is busy with.
+    """
+    def __init__(self, addresses):
+        import threading
+        self.addresses = list(addresses)
+        self.lock = threading.Lock()
+        self.busy = {}
+        for address in addresses:
+            self.busy[address] = 0
+
+    def acquire(self):
+        """Returns the address of the least busy worker, or None if
+        there aren't any left."""
+        self.lock.acquire()
+        try:
+            if not self.busy:
+                return None
+            address = min([(n, a) for a, n in self.busy.items()])[1]
+            self.busy[address] = self.busy[address] + 1
+            return address
+        finally:
+            self.lock.release()
+
+    def release(self, address):
+        self.lock.acquire()
+        try:
+            if address in self.busy:
+                self.busy[address] = self.busy[address] - 1
+        finally:
+            self.lock.release()
+
+    def discard(self, address, error):
+        """Stops using a worker that couldn't be reached."""
+        self.lock.acquire()
+        try:
+            if address not in self.busy:
+                return
+            del self.busy[address]
+            remaining = len(self.busy)
+        finally:
+            self.lock.release()
+        msg = "Could not use remote worker %s:%d (%s)" % (address + (error,))
+        if not remaining:
+            msg = msg + "; running commands locally."
+        SCons.Warnings.warn(SCons.Warnings.RemoteExecWarning, msg)
+
+    def send(self, request):
+        """Sends a request to a worker and returns its reply, trying
+        the others if it can't be reached.  Returns None if none of
+        them can."""
+        import socket
+        while True:
+            address = self.acquire()
+            if address is None:
+                return None
+            try:
+                try:
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    try:
+                        sock.connect(address)
+                        send_message(sock, request)
+                        return recv_message(sock)
+                    finally:
+                        sock.close()
+                except (socket.error, EOFError, ValueError, struct.error), e:
+                    self.discard(address, str(e))
+            finally:
+                self.release(address)
+
+_pool = None
+
+def get_pool():
+    global _pool
+    if _pool is None or _pool.addresses != workers:
+        _pool = Pool(workers)
+    return _pool
+
+def write_outputs(request, reply, top):
+    """Writes the files in a reply under the top directory.  Only the
+    outputs the request asked for get written; the worker doesn't get
+    to put anything else anywhere."""
+    wanted = dict.fromkeys(request['outputs'])
+    for path, mode, contents in reply['outputs']:
+        if path not in wanted:
+            msg = "Ignoring unrequested output from remote worker: %s" % path
+            SCons.Warnings.warn(SCons.Warnings.RemoteExecWarning, msg)
+            continue
+        _write_file(_safe_path(top, path), mode, contents)
+
+def execute(commands, ENV, ignore, target, source, env):
+    """Runs the command lines on a remote worker.
+
+    Returns None if they have to be run locally, or a tuple of the exit
+    status and the command line that failed (or None if none did)."""
+    if not workers or not env.get('REMOTE_EXEC', 1):
+        return None
+    request = build_request(commands, ENV, ignore, target, source)
+    if request is None:
+        return None
+    reply = get_pool().send(request)
+    if reply is None:
+        return None
+
+    if reply['stdout']:
+        sys.stdout.write(reply['stdout'])
+        sys.stdout.flush()
+    if reply['stderr']:
+        sys.stderr.write(reply['stderr'])
+        sys.stderr.flush()
+    # The output paths are relative to the top-level directory, not
+    # to the directory a chdir= action may have left us in.
+    import SCons.Node.FS
+    write_outputs(request, reply, SCons.Node.FS.get_default_fs().Top.abspath)
+    failed = reply['failed']
+    if failed is None:
+        return reply['status'], None
+    return reply['status'], commands[failed]
+
+# The worker side.
+
+def run_request(request, tmpdir=None):
+    """Runs a request's commands in a scratch directory and returns
+    the reply."""
+    root = tempfile.mkdtemp(prefix='scons-remote-', dir=tmpdir)
+    try:
+        for path, mode, contents in request['inputs']:
+            _write_file(_safe_path(root, path), mode, contents)
+        for path in request['outputs']:
+            d = os.path.dirname(_safe_path(root, path))
+            if not os.path.isdir(d):
+                os.makedirs(d)
+        cwd = _safe_path(root, request['cwd'])
+        if not os.path.isdir(cwd):
+            os.makedirs(cwd)
+
+        stdout = []
+        stderr = []
+        status = 0
+        failed = None
+        for i in range(len(request['commands'])):
+            p = subprocess.Popen(request['commands'][i],
+                                 shell=True,
+                                 cwd=cwd,
+                                 env=request['ENV'],
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE)
+            out, err = p.communicate()
+            stdout.append(out)
+            stderr.append(err)
+            if p.returncode and not request['ignore']:
+                status = p.returncode
+                failed = i
+                break
+
+        outputs = []
+        for path in request['outputs']:
+            real = _safe_path(root, path)
+            if os.path.isfile(real):
+                outputs.append((path, os.stat(real)[0], _read_file(real)))
+
+        return {
+            'status'  : status,
+            'failed'  : failed,
+            'stdout'  : ''.join(stdout),
+            'stderr'  : ''.join(stderr),
+            'outputs' : outputs,
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=1)
+
+def _handle_connection(conn, slots):
+    try:
+        try:
+            request = recv_message(conn)
+        except (EOFError, ValueError, struct.error):
+            return
+        slots.acquire()
+        try:
+            try:
+                reply = run_request(request)
+            except Exception, e:
+                reply = {
+                    'status'  : 2,
+                    'failed'  : 0,
+                    'stdout'  : '',
+                    'stderr'  : 'scons: *** Remote worker error: %s\n' % e,
+                    'outputs' : [],
+                }
+        finally:
+            slots.release()
+        send_message(conn, reply)
+    finally:
+        conn.close()
+
+def serve(address, jobs=1, stdout=None):
+    """Runs a remote worker listening on the "[HOST:]PORT" address,
+    running at most jobs commands at a time.  Never returns."""
+    import socket
+    import threading
+    if stdout is None:
+        stdout = sys.stdout
+    host, port = parse_address(address, default_worker_host)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(64)
+    host, port = sock.getsockname()[:2]
+    stdout.write("scons: Remote worker listening on %s:%d\n" % (host, port))
+    stdout.flush()
+    slots = threading.Semaphore(max(jobs, 1))
+    try:
+        while True:
+            conn, addr = sock.accept()
+            t = threading.Thread(target=_handle_connection, args=(conn, slots))
+            t.setDaemon(1)
+            t.start()
+    finally:
+        sock.close()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,206 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import os
+import socket
+import sys
+import unittest
+
+import TestCmd
+
+import SCons.Errors
+import SCons.Remote
+import SCons.Warnings
+
+python = TestCmd.python
+
+class AddressTestCase(unittest.TestCase):
+
+    def test_parse_address(self):
+        """Test parsing worker addresses"""
+        assert SCons.Remote.parse_address('host:1234') == ('host', 1234)
+        assert SCons.Remote.parse_address('1234') == ('localhost', 1234)
+        assert SCons.Remote.parse_address('1234', '') == ('', 1234)
+        try:
+            SCons.Remote.parse_address('host:port')
+        except SCons.Errors.UserError:
+            pass
+        else:
+            self.fail("did not catch an invalid port")
+
+    def test_parse_addresses(self):
+        """Test parsing lists of worker addresses"""
+        result = SCons.Remote.parse_addresses('a:1, b:2,')
+        assert result == [('a', 1), ('b', 2)], result
+
+class MessageTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        """Test sending and receiving messages"""
+        if not hasattr(socket, 'socketpair'):
+            return
+        a, b = socket.socketpair()
+        try:
+            message = {'commands' : ['x' * 100000], 'ignore' : 1}
+            SCons.Remote.send_message(a, message)
+            assert SCons.Remote.recv_message(b) == message
+            a.close()
+            self.assertRaises(EOFError, SCons.Remote.recv_message, b)
+        finally:
+            a.close()
+            b.close()
+
+class RunRequestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.test = TestCmd.TestCmd(workdir = '')
+
+    def request(self, commands, **kw):
+        request = {
+            'commands' : commands,
+            'ENV'      : dict(os.environ),
+            'cwd'      : '',
+            'ignore'   : 0,
+            'inputs'   : [],
+            'outputs'  : [],
+        }
+        request.update(kw)
+        return request
+
+    def test_outputs(self):
+        """Test running a request's commands on its inputs"""
+        cmd = '"%s" -c "import sys; open(sys.argv[2], \'w\').write(open(sys.argv[1]).read().upper()); print(\'done\')" %s %s'
+        reply = SCons.Remote.run_request(self.request(
+            [cmd % (python, os.path.join('..', 'in', 'f'), 'f.out')],
+            cwd = 'sub',
+            inputs = [(os.path.join('in', 'f'), 0644, 'contents\n')],
+            outputs = [os.path.join('sub', 'f.out')]),
+            self.test.workpath())
+        assert reply['status'] == 0, reply
+        assert reply['failed'] is None, reply
+        assert reply['stdout'].strip() == 'done', reply
+        assert reply['outputs'] == [(os.path.join('sub', 'f.out'),
+                                     reply['outputs'][0][1],
+                                     'CONTENTS\n')], reply
+        # The scratch directory is gone.
+        assert os.listdir(self.test.workpath()) == [], os.listdir(self.test.workpath())
+
+    def test_failure(self):
+        """Test that a request stops at the first failing command"""
+        exit = '"%s" -c "import sys; sys.exit(%%d)"' % python
+        reply = SCons.Remote.run_request(self.request(
+            [exit % 0, exit % 5, exit % 6]))
+        assert reply['status'] == 5, reply
+        assert reply['failed'] == 1, reply
+
+        reply = SCons.Remote.run_request(self.request(
+            [exit % 0, exit % 5, exit % 6], ignore = 1))
+        assert reply['status'] == 0, reply
+        assert reply['failed'] is None, reply
+
+    def test_unsafe_paths(self):
+        """Test that requests can't write outside the scratch directory"""
+        for path in [os.path.join(os.pardir, 'f'), self.test.workpath('f')]:
+            request = self.request([], inputs = [(path, 0644, 'x')])
+            self.assertRaises(ValueError, SCons.Remote.run_request, request)
+
+class WriteOutputsTestCase(unittest.TestCase):
+
+    def test_requested_only(self):
+        """Test that only the requested outputs get written"""
+        test = TestCmd.TestCmd(workdir = '')
+        test.subdir('top')
+        top = test.workpath('top')
+        request = {'outputs' : [os.path.join('sub', 'f.out')]}
+        reply = {'outputs' : [(os.path.join('sub', 'f.out'), 0644, 'f\n'),
+                              ('g.out', 0644, 'g\n'),
+                              (os.path.join(os.pardir, 'h'), 0644, 'h\n'),
+                              (test.workpath('i'), 0644, 'i\n')]}
+        SCons.Warnings.enableWarningClass(SCons.Warnings.RemoteExecWarning)
+        save_warningAsException = SCons.Warnings.warningAsException(0)
+        save_warningOut = SCons.Warnings._warningOut
+        warned = []
+        SCons.Warnings._warningOut = warned.append
+        try:
+            SCons.Remote.write_outputs(request, reply, top)
+        finally:
+            SCons.Warnings._warningOut = save_warningOut
+            SCons.Warnings.warningAsException(save_warningAsException)
+        assert test.read(['top', 'sub', 'f.out']) == 'f\n'
+        for path in [['top', 'g.out'], ['h'], ['i']]:
+            assert not os.path.exists(test.workpath(*path)), path
+        assert len(warned) == 3, warned
+
+class PoolTestCase(unittest.TestCase):
+
+    def test_least_busy(self):
+        """Test that the least busy worker gets picked"""
+        pool = SCons.Remote.Pool([('a', 1), ('b', 2)])
+        first = pool.acquire()
+        second = pool.acquire()
+        assert first != second, (first, second)
+        pool.release(second)
+        assert pool.acquire() == second
+
+    def test_unreachable(self):
+        """Test giving up on workers that can't be reached"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        address = sock.getsockname()
+        sock.close()
+
+        SCons.Warnings.enableWarningClass(SCons.Warnings.RemoteExecWarning)
+        save_warningAsException = SCons.Warnings.warningAsException(1)
+        try:
+            pool = SCons.Remote.Pool([address])
+            try:
+                pool.send({})
+            except SCons.Warnings.RemoteExecWarning, e:
+                assert 'running commands locally' in str(e), e
+            else:
+                self.fail("did not warn about an unreachable worker")
+            assert pool.send({}) is None
+        finally:
+            SCons.Warnings.warningAsException(save_warningAsException)
+
+if __name__ == "__main__":
+    suite = unittest.TestSuite()
+    tclasses = [ AddressTestCase,
+                 MessageTestCase,
+                 RunRequestTestCase,
+                 WriteOutputsTestCase,
+                 PoolTestCase,
+               ]
+    for tclass in tclasses:
+        names = unittest.getTestCaseNames(tclass, 'test_')
+        suite.addTests(list(map(tclass, names)))
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
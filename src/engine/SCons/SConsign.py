@@ -31,11 +31,13 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 import SCons.compat
 
+import io
 import os
 # compat layer imports "cPickle" for us if it's available.
 import pickle
 
 import SCons.dblite
+import SCons.Util
 import SCons.Warnings
 
 def corrupt_dblite_warning(filename):
@@ -53,7 +55,8 @@ sig_files = []
 # to open database handles.
 # "DB_Module" is the Python database module to create the handles.
 # "DB_Name" is the base name of the database file (minus any
-# extension the underlying DB module will add).
+# extension the underlying DB module will add, and any suffix for
+# a --hash-format other than the default).
 DataBase = {}
 DB_Module = SCons.dblite
 DB_Name = ".sconsign"
@@ -62,14 +65,15 @@ DB_sync_list = []
 def Get_DataBase(dir):
     global DataBase, DB_Module, DB_Name
     top = dir.fs.Top
-    if not os.path.isabs(DB_Name) and top.repositories:
+    name = DB_Name + SCons.Util.hash_format_suffix()
+    if not os.path.isabs(name) and top.repositories:
         mode = "c"
         for d in [top] + top.repositories:
             if dir.is_under(d):
                 try:
                     return DataBase[d], mode
                 except KeyError:
-                    path = d.entry_abspath(DB_Name)
+                    path = d.entry_abspath(name)
                     try: db = DataBase[d] = DB_Module.open(path, mode)
                     except (IOError, OSError): pass
                     else:
@@ -80,7 +84,7 @@ def Get_DataBase(dir):
     try:
         return DataBase[top], "c"
     except KeyError:
-        db = DataBase[top] = DB_Module.open(DB_Name, "c")
+        db = DataBase[top] = DB_Module.open(name, "c")
         DB_sync_list.append(db)
         return db, "c"
     except TypeError:
@@ -114,6 +118,99 @@ def write():
         else:
             closemethod()
 
+# The entries for each directory in an SConsignFile() database are
+# stored as a pickled (tag, strings, entries) tuple.  The 'entries'
+# dictionary maps each file name to that file's own pickled SConsignEntry,
+# so an entry only gets unpickled when get_entry() first asks for it.
+# The 'strings' list holds the dependency path names the directory's
+# entries have in common; the pickled entries refer to them by (1-based)
+# index instead of each carrying its own copy.  The path names are
+# interned when they're read, so the thousands of entries that depend
+# on the same header files all share the same string objects.
+DB_format_tag = 'SConsignDB-2'
+
+def _dependency_strings(entry):
+    try:
+        binfo = entry.binfo
+    except AttributeError:
+        return []
+    result = []
+    for attr in ['bsources', 'bdepends', 'bimplicit']:
+        try:
+            result.extend(getattr(binfo, attr))
+        except (AttributeError, TypeError):
+            pass
+    return result
+
+def _intern(s):
+    if type(s) is str:
+        return intern(s)
+    return s
+
+def encode_entries(entries, strings=None, raw_entries={}):
+    """
+    Returns the string form of a directory's entries for storing in an
+    SConsignFile() database.  Entries that are still in their pickled
+    form in raw_entries (and not overridden by entries) are stored
+    as-is, so the strings list they were pickled against is extended,
+    not rebuilt.  (DB.write() starts a new list once none are left.)
+    """
+    if strings is None:
+        strings = []
+    ids = {}
+    for i in range(len(strings)):
+        ids[strings[i]] = i + 1
+    for entry in entries.values():
+        for s in _dependency_strings(entry):
+            if type(s) is str and not s in ids:
+                strings.append(s)
+                ids[s] = len(strings)
+    def persistent_id(obj, ids=ids):
+        if type(obj) is str:
+            return ids.get(obj)
+        return None
+    result = raw_entries.copy()
+    for key, entry in entries.items():
+        f = io.BytesIO()
+        p = pickle.Pickler(f, 1)
+        p.persistent_id = persistent_id
+        p.dump(entry)
+        result[key] = f.getvalue()
+    return pickle.dumps((DB_format_tag, strings, result), 1)
+
+def decode_entry(rawentry, strings):
+    """
+    Unpickles a single entry stored by encode_entries().
+    """
+    u = pickle.Unpickler(io.BytesIO(rawentry))
+    u.persistent_load = lambda pid, strings=strings: strings[int(pid)-1]
+    return u.load()
+
+def split_entries(rawentries):
+    """
+    Splits the stored string form of a directory's entries into a
+    tuple of the shared strings list, a dictionary of the entries
+    still in pickled form, and a dictionary of decoded entries (for
+    databases written before entries were stored separately).
+    """
+    entries = pickle.loads(rawentries)
+    if isinstance(entries, dict):
+        return [], {}, entries
+    if not isinstance(entries, tuple) or entries[0] != DB_format_tag:
+        raise TypeError("unknown sconsign entries format")
+    tag, strings, raw = entries
+    return list(map(_intern, strings)), raw, {}
+
+def decode_entries(rawentries):
+    """
+    Returns a dictionary of all of the (decoded) entries in the stored
+    string form of a directory's entries.
+    """
+    strings, raw, entries = split_entries(rawentries)
+    for key, rawentry in raw.items():
+        entries[key] = decode_entry(rawentry, strings)
+    return entries
+
 class SConsignEntry(object):
     """
     Wrapper class for the generic entry in a .sconsign file.
@@ -196,6 +293,8 @@ class DB(Base):
         Base.__init__(self)
 
         self.dir = dir
+        self.strings = []
+        self.raw_entries = {}
 
         db, mode = Get_DataBase(dir)
 
@@ -209,10 +308,8 @@ class DB(Base):
             pass
         else:
             try:
-                self.entries = pickle.loads(rawentries)
-                if not isinstance(self.entries, dict):
-                    self.entries = {}
-                    raise TypeError
+                self.strings, self.raw_entries, self.entries = \
+                    split_entries(rawentries)
             except KeyboardInterrupt:
                 raise
             except Exception, e:
@@ -232,6 +329,27 @@ class DB(Base):
         global sig_files
         sig_files.append(self)
 
+    def get_entry(self, filename):
+        """
+        Fetch the specified entry, unpickling it on first access.
+        """
+        try:
+            return self.entries[filename]
+        except KeyError:
+            pass
+        rawentry = self.raw_entries.pop(filename)
+        try:
+            entry = decode_entry(rawentry, self.strings)
+        except KeyboardInterrupt:
+            raise
+        except Exception, e:
+            SCons.Warnings.warn(SCons.Warnings.CorruptSConsignWarning,
+                                "Ignoring corrupt sconsign entry : %s (%s)\n"%(self.dir.tpath, e))
+            raise KeyError(filename)
+        entry.convert_from_sconsign(self.dir, filename)
+        self.entries[filename] = entry
+        return entry
+
     def write(self, sync=1):
         if not self.dirty:
             return
@@ -247,7 +365,12 @@ class DB(Base):
         path = normcase(self.dir.path)
         for key, entry in self.entries.items():
             entry.convert_to_sconsign()
-        db[path] = pickle.dumps(self.entries, 1)
+        if not self.raw_entries:
+            # No stored entry refers to the old strings any more, so
+            # rebuild the list from the live entries, dropping the
+            # path names that none of them depend on now.
+            self.strings = []
+        db[path] = encode_entries(self.entries, self.strings, self.raw_entries)
 
         if sync:
             try:
@@ -287,7 +410,8 @@ class DirFile(Dir):
         """
 
         self.dir = dir
-        self.sconsign = os.path.join(dir.path, '.sconsign')
+        self.sconsign = os.path.join(dir.path,
+                            '.sconsign' + SCons.Util.hash_format_suffix())
 
         try:
             fp = open(self.sconsign, 'rb')
@@ -24,6 +24,7 @@
 __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 import os
+import pickle
 import sys
 import TestCmd
 import unittest
@@ -258,6 +259,87 @@ class SConsignDBTestCase(SConsignTestCase):
 
             SCons.SConsign.DataBase = save_DataBase
 
+    def test_lazy_entries(self):
+        """Test that DB entries are unpickled only when fetched"""
+        class Dict_DBM(dict):
+            def open(self, name, mode):
+                return self
+
+        dict_dbm = Dict_DBM()
+
+        save_DataBase = SCons.SConsign.DataBase
+        SCons.SConsign.DataBase = {}
+        SCons.SConsign.File(self.test.workpath('sconsign_file'), dict_dbm)
+        try:
+            self._test_lazy_entries(dict_dbm)
+        finally:
+            SCons.SConsign.DataBase = save_DataBase
+            SCons.SConsign.File('.sconsign', SCons.dblite)
+
+    def _test_lazy_entries(self, dict_dbm):
+        dir = DummyNode('dir')
+        d = SCons.SConsign.DB(dir)
+        for name in ['aaa', 'bbb', 'ccc']:
+            entry = DummySConsignEntry(name)
+            entry.binfo.bsources = [name + '.c']
+            entry.binfo.bimplicit = ['include/common.h', name + '.h']
+            d.set_entry(name, entry)
+        SCons.SConsign.write()
+
+        tag, strings, raw = pickle.loads(dict_dbm['dir'])
+        assert tag == SCons.SConsign.DB_format_tag, tag
+        assert strings.count('include/common.h') == 1, strings
+        assert sorted(raw.keys()) == ['aaa', 'bbb', 'ccc'], raw.keys()
+
+        SCons.SConsign.Reset()
+        d = SCons.SConsign.DB(dir)
+        assert d.entries == {}, d.entries
+        aaa = d.get_entry('aaa')
+        assert aaa.name == 'aaa', aaa.name
+        assert aaa.c_from_s, aaa
+        assert aaa.binfo.bsources == ['aaa.c'], aaa.binfo.bsources
+        assert list(d.entries.keys()) == ['aaa'], d.entries
+        bbb = d.get_entry('bbb')
+        assert aaa.binfo.bimplicit[0] is bbb.binfo.bimplicit[0]
+        self.assertRaises(KeyError, d.get_entry, 'ddd')
+
+        # Entries that were never fetched are written back unchanged.
+        d.set_entry('ddd', DummySConsignEntry('ddd'))
+        SCons.SConsign.write()
+        entries = SCons.SConsign.decode_entries(dict_dbm['dir'])
+        assert sorted(entries.keys()) == ['aaa', 'bbb', 'ccc', 'ddd'], entries
+        assert entries['ccc'].binfo.bimplicit == ['include/common.h', 'ccc.h']
+
+        # Once every entry has been fetched, the strings list is rebuilt
+        # and path names that nothing depends on any more drop out.
+        for name in ['aaa', 'bbb', 'ccc', 'ddd']:
+            entry = d.get_entry(name)
+            entry.binfo.bimplicit = [name + '.h']
+        d.dirty = 1
+        SCons.SConsign.write()
+        tag, strings, raw = pickle.loads(dict_dbm['dir'])
+        assert not 'include/common.h' in strings, strings
+        entries = SCons.SConsign.decode_entries(dict_dbm['dir'])
+        assert entries['ccc'].binfo.bimplicit == ['ccc.h'], entries['ccc']
+
+    def test_old_format(self):
+        """Test reading DB entries stored as a single pickled dictionary"""
+        old = pickle.dumps({'aaa' : DummySConsignEntry('aaa')}, 1)
+        entries = SCons.SConsign.decode_entries(old)
+        assert list(entries.keys()) == ['aaa'], entries
+        assert entries['aaa'].name == 'aaa', entries['aaa'].name
+
+        save_DataBase = SCons.SConsign.DataBase
+        try:
+            dir = DummyNode('dir')
+            SCons.SConsign.DataBase = {dir : {'dir' : old}}
+            d = SCons.SConsign.DB(dir)
+            aaa = d.get_entry('aaa')
+            assert aaa.name == 'aaa', aaa.name
+            assert aaa.c_from_s, aaa
+        finally:
+            SCons.SConsign.DataBase = save_DataBase
+
 class SConsignDirFileTestCase(SConsignTestCase):
 
     def test_SConsignDirFile(self):
@@ -43,6 +43,9 @@ class SConsCPPScanner(SCons.cpp.PreProcessor):
     by Nodes, not strings; 2) we can keep track of the files that are
     missing.
     """
+    # Whether the content signatures that parsed results are kept
+    # under come for free (see SCons.Scanner.decides_by_content()).
+    by_content = 1
     def __init__(self, *args, **kw):
         SCons.cpp.PreProcessor.__init__(self, *args, **kw)
         self.missing = []
@@ -64,6 +67,14 @@ class SConsCPPScanner(SCons.cpp.PreProcessor):
             return ''
         else:
             return fp.read()
+    def read_tuples(self, file):
+        # Headers get included over and over, so only tupleize each
+        # one's contents once.
+        if not self.by_content or not file.rexists():
+            return SCons.cpp.PreProcessor.read_tuples(self, file)
+        return file.get_parsed('cpp_tuples', self.tupleize_file)
+    def tupleize_file(self, file):
+        return self.tupleize(self.read_file(file))
 
 def dictify_CPPDEFINES(env):
     cppdefines = env.get('CPPDEFINES', {})
@@ -97,6 +108,7 @@ class SConsCPPScannerWrapper(object):
         cpp = SConsCPPScanner(current = node.get_dir(),
                               cpppath = path,
                               dict = dictify_CPPDEFINES(env))
+        cpp.by_content = SCons.Scanner.decides_by_content(env)
         result = cpp(node)
         for included, includer in cpp.missing:
             fmt = "No dependency generated for file: %s (included from: %s) -- file not found"
@@ -35,6 +35,7 @@ import SCons.Node.FS
 import SCons.Warnings
 
 import SCons.Scanner.C
+import SCons.cpp
 
 test = TestCmd.TestCmd(workdir = '')
 
@@ -436,6 +437,37 @@ class CScannerTestCase15(unittest.TestCase):
         for suffix in suffixes:
             assert suffix in s.get_skeys(env), "%s not in skeys" % suffix
 
+class CScannerTestCase16(unittest.TestCase):
+    def runTest(self):
+        """Verify that the cpp.py-based scanner tupleizes each file once"""
+        env = DummyEnvironment(CPPPATH=[])
+        s = SCons.Scanner.C.SConsCPPScannerWrapper("CScanner", "CPPPATH")
+        path = s.path(env)
+        tupleized = []
+        save_tupleize = SCons.cpp.PreProcessor.tupleize
+        def tupleize(self, contents, tupleized=tupleized):
+            tupleized.append(contents)
+            return save_tupleize(self, contents)
+        SCons.cpp.PreProcessor.tupleize = tupleize
+        try:
+            deps = s(env.File('f1.cpp'), env, path)
+            deps_match(self, deps, ['f1.h', 'f2.h', 'fi.h'])
+            # f1.h and f2.h have the same contents.
+            n = len(tupleized)
+            assert n == 3, tupleized
+            deps = s(env.File('f1.cpp'), env, path)
+            deps_match(self, deps, ['f1.h', 'f2.h', 'fi.h'])
+            assert len(tupleized) == n, tupleized
+
+            # Without content signatures to go by, every file gets
+            # tupleized again.
+            env.decides_by_content = lambda: 0
+            deps = s(env.File('f1.cpp'), env, path)
+            deps_match(self, deps, ['f1.h', 'f2.h', 'fi.h'])
+            assert len(tupleized) == n + 4, tupleized
+        finally:
+            SCons.cpp.PreProcessor.tupleize = save_tupleize
+
 
 
 def suite():
@@ -454,6 +486,7 @@ def suite():
     suite.addTest(CScannerTestCase13())
     suite.addTest(CScannerTestCase14())
     suite.addTest(CScannerTestCase15())
+    suite.addTest(CScannerTestCase16())
     return suite
 
 if __name__ == "__main__":
@@ -60,9 +60,9 @@ class D(SCons.Scanner.Classic):
             i = SCons.Node.FS.find_file (inc + '.di', (source_dir,) + path)
         return i, include
 
-    def find_include_names(self, node):
+    def find_include_names_in(self, text):
         includes = []
-        for i in self.cre.findall(node.get_text_contents()):
+        for i in self.cre.findall(text):
             includes = includes + self.cre2.findall(i)
         return includes
 
@@ -80,6 +80,42 @@ class FindPathDirsTestCase(unittest.TestCase):
         result = fpd(env, dir)
         assert str(result) == "('xxx', 'foo')", result
 
+    def test_FindPathDirs_cache(self):
+        """Test caching FindPathDirs results for path values"""
+        class VersionedEnvironment(DummyEnvironment):
+            # The version doesn't change with changes made in place.
+            def get_version(self, key=None):
+                return 1
+
+        env = VersionedEnvironment(LIBPATH = [ 'foo' ], BAR = 'bar')
+        env.fs._cwd = DummyNode('cwd')
+        fpd = SCons.Scanner.FindPathDirs('LIBPATH')
+        result = fpd(env)
+        assert str(result) == "('foo',)", result
+        env['LIBPATH'] = [ 'foo', 'xxx' ]
+        result = fpd(env)
+        assert str(result) == "('foo', 'xxx')", result
+
+        # Changes made in place get seen.
+        env['LIBPATH'].append('yyy')
+        result = fpd(env)
+        assert str(result) == "('foo', 'xxx', 'yyy')", result
+
+        # Equal values share the cached result.
+        dir = DummyNode('dir', ['zzz'])
+        result1 = fpd(env, dir)
+        env['LIBPATH'] = [ 'foo', 'xxx', 'yyy' ]
+        result2 = fpd(env, dir)
+        assert result1 is result2, (result1, result2)
+
+        # Paths with variables to expand aren't cached.
+        env['LIBPATH'] = [ '$BAR' ]
+        result = fpd(env)
+        assert str(result) == "('bar',)", result
+        env['BAR'] = 'baz'
+        result = fpd(env)
+        assert str(result) == "('baz',)", result
+
 class ScannerTestCase(unittest.TestCase):
 
     def test_creation(self):
@@ -546,6 +582,98 @@ class ClassicTestCase(unittest.TestCase):
         ret = s.function(n, env, ('foo5',))
         assert ret == ['jkl', 'mno'], ret
 
+    def test_get_include_names(self):
+        """Test the Scanner.Classic get_include_names() method"""
+        class MyNode(object):
+            def __init__(self, contents):
+                self.contents = contents
+            def get_text_contents(self):
+                return self.contents
+        class MyFile(MyNode):
+            parsed = {}
+            def get_parsed(self, name, parse):
+                key = (name, self.contents)
+                try:
+                    return self.parsed[key]
+                except KeyError:
+                    result = self.parsed[key] = parse(self)
+                    return result
+
+        s1 = SCons.Scanner.Classic("t1", ['.suf'], 'MYPATH', '^my_inc (\S+)')
+        s2 = SCons.Scanner.Classic("t2", ['.suf'], 'MYPATH', '^inc (\S+)')
+        assert s1.parsed_name != s2.parsed_name
+
+        # Nodes that don't remember what was parsed out of them get
+        # searched every time.
+        ret = s1.get_include_names(MyNode('my_inc abc\n'))
+        assert ret == ['abc'], ret
+
+        f = MyFile('my_inc abc\ninc def\n')
+        assert s1.get_include_names(f) == ['abc']
+        assert s2.get_include_names(f) == ['def']
+        assert MyFile.parsed[(s1.parsed_name, f.contents)] == ['abc']
+
+        f.contents = 'my_inc ghi\n'
+        assert s1.get_include_names(f) == ['ghi']
+
+        # Environments that don't decide by content get every file
+        # searched, since signing it would cost more.
+        class MyEnv(object):
+            def decides_by_content(self):
+                return 0
+        f.contents = 'my_inc jkl\n'
+        assert s1.get_include_names(f, MyEnv()) == ['jkl']
+        assert (s1.parsed_name, f.contents) not in MyFile.parsed
+
+    def test_prefetch(self):
+        """Test the Scanner.Classic prefetch() method"""
+        class MyFile(object):
+            includes = None
+            def rfile(self):
+                return self
+            def prefetch_parsed(self, name, parse_text):
+                self.prefetched = (name, parse_text('my_inc abc\n'))
+        class MyClassic(SCons.Scanner.Classic):
+            def find_include_names(self, node):
+                return []
+
+        s = SCons.Scanner.Classic("t", ['.suf'], 'MYPATH', '^my_inc (\S+)')
+        save_prefetcher = SCons.Node.FS.csig_prefetcher
+        try:
+            f = MyFile()
+            SCons.Node.FS.csig_prefetcher = None
+            s.prefetch(f)
+            assert not hasattr(f, 'prefetched')
+
+            SCons.Node.FS.csig_prefetcher = 'fake'
+            s.prefetch(f)
+            assert f.prefetched == (s.parsed_name, ['abc']), f.prefetched
+
+            # Files that were already scanned are left alone.
+            f = MyFile()
+            f.includes = []
+            s.prefetch(f)
+            assert not hasattr(f, 'prefetched')
+
+            # So are files whose scanner finds include names its own way.
+            f = MyFile()
+            MyClassic("t", ['.suf'], 'MYPATH', '^my_inc (\S+)').prefetch(f)
+            assert not hasattr(f, 'prefetched')
+
+            # So are files scanned for environments that don't decide
+            # by content.
+            class MyEnv(object):
+                def decides_by_content(self):
+                    return 0
+            f = MyFile()
+            s.prefetch(f, MyEnv())
+            assert not hasattr(f, 'prefetched')
+
+            # Nodes that can't be prefetched are skipped.
+            s.prefetch(object())
+        finally:
+            SCons.Node.FS.csig_prefetcher = save_prefetcher
+
         
 
 class ClassicCPPTestCase(unittest.TestCase):
@@ -59,23 +59,55 @@ def Scanner(function, *args, **kw):
     else:
         return Base(function, *args, **kw)
 
+def decides_by_content(env):
+    """
+    Returns whether the source files scanned for env will have their
+    content signatures computed anyway, which is when it's worth
+    remembering what's parsed out of them by signature.  Environments
+    that can't say (and no environment at all) count as yes.
+    """
+    try:
+        decides_by_content = env.decides_by_content
+    except AttributeError:
+        return 1
+    return decides_by_content()
+
 
 
 class FindPathDirs(object):
     """A class to bind a specific *PATH variable name to a function that
-    will return all of the *path directories."""
+    will return all of the *path directories.
+
+    The directories get cached for each value of the path variable
+    (and directory), unless the path has construction variables to
+    expand, which might be different for each target.  Keying on the
+    value rather than on the environment's version means changes made
+    in place, like env['CPPPATH'].append(x), get seen, and that clones
+    and override environments with the same path share results.
+    """
     def __init__(self, variable):
         self.variable = variable
+        self._memo = {}
     def __call__(self, env, dir=None, target=None, source=None, argument=None):
         import SCons.PathList
         try:
             path = env[self.variable]
         except KeyError:
             return ()
-
         dir = dir or env.fs._cwd
-        path = SCons.PathList.PathList(path).subst_path(env, target, source)
-        return tuple(dir.Rfindalldirs(path))
+        # PathList objects are cached by value, so equal paths get the
+        # same one.
+        pathlist = SCons.PathList.PathList(path)
+        memo_key = (pathlist, dir)
+        try:
+            return self._memo[memo_key]
+        except KeyError:
+            pass
+        path = pathlist.subst_path(env, target, source)
+        result = tuple(dir.Rfindalldirs(path))
+        if not pathlist.needs_subst():
+            self._memo[memo_key] = result
+        return result
 
 
 
@@ -243,6 +275,17 @@ class Base(object):
             return env.subst_list(self.skeys)[0]
         return self.skeys
 
+    def prefetch(self, node, env=None):
+        """
+        Hook for starting to read and search node in the background,
+        ahead of its being scanned for env.  Scanners that know how to
+        hand the work off (like Classic) override this; those that
+        select among others pass it on to the one for node.
+        """
+        s = self.select(node)
+        if s is not None and s is not self:
+            s.prefetch(node, env)
+
     def select(self, node):
         if SCons.Util.is_Dict(self.function):
             key = node.scanner_key()
@@ -326,11 +369,16 @@ class Classic(Current):
 
         self.cre = re.compile(regex, re.M)
 
+        # What the names of the included files are kept as in the
+        # files' .sconsign entries (see get_include_names()).
+        self.parsed_name = 'includes ' + \
+            SCons.Util.MD5signature(self.__class__.__name__ + ' ' + regex)
+
         def _scan(node, env, path=(), self=self):
             node = node.rfile()
             if not node.exists():
                 return []
-            return self.scan(node, path)
+            return self.scan(node, path, env)
 
         kw['function'] = _scan
         kw['path_function'] = FindPathDirs(path_variable)
@@ -348,15 +396,58 @@ class Classic(Current):
         return SCons.Node.FS._my_normcase(include)
 
     def find_include_names(self, node):
-        return self.cre.findall(node.get_text_contents())
+        return self.find_include_names_in(node.get_text_contents())
+
+    def find_include_names_in(self, text):
+        return self.cre.findall(text)
+
+    def get_include_names(self, node, env=None):
+        """
+        Returns the names of the files the node includes.  They only
+        depend on its contents, so they're remembered by its content
+        signature (and across builds in its .sconsign entry), and only
+        files whose contents changed get searched again; finding the
+        files the names refer to is redone every time.  When env
+        doesn't decide by content, the signature would cost more than
+        searching, so the node just gets searched.
+        """
+        try:
+            get_parsed = node.get_parsed
+        except AttributeError:
+            return self.find_include_names(node)
+        if not decides_by_content(env):
+            return self.find_include_names(node)
+        return get_parsed(self.parsed_name, self.find_include_names)
+
+    def prefetch(self, node, env=None):
+        """
+        Gets node read and searched for include names by the
+        background threads (see SCons.Node.FS.CSigPrefetcher), so
+        get_include_names() finds them waiting.  Only the text is
+        handed off, which is why this is skipped for subclasses that
+        find the names some other way than find_include_names_in().
+        """
+        if SCons.Node.FS.csig_prefetcher is None:
+            return
+        if self.__class__.find_include_names != Classic.find_include_names:
+            return
+        if not decides_by_content(env):
+            return
+        try:
+            node = node.rfile()
+            prefetch_parsed = node.prefetch_parsed
+        except AttributeError:
+            return
+        if node.includes is None:
+            prefetch_parsed(self.parsed_name, self.find_include_names_in)
 
-    def scan(self, node, path=()):
+    def scan(self, node, path=(), env=None):
 
         # cache the includes list in node so we only scan it once:
         if node.includes is not None:
             includes = node.includes
         else:
-            includes = self.find_include_names (node)
+            includes = self.get_include_names(node, env)
             # Intern the names of the include files. Saves some memory
             # if the same header is included many times.
             node.includes = list(map(SCons.Util.silent_intern, includes))
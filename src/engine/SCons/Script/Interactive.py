@@ -118,6 +118,8 @@ class SConsInteractiveCmd(cmd.Cmd):
         'sh'    : 'shell',
     }
 
+    journal = None
+
     def __init__(self, **kw):
         cmd.Cmd.__init__(self)
         for key, val in kw.items():
@@ -128,6 +130,12 @@ class SConsInteractiveCmd(cmd.Cmd):
         else:
             self.shell_variable = 'SHELL'
 
+    def close(self):
+        """Releases the change journal (and its inotify descriptor)."""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
     def default(self, argv):
         print "*** Unknown command: %s" % argv[0]
 
@@ -216,6 +224,10 @@ class SConsInteractiveCmd(cmd.Cmd):
 
         SCons.Script.Main.progress_display("scons: Clearing cached node information ...")
 
+        journal = self.journal
+        if journal is not None:
+            changed = journal.changed()
+
         seen_nodes = {}
 
         def get_unseen_children(node, parent, seen_nodes=seen_nodes):
@@ -250,6 +262,15 @@ class SConsInteractiveCmd(cmd.Cmd):
                 n = walker.get_next()
 
         for node in seen_nodes.keys():
+            # If the change journal can vouch that nothing on disk
+            # changed for this Node since we last looked, hang on to
+            # the stat() and content signature information we already
+            # have so we don't have to go to the file system again.
+            saved = None
+            if journal is not None and changed is not None:
+                if self._journal_trusts(node, changed):
+                    saved = self._save_disk_info(node)
+
             # Call node.clear() to clear most of the state
             node.clear()
             # node.clear() doesn't reset node.state, so call
@@ -257,6 +278,15 @@ class SConsInteractiveCmd(cmd.Cmd):
             node.set_state(SCons.Node.no_state)
             node.implicit = None
 
+            if saved:
+                self._restore_disk_info(node, saved)
+            if journal is not None:
+                try:
+                    journal.watch(node.abspath)
+                except AttributeError:
+                    # Not a file system Node.
+                    pass
+
             # Debug:  Uncomment to verify that all Taskmaster reference
             # counts have been reset to zero.
             #if node.ref_count != 0:
@@ -266,6 +296,48 @@ class SConsInteractiveCmd(cmd.Cmd):
         SCons.SConsign.Reset()
         SCons.Script.Main.progress_display("scons: done clearing node information.")
 
+    def _journal_trusts(self, node, changed):
+        """Returns whether the journal has been watching the Node (and
+        any source-directory or Repository file it stands in for)
+        and has seen no change to it."""
+        nodes = [node]
+        try:
+            nodes.extend([node.srcnode(), node.rfile()])
+        except AttributeError:
+            pass
+        for n in nodes:
+            try:
+                path = n.abspath
+            except AttributeError:
+                return False
+            if path in changed or not self.journal.is_watched(path):
+                return False
+        return True
+
+    def _save_disk_info(self, node):
+        import SCons.Node.FS
+        saved = {}
+        try:
+            saved['stat'] = node._memo['stat']
+        except KeyError:
+            pass
+        if isinstance(node, SCons.Node.FS.File):
+            try:
+                saved['csig'] = node.ninfo.csig
+            except AttributeError:
+                pass
+        return saved
+
+    def _restore_disk_info(self, node, saved):
+        try:
+            node._memo['stat'] = saved['stat']
+        except KeyError:
+            pass
+        try:
+            node.get_ninfo().csig = saved['csig']
+        except KeyError:
+            pass
+
     def do_clean(self, argv):
         """\
         clean [TARGETS]         Clean (remove) the specified TARGETS
@@ -369,13 +441,193 @@ class SConsInteractiveCmd(cmd.Cmd):
         sys.stdout.write(self.parser.version + '\n')
 
 def interact(fs, parser, options, targets, target_top):
+    import SCons.Journal
     c = SConsInteractiveCmd(prompt = 'scons>>> ',
                             fs = fs,
                             parser = parser,
                             options = options,
                             targets = targets,
-                            target_top = target_top)
-    c.cmdloop()
+                            target_top = target_top,
+                            journal = SCons.Journal.Journal(options.change_journal))
+    try:
+        c.cmdloop()
+    finally:
+        c.close()
+
+# Server mode (--listen) and its thin client (--connect).
+#
+# The server reads the SConscript files once, exactly like --interactive,
+# and then keeps the Node graph, construction environments and .sconsign
+# information resident while it waits for clients on a Unix-domain
+# socket.  Each connection carries a single interactive-mode command
+# line.  While the command runs, the server's stdout and stderr file
+# descriptors are redirected to the connection, so output from both
+# SCons itself and the commands it spawns goes straight back to the
+# client.  The reply ends with a NUL byte followed by the exit status
+# of the command, which the client strips off and uses as its own exit
+# status.
+
+server_status_marker = '\0'
+
+def _server_socket(address):
+    import socket
+    try:
+        family = socket.AF_UNIX
+    except AttributeError:
+        import SCons.Errors
+        msg = "Unix-domain sockets are not supported on this platform: %s"
+        raise SCons.Errors.UserError(msg % address)
+    return socket.socket(family, socket.SOCK_STREAM)
+
+def _read_command(conn):
+    data = ''
+    while '\n' not in data:
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        data = data + chunk
+    return data.split('\n', 1)[0]
+
+def _run_one_command(c, conn):
+    """Runs the command line read from connection conn, with stdout and
+    stderr redirected to the connection.  Returns a tuple of the
+    command's exit status and, if the command asked the server to shut
+    down, the SystemExit exception it raised."""
+    import SCons.Script.Main
+
+    line = _read_command(conn)
+    if not line.strip():
+        line = 'build'
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_stdout = os.dup(1)
+    saved_stderr = os.dup(2)
+    os.dup2(conn.fileno(), 1)
+    os.dup2(conn.fileno(), 2)
+    status = 0
+    exiting = None
+    try:
+        SCons.Script.Main.this_build_status = 0
+        try:
+            c.onecmd(line)
+        except SystemExit, e:
+            exiting = e
+        except KeyboardInterrupt:
+            raise
+        except Exception, e:
+            status = 2
+            try:
+                sys.stderr.write('scons: *** %s\n' % e)
+            except EnvironmentError:
+                # The client went away (see serve()).
+                pass
+        else:
+            status = SCons.Script.Main.this_build_status
+    finally:
+        for f in [sys.stdout, sys.stderr]:
+            try:
+                f.flush()
+            except EnvironmentError:
+                pass
+        os.dup2(saved_stdout, 1)
+        os.dup2(saved_stderr, 2)
+        os.close(saved_stdout)
+        os.close(saved_stderr)
+    return status, exiting
+
+def serve(fs, parser, options, targets, target_top, address):
+    """Runs SCons as a build server, answering interactive-mode
+    commands sent by clients over the Unix-domain socket address."""
+    import SCons.Journal
+    c = SConsInteractiveCmd(prompt = '',
+                            fs = fs,
+                            parser = parser,
+                            options = options,
+                            targets = targets,
+                            target_top = target_top,
+                            journal = SCons.Journal.Journal(options.change_journal))
+    # The "build" command restores its options from here each time,
+    # so keep the server-only option out of subsequent builds.
+    c.options.listen = None
+
+    if os.path.exists(address):
+        os.unlink(address)
+    sock = _server_socket(address)
+    sock.bind(address)
+    sock.listen(5)
+    try:
+        exiting = None
+        while not exiting:
+            conn, addr = sock.accept()
+            try:
+                try:
+                    status, exiting = _run_one_command(c, conn)
+                    conn.sendall(server_status_marker + str(status) + '\n')
+                except EnvironmentError:
+                    # The client disconnected (say, with a Ctrl-C)
+                    # before it got all of the output; that's no reason
+                    # to stop serving the others.
+                    pass
+            finally:
+                conn.close()
+    finally:
+        c.close()
+        sock.close()
+        try:
+            os.unlink(address)
+        except OSError:
+            pass
+    raise exiting
+
+def connect(address, args, stdout=None):
+    """Sends the command line in args to the build server listening
+    on address, copies the server's output to stdout, and returns the
+    exit status of the command."""
+    if stdout is None:
+        stdout = sys.stdout
+    def quote(arg):
+        if not arg or re.search(r'\s', arg):
+            arg = '"%s"' % arg
+        return arg
+    line = ' '.join(map(quote, args)) or 'build'
+
+    import socket
+    sock = _server_socket(address)
+    try:
+        sock.connect(address)
+    except socket.error, e:
+        sys.stderr.write("scons: *** Could not connect to build server %s: %s\n"
+                         % (address, e.args[-1]))
+        return 2
+    try:
+        sock.sendall(line + '\n')
+        # Hold back a short tail of the output until we reach the end,
+        # so the trailing exit status never gets written to stdout.
+        tail_size = 32
+        pending = ''
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            pending = pending + chunk
+            if len(pending) > tail_size:
+                stdout.write(pending[:-tail_size])
+                pending = pending[-tail_size:]
+    finally:
+        sock.close()
+
+    i = pending.rfind(server_status_marker)
+    if i < 0:
+        stdout.write(pending)
+        sys.stderr.write("scons: *** Build server %s exited unexpectedly.\n" % address)
+        return 2
+    stdout.write(pending[:i])
+    stdout.flush()
+    try:
+        return int(pending[i+1:].strip())
+    except ValueError:
+        return 2
 
 # Local Variables:
 # tab-width:4
@@ -61,6 +61,7 @@ import SCons.Job
 import SCons.Node
 import SCons.Node.FS
 import SCons.Platform
+import SCons.Remote
 import SCons.SConf
 import SCons.Script
 import SCons.Taskmaster
@@ -437,6 +438,7 @@ cumulative_command_time = 0
 exit_status = 0 # final exit status, assume success by default
 this_build_status = 0 # "exit status" of an individual build
 num_jobs = None
+dispatch_latencies = []
 delayed_warnings = []
 
 class FakeOptionParser(object):
@@ -875,6 +877,19 @@ def _main(parser):
         except OSError:
             sys.stderr.write("Could not change directory to %s\n" % script_dir)
 
+    # A --connect client hands its command line to an already-running
+    # build server and never reads any SConscript files itself.
+    if options.connect:
+        exit_status = SCons.Script.Interactive.connect(options.connect,
+                                                       parser.largs + parser.rargs)
+        return
+
+    # Neither does a remote worker; it just runs the commands that
+    # builds send it, until it's killed.
+    if options.remote_worker:
+        SCons.Remote.serve(options.remote_worker, options.num_jobs)
+        return
+
     # Now that we're in the top-level SConstruct directory, go ahead
     # and initialize the FS object that represents the file system,
     # and make it the build engine default.
@@ -1052,15 +1067,25 @@ def _main(parser):
     SCons.Node.implicit_cache = options.implicit_cache
     SCons.Node.FS.set_duplicate(options.duplicate)
     fs.set_max_drift(options.max_drift)
+    SCons.Node.FS.save_parsed = options.save_parsed
 
     SCons.Job.explicit_stack_size = options.stack_size
+    SCons.Job.backend = options.jobs_backend
+    SCons.Job.max_load = options.load_average
+    SCons.Job.min_free_memory = options.min_free_memory
+    if options.remote_exec:
+        SCons.Remote.workers = SCons.Remote.parse_addresses(options.remote_exec)
 
     if options.md5_chunksize:
         SCons.Node.FS.File.md5_chunksize = options.md5_chunksize
 
     platform = SCons.Platform.platform_module()
 
-    if options.interactive:
+    if options.listen:
+        SCons.Script.Interactive.serve(fs, OptionsParser, options,
+                                       targets, target_top, options.listen)
+
+    elif options.interactive:
         SCons.Script.Interactive.interact(fs, OptionsParser, options,
                                           targets, target_top)
 
@@ -1215,13 +1240,14 @@ def _build_targets(fs, options, targets, target_top):
         tmtrace = open(options.taskmastertrace_file, 'wb')
     else:
         tmtrace = None
-    taskmaster = SCons.Taskmaster.Taskmaster(nodes, task_class, order, tmtrace)
+    taskmaster = SCons.Taskmaster.Taskmaster(nodes, task_class, order, tmtrace,
+                                             options.schedule)
 
     # Let the BuildTask objects get at the options to respond to the
     # various print_* settings, tree_printer list, etc.
     BuildTask.options = options
 
-    global num_jobs
+    global num_jobs, dispatch_latencies
     num_jobs = options.num_jobs
     jobs = SCons.Job.Jobs(num_jobs, taskmaster)
     if num_jobs > 1:
@@ -1231,8 +1257,16 @@ def _build_targets(fs, options, targets, target_top):
                   "\tignoring -j or num_jobs option.\n"
         elif sys.platform == 'win32':
             msg = fetch_win32_parallel_msg()
+        elif options.jobs_backend == 'process' and \
+             not SCons.Job.have_multiprocessing():
+            msg = "the process jobs backend is unsupported on this platform;\n" + \
+                  "\tusing threads for all jobs.\n"
         if msg:
             SCons.Warnings.warn(SCons.Warnings.NoParallelSupportWarning, msg)
+    if jobs.num_jobs > 1:
+        SCons.Node.FS.csig_prefetcher = SCons.Node.FS.CSigPrefetcher(jobs.num_jobs)
+        SCons.Node.prefetch_scans = 1
+        SCons.Node.prefetch_caches = 1
 
     memory_stats.append('before building targets:')
     count_stats.append(('pre-', 'build'))
@@ -1261,7 +1295,22 @@ def _build_targets(fs, options, targets, target_top):
             SCons.SConsign.write()
 
     progress_display("scons: " + opening_message)
-    jobs.run(postfunc = jobs_postfunc)
+    try:
+        jobs.run(postfunc = jobs_postfunc)
+    finally:
+        if SCons.Node.FS.csig_prefetcher is not None:
+            SCons.Node.FS.csig_prefetcher.stop()
+            SCons.Node.FS.csig_prefetcher = None
+            SCons.Node.prefetch_scans = 0
+            SCons.Node.prefetch_caches = 0
+        SCons.CacheDir.stop_lookups()
+    dispatch_latencies = jobs.dispatch_latencies()
+    SCons.CacheDir.wait_for_pushes()
+    SCons.CacheDir.stop_evictions()
+
+    if options.cache_stats:
+        for line in SCons.CacheDir.stats_report():
+            print line
 
     memory_stats.append('after building targets:')
     count_stats.append(('post-', 'build'))
@@ -1395,6 +1444,10 @@ def main():
         print "Total SConscript file execution time: %f seconds"%sconscript_time
         print "Total SCons execution time: %f seconds"%scons_time
         print "Total command execution time: %f seconds"%ct
+        if dispatch_latencies:
+            average = sum(dispatch_latencies) / len(dispatch_latencies)
+            print "Average job dispatch latency: %f seconds"%average
+            print "Maximum job dispatch latency: %f seconds"%max(dispatch_latencies)
 
     sys.exit(exit_status)
 
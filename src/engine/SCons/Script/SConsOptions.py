@@ -37,7 +37,12 @@ except ImportError:
         return message
 _ = gettext
 
+import SCons.Job
+import SCons.Journal
 import SCons.Node.FS
+import SCons.Remote
+import SCons.Taskmaster
+import SCons.Util
 import SCons.Warnings
 
 OptionValueError        = optparse.OptionValueError
@@ -118,13 +123,18 @@ class SConsValues(optparse.Values):
         'clean',
         'diskcheck',
         'duplicate',
+        'hash_format',
         'help',
         'implicit_cache',
+        'jobs_backend',
         'max_drift',
         'md5_chunksize',
         'no_exec',
         'num_jobs',
         'random',
+        'remote_exec',
+        'save_parsed',
+        'schedule',
         'stack_size',
         'warn',
     ]
@@ -143,6 +153,9 @@ class SConsValues(optparse.Values):
                     raise ValueError
             except ValueError:
                 raise SCons.Errors.UserError("A positive integer is required: %s"%repr(value))
+        elif name == 'jobs_backend':
+            if not value in SCons.Job.backend_types:
+                raise SCons.Errors.UserError("Not a valid jobs backend type: %s" % value)
         elif name == 'max_drift':
             try:
                 value = int(value)
@@ -168,6 +181,21 @@ class SConsValues(optparse.Values):
                 # Set this right away so it can affect the rest of the
                 # file/Node lookups while processing the SConscript files.
                 SCons.Node.FS.set_diskcheck(value)
+        elif name == 'hash_format':
+            if not 'hash_format' in self.__dict__:
+                # No --hash-format= option was specified on the command
+                # line.  Set this right away so it affects any signatures
+                # calculated while processing the SConscript files.
+                try:
+                    SCons.Util.set_hash_format(value)
+                except ValueError, e:
+                    raise SCons.Errors.UserError(str(e))
+        elif name == 'remote_exec':
+            # Raises UserError for us if it's not valid.
+            SCons.Remote.parse_addresses(value)
+        elif name == 'schedule':
+            if not value in SCons.Taskmaster.schedule_types:
+                raise SCons.Errors.UserError("Not a valid schedule type: %s" % value)
         elif name == 'stack_size':
             try:
                 value = int(value)
@@ -568,6 +596,24 @@ def Parser(version):
                   action="store_true",
                   help="Print build actions for files from CacheDir.")
 
+    op.add_option('--cache-stats',
+                  dest='cache_stats', default=False,
+                  action="store_true",
+                  help="Print CacheDir statistics after building.")
+
+    def opt_change_journal(option, opt, value, parser):
+        if not value in SCons.Journal.journal_types:
+            raise OptionValueError("Warning:  %s is not a valid change journal type" % value)
+        setattr(parser.values, option.dest, value)
+    opt_change_journal_help = "Track file changes between interactive builds: %s." \
+                              % ", ".join(SCons.Journal.journal_types)
+    op.add_option('--change-journal',
+                  nargs=1, type="string",
+                  dest="change_journal", default="none",
+                  action="callback", callback=opt_change_journal,
+                  help=opt_change_journal_help,
+                  metavar="TYPE")
+
     config_options = ["auto", "force" ,"cache"]
 
     def opt_config(option, opt, value, parser, c_options=config_options):
@@ -583,6 +629,13 @@ def Parser(version):
                   help = opt_config_help,
                   metavar="MODE")
 
+    op.add_option('--connect',
+                  nargs=1, type="string",
+                  dest="connect", default=None,
+                  action="store",
+                  help="Send a command to the build server at SOCKET.",
+                  metavar="SOCKET")
+
     op.add_option('-D',
                   dest="climb_up", default=None,
                   action="store_const", const=2,
@@ -672,6 +725,19 @@ def Parser(version):
                   action="help",
                   help="Print this message and exit.")
 
+    def opt_hash_format(option, opt, value, parser):
+        try:
+            SCons.Util.set_hash_format(value)
+        except ValueError, e:
+            raise OptionValueError("Warning:  %s" % e)
+        setattr(parser.values, option.dest, value)
+    op.add_option('--hash-format',
+                  nargs=1, type="string",
+                  dest="hash_format", default=None,
+                  action="callback", callback=opt_hash_format,
+                  help="Hash file contents with ALGORITHM (default md5).",
+                  metavar="ALGORITHM")
+
     op.add_option('-i', '--ignore-errors',
                   dest='ignore_errors', default=False,
                   action="store_true",
@@ -715,11 +781,38 @@ def Parser(version):
                   help="Allow N jobs at once.",
                   metavar="N")
 
+    def opt_jobs_backend(option, opt, value, parser):
+        if not value in SCons.Job.backend_types:
+            raise OptionValueError("Warning:  %s is not a valid jobs backend type" % value)
+        setattr(parser.values, option.dest, value)
+    opt_jobs_backend_help = "Run parallel jobs in: %s." \
+                            % ", ".join(SCons.Job.backend_types)
+    op.add_option('--jobs-backend',
+                  nargs=1, type="string",
+                  dest="jobs_backend", default="thread",
+                  action="callback", callback=opt_jobs_backend,
+                  help=opt_jobs_backend_help,
+                  metavar="TYPE")
+
     op.add_option('-k', '--keep-going',
                   dest='keep_going', default=False,
                   action="store_true",
                   help="Keep going when a target can't be made.")
 
+    op.add_option('-l', '--load-average', '--max-load',
+                  nargs=1, type="float",
+                  dest="load_average", default=0,
+                  action="store",
+                  help="Don't start multiple jobs unless load is below N.",
+                  metavar="N")
+
+    op.add_option('--listen',
+                  nargs=1, type="string",
+                  dest="listen", default=None,
+                  action="store",
+                  help="Run as a build server listening on SOCKET.",
+                  metavar="SOCKET")
+
     op.add_option('--max-drift',
                   nargs=1, type="int",
                   dest='max_drift', default=SCons.Node.FS.default_max_drift,
@@ -734,6 +827,14 @@ def Parser(version):
                   help="Set chunk-size for MD5 signature computation to N kilobytes.",
                   metavar="N")
 
+    op.add_option('--min-free-memory',
+                  nargs=1, type="int",
+                  dest="min_free_memory", default=0,
+                  action="store",
+                  help="Don't start multiple jobs unless N megabytes "
+                       "of memory are available.",
+                  metavar="N")
+
     op.add_option('-n', '--no-exec', '--just-print', '--dry-run', '--recon',
                   dest='no_exec', default=False,
                   action="store_true",
@@ -766,11 +867,50 @@ def Parser(version):
                   action="store_true",
                   help="Build dependencies in random order.")
 
+    def opt_remote_exec(option, opt, value, parser):
+        try:
+            SCons.Remote.parse_addresses(value)
+        except SCons.Errors.UserError, e:
+            raise OptionValueError("Warning:  %s" % e)
+        setattr(parser.values, option.dest, value)
+    op.add_option('--remote-exec',
+                  nargs=1, type="string",
+                  dest="remote_exec", default=None,
+                  action="callback", callback=opt_remote_exec,
+                  help="Run build commands on the remote workers "
+                       "at HOST:PORT[,...].",
+                  metavar="ADDRESSES")
+
+    op.add_option('--remote-worker',
+                  nargs=1, type="string",
+                  dest="remote_worker", default=None,
+                  action="store",
+                  help="Run as a remote worker listening on [HOST:]PORT.",
+                  metavar="ADDRESS")
+
+    op.add_option('--save-parsed',
+                  dest='save_parsed', default=False,
+                  action="store_true",
+                  help="Keep what's parsed out of files in .sconsign files.")
+
     op.add_option('-s', '--silent', '--quiet',
                   dest="silent", default=False,
                   action="store_true",
                   help="Don't print commands.")
 
+    def opt_schedule(option, opt, value, parser):
+        if not value in SCons.Taskmaster.schedule_types:
+            raise OptionValueError("Warning:  %s is not a valid schedule type" % value)
+        setattr(parser.values, option.dest, value)
+    opt_schedule_help = "Order in which to build ready targets: %s." \
+                        % ", ".join(SCons.Taskmaster.schedule_types)
+    op.add_option('--schedule',
+                  nargs=1, type="string",
+                  dest="schedule", default="dfs",
+                  action="callback", callback=opt_schedule,
+                  help=opt_schedule_help,
+                  metavar="TYPE")
+
     op.add_option('--site-dir',
                   nargs=1,
                   dest='site_dir', default=None,
@@ -866,14 +1006,6 @@ def Parser(version):
         msg = "Warning:  the %s option is not yet implemented\n" % opt
         sys.stderr.write(msg)
 
-    op.add_option('-l', '--load-average', '--max-load',
-                  nargs=1, type="float",
-                  dest="load_average", default=0,
-                  action="callback", callback=opt_not_yet,
-                  # action="store",
-                  # help="Don't start multiple jobs unless load is below "
-                  #      "LOAD-AVERAGE."
-                  help=SUPPRESS_HELP)
     op.add_option('--list-actions',
                   dest="list_actions",
                   action="callback", callback=opt_not_yet,
@@ -30,10 +30,12 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 import collections
 import re
+import types
+import weakref
 
 import SCons.Errors
 
-from SCons.Util import is_String, is_Sequence
+from SCons.Util import is_String, is_Sequence, semi_deepcopy
 
 # Indexed by the SUBST_* constants below.
 _strconv = [SCons.Util.to_String_for_subst,
@@ -383,6 +385,389 @@ _separate_args = re.compile(r'(%s|\s+|[^\s\$]+|\$)' % _dollar_exps_str)
 # space characters in the string result from the scons_subst() function.
 _space_sep = re.compile(r'[\t ]+(?![^{]*})')
 
+# Compiled substitution templates.  The same strings with construction
+# variables in them ($CCCOM, $_CPPINCFLAGS and the like) get substituted
+# over and over again, once for each target, so each distinct string is
+# only broken up into its literal text and $-expressions (and each
+# ${...} expression only compiled) once, and the result kept here.
+_dollar_split_cache = {}
+_separate_args_cache = {}
+_eval_code_cache = {}
+
+def _dollar_split(s):
+    """Returns a list of the literal text in s alternating with the
+    $-expressions between it, the way _dollar_exps.split() does."""
+    try:
+        return _dollar_split_cache[s]
+    except KeyError:
+        result = _dollar_split_cache[s] = _dollar_exps.split(s)
+        return result
+
+def _separate(s):
+    """Returns the tokens s gets split into for substitution, the way
+    _separate_args.findall() does.  Only strings with something to
+    substitute are kept, since the rest are mostly file names."""
+    try:
+        return _separate_args_cache[s]
+    except KeyError:
+        result = _separate_args.findall(s)
+        if '$' in s:
+            _separate_args_cache[s] = result
+        return result
+
+def _eval_code(key):
+    """Returns the compiled Python expression in a ${...} expansion."""
+    try:
+        return _eval_code_cache[key]
+    except KeyError:
+        code = _eval_code_cache[key] = compile(key, '<string>', 'eval')
+        return code
+
+def _eval(key, gvars, lvars):
+    """Evaluates the Python expression in a ${...} expansion."""
+    return eval(_eval_code(key), gvars, lvars)
+
+def _code_names(code):
+    """Returns the names a compiled expression (and any lambdas or
+    generator expressions in it) looks up."""
+    names = list(code.co_names)
+    for c in code.co_consts:
+        if isinstance(c, types.CodeType):
+            names.extend(_code_names(c))
+    return names
+
+class StringSubber(object):
+    """A class to construct the results of a scons_subst() call.
+
+    This binds a specific construction environment, mode, target and
+    source with two methods (substitute() and expand()) that handle
+    the expansion.
+    """
+    def __init__(self, env, mode, conv, gvars):
+        self.env = env
+        self.mode = mode
+        self.conv = conv
+        self.gvars = gvars
+
+    def expand(self, s, lvars):
+        """Expand a single "token" as necessary, returning an
+        appropriate string containing the expansion.
+
+        This handles expanding different types of things (strings,
+        lists, callables) appropriately.  It calls the wrapper
+        substitute() method to re-expand things as necessary, so that
+        the results of expansions of side-by-side strings still get
+        re-evaluated separately, not smushed together.
+        """
+        if is_String(s):
+            try:
+                s0, s1 = s[:2]
+            except (IndexError, ValueError):
+                return s
+            if s0 != '$':
+                return s
+            if s1 == '$':
+                return '$'
+            elif s1 in '()':
+                return s
+            else:
+                key = s[1:]
+                if key[0] == '{' or key.find('.') >= 0:
+                    if key[0] == '{':
+                        key = key[1:-1]
+                    try:
+                        s = _eval(key, self.gvars, lvars)
+                    except KeyboardInterrupt:
+                        raise
+                    except Exception, e:
+                        if e.__class__ in AllowableExceptions:
+                            return ''
+                        raise_exception(e, lvars['TARGETS'], s)
+                else:
+                    if key in lvars:
+                        s = lvars[key]
+                    elif key in self.gvars:
+                        s = self.gvars[key]
+                    elif not NameError in AllowableExceptions:
+                        raise_exception(NameError(key), lvars['TARGETS'], s)
+                    else:
+                        return ''
+
+                # Before re-expanding the result, handle
+                # recursive expansion by copying the local
+                # variable dictionary and overwriting a null
+                # string for the value of the variable name
+                # we just expanded.
+                #
+                # This could potentially be optimized by only
+                # copying lvars when s contains more expansions,
+                # but lvars is usually supposed to be pretty
+                # small, and deeply nested variable expansions
+                # are probably more the exception than the norm,
+                # so it should be tolerable for now.
+                lv = lvars.copy()
+                var = key.split('.')[0]
+                lv[var] = ''
+                return self.substitute(s, lv)
+        elif is_Sequence(s):
+            def func(l, conv=self.conv, substitute=self.substitute, lvars=lvars):
+                return conv(substitute(l, lvars))
+            return list(map(func, s))
+        elif callable(s):
+            try:
+                s = s(target=lvars['TARGETS'],
+                     source=lvars['SOURCES'],
+                     env=self.env,
+                     for_signature=(self.mode != SUBST_CMD))
+            except TypeError:
+                # This probably indicates that it's a callable
+                # object that doesn't match our calling arguments
+                # (like an Action).
+                if self.mode == SUBST_RAW:
+                    return s
+                s = self.conv(s)
+            return self.substitute(s, lvars)
+        elif s is None:
+            return ''
+        else:
+            return s
+
+    def substitute(self, args, lvars):
+        """Substitute expansions in an argument or list of arguments.
+
+        This serves as a wrapper for splitting up a string into
+        separate tokens.
+        """
+        if is_String(args) and not isinstance(args, CmdStringHolder):
+            args = str(args)        # In case it's a UserString.
+            if args.find('$') < 0:
+                return args
+            result = _dollar_split(args)[:]
+            try:
+                for i in range(1, len(result), 2):
+                    result[i] = self.conv(self.expand(result[i], lvars))
+                result = ''.join(result)
+            except TypeError:
+                # If the internal conversion routine doesn't return
+                # strings (it could be overridden to return Nodes, for
+                # example), then joining the results will throw this
+                # exception.  Back off to a slower, general-purpose
+                # algorithm that works for all data types.
+                args = _separate(args)
+                result = []
+                for a in args:
+                    result.append(self.conv(self.expand(a, lvars)))
+                if len(result) == 1:
+                    result = result[0]
+                else:
+                    result = ''.join(map(str, result))
+            return result
+        else:
+            return self.expand(args, lvars)
+
+# Signature templates.  In SUBST_SIG mode, the same command strings get
+# substituted for every target built with the same environment, and
+# mostly expand to the same text each time:  only the parts that involve
+# the target and source variables differ.  So from the second time a
+# string is substituted for signatures in an environment on, it's
+# compiled into a SigTemplate that has the rest of it substituted
+# already, and only the target-specific parts get expanded again.
+
+# The variables that are different for each target.
+_target_source_names = set(['TARGET', 'TARGETS', 'SOURCE', 'SOURCES',
+                            'CHANGED_SOURCES', 'CHANGED_TARGETS',
+                            'UNCHANGED_SOURCES', 'UNCHANGED_TARGETS'])
+
+# The SigTemplates (or None, for strings only substituted once so far)
+# for each environment, by string.
+_sig_templates = weakref.WeakKeyDictionary()
+
+class _Dependent(Exception):
+    """Raised while compiling a SigTemplate to leave the $-expression
+    being compiled for expanding with each target."""
+    pass
+
+_missing = []
+
+class SigTemplate(object):
+    """A string partly substituted in SUBST_SIG mode.
+
+    The pieces are either strings (the text of everything that doesn't
+    depend on the target and sources) or (token, guards) tuples for the
+    $-expressions that do, or that we can't tell about (like callables,
+    or ${...} expressions that are passed $__env__).  The guards are the
+    variables blanked out to stop recursive expansion at that point.
+
+    The template is good for as long as the variables that went into
+    it (which are recorded, along with copies of any lists or
+    dictionaries) keep their values; see is_valid().
+    """
+    def __init__(self, ss, strSubst, lvars):
+        self.consulted = []
+        self.pieces = []
+        self.ss = ss
+        self.lvars = lvars
+        try:
+            self.compile_value(strSubst, {}, self.pieces)
+        finally:
+            del self.ss
+            del self.lvars
+
+    def lookup(self, key, guards):
+        if key in guards:
+            return guards[key]
+        if key in self.lvars:
+            value = self.lvars[key]
+        elif key in self.ss.gvars:
+            value = self.ss.gvars[key]
+        else:
+            value = _missing
+        if isinstance(value, (list, tuple, dict, collections.UserList,
+                              collections.UserDict)):
+            snapshot = semi_deepcopy(value)
+        else:
+            snapshot = None
+        self.consulted.append((key, value, snapshot))
+        return value
+
+    def compile_token(self, token, guards, pieces):
+        """Adds the pieces for self.ss.conv(self.ss.expand(token))."""
+        p = []
+        try:
+            self.compile_expansion(token, guards, p)
+        except _Dependent:
+            pieces.append((token, guards))
+        else:
+            pieces.extend(p)
+
+    def compile_expansion(self, s, guards, pieces):
+        s1 = s[1]
+        if s1 == '$':
+            pieces.append('$')
+            return
+        elif s1 in '()':
+            pieces.append(s)
+            return
+        key = s[1:]
+        if key[0] == '{' or key.find('.') >= 0:
+            if key[0] == '{':
+                key = key[1:-1]
+            try:
+                code = _eval_code(key)
+            except Exception:
+                raise _Dependent
+            names = _code_names(code)
+            for name in names:
+                if name in _target_source_names or name == '__env__':
+                    raise _Dependent
+            for name in names:
+                if callable(self.lookup(name, guards)):
+                    # It could return anything.
+                    raise _Dependent
+            lv = self.lvars.copy()
+            lv.update(guards)
+            try:
+                value = eval(code, self.ss.gvars, lv)
+            except Exception:
+                raise _Dependent
+        else:
+            if key in _target_source_names:
+                raise _Dependent
+            value = self.lookup(key, guards)
+            if value is _missing:
+                if NameError in AllowableExceptions:
+                    return
+                raise _Dependent
+        guards = guards.copy()
+        guards[key.split('.')[0]] = ''
+        self.compile_value(value, guards, pieces)
+
+    def compile_value(self, value, guards, pieces):
+        """Adds the pieces for self.ss.conv(self.ss.substitute(value))."""
+        if is_String(value) and not isinstance(value, CmdStringHolder):
+            value = str(value)
+            if value.find('$') < 0:
+                pieces.append(value)
+                return
+            parts = _dollar_split(value)
+            for i in range(len(parts)):
+                if i % 2:
+                    self.compile_token(parts[i], guards, pieces)
+                elif parts[i]:
+                    pieces.append(parts[i])
+        elif is_Sequence(value):
+            if hasattr(value, 'for_signature'):
+                raise _Dependent
+            sep = []
+            for v in value:
+                pieces.extend(sep)
+                self.compile_value(v, guards, pieces)
+                sep = [' ']
+        elif value is None:
+            pass
+        elif isinstance(value, (int, long, float)):
+            pieces.append(self.ss.conv(value))
+        else:
+            # Callables, Nodes and the like get expanded every time.
+            raise _Dependent
+
+    def is_valid(self, gvars, lvars):
+        """Returns whether the variables that went into the template
+        still have the same values."""
+        for key, value, snapshot in self.consulted:
+            if key in lvars:
+                current = lvars[key]
+            elif key in gvars:
+                current = gvars[key]
+            else:
+                current = _missing
+            if current is not value:
+                return False
+            if snapshot is not None and current != snapshot:
+                return False
+        return True
+
+    def substitute(self, ss, lvars):
+        """Returns the substituted string (before $( $) removal), or
+        None if it turns out it needs the general-purpose treatment."""
+        result = []
+        for piece in self.pieces:
+            if isinstance(piece, tuple):
+                token, guards = piece
+                if guards:
+                    lv = lvars.copy()
+                    lv.update(guards)
+                else:
+                    lv = lvars
+                piece = ss.conv(ss.expand(token, lv))
+                if not isinstance(piece, SCons.Util.BaseStringTypes):
+                    return None
+            result.append(piece)
+        return ''.join(result)
+
+def _sig_substitute(ss, env, strSubst, lvars):
+    """Substitutes strSubst in SUBST_SIG mode with its SigTemplate
+    for env, compiling one if this is the second time around (or if
+    the old one's out of date)."""
+    try:
+        templates = _sig_templates[env]
+    except KeyError:
+        templates = _sig_templates[env] = {}
+    except TypeError:
+        # Something we can't keep track of by weak reference.
+        return ss.substitute(strSubst, lvars)
+    try:
+        template = templates[strSubst]
+    except KeyError:
+        templates[strSubst] = None
+        return ss.substitute(strSubst, lvars)
+    if template is None or not template.is_valid(ss.gvars, lvars):
+        template = templates[strSubst] = SigTemplate(ss, strSubst, lvars)
+    result = template.substitute(ss, lvars)
+    if result is None:
+        result = ss.substitute(strSubst, lvars)
+    return result
+
 def scons_subst(strSubst, env, mode=SUBST_RAW, target=None, source=None, gvars={}, lvars={}, conv=None):
     """Expand a string or list containing construction variable
     substitutions.
@@ -395,131 +780,10 @@ def scons_subst(strSubst, env, mode=SUBST_RAW, target=None, source=None, gvars={
     if isinstance(strSubst, str) and strSubst.find('$') < 0:
         return strSubst
 
-    class StringSubber(object):
-        """A class to construct the results of a scons_subst() call.
-
-        This binds a specific construction environment, mode, target and
-        source with two methods (substitute() and expand()) that handle
-        the expansion.
-        """
-        def __init__(self, env, mode, conv, gvars):
-            self.env = env
-            self.mode = mode
-            self.conv = conv
-            self.gvars = gvars
-
-        def expand(self, s, lvars):
-            """Expand a single "token" as necessary, returning an
-            appropriate string containing the expansion.
-
-            This handles expanding different types of things (strings,
-            lists, callables) appropriately.  It calls the wrapper
-            substitute() method to re-expand things as necessary, so that
-            the results of expansions of side-by-side strings still get
-            re-evaluated separately, not smushed together.
-            """
-            if is_String(s):
-                try:
-                    s0, s1 = s[:2]
-                except (IndexError, ValueError):
-                    return s
-                if s0 != '$':
-                    return s
-                if s1 == '$':
-                    return '$'
-                elif s1 in '()':
-                    return s
-                else:
-                    key = s[1:]
-                    if key[0] == '{' or key.find('.') >= 0:
-                        if key[0] == '{':
-                            key = key[1:-1]
-                        try:
-                            s = eval(key, self.gvars, lvars)
-                        except KeyboardInterrupt:
-                            raise
-                        except Exception, e:
-                            if e.__class__ in AllowableExceptions:
-                                return ''
-                            raise_exception(e, lvars['TARGETS'], s)
-                    else:
-                        if key in lvars:
-                            s = lvars[key]
-                        elif key in self.gvars:
-                            s = self.gvars[key]
-                        elif not NameError in AllowableExceptions:
-                            raise_exception(NameError(key), lvars['TARGETS'], s)
-                        else:
-                            return ''
-    
-                    # Before re-expanding the result, handle
-                    # recursive expansion by copying the local
-                    # variable dictionary and overwriting a null
-                    # string for the value of the variable name
-                    # we just expanded.
-                    #
-                    # This could potentially be optimized by only
-                    # copying lvars when s contains more expansions,
-                    # but lvars is usually supposed to be pretty
-                    # small, and deeply nested variable expansions
-                    # are probably more the exception than the norm,
-                    # so it should be tolerable for now.
-                    lv = lvars.copy()
-                    var = key.split('.')[0]
-                    lv[var] = ''
-                    return self.substitute(s, lv)
-            elif is_Sequence(s):
-                def func(l, conv=self.conv, substitute=self.substitute, lvars=lvars):
-                    return conv(substitute(l, lvars))
-                return list(map(func, s))
-            elif callable(s):
-                try:
-                    s = s(target=lvars['TARGETS'],
-                         source=lvars['SOURCES'],
-                         env=self.env,
-                         for_signature=(self.mode != SUBST_CMD))
-                except TypeError:
-                    # This probably indicates that it's a callable
-                    # object that doesn't match our calling arguments
-                    # (like an Action).
-                    if self.mode == SUBST_RAW:
-                        return s
-                    s = self.conv(s)
-                return self.substitute(s, lvars)
-            elif s is None:
-                return ''
-            else:
-                return s
-
-        def substitute(self, args, lvars):
-            """Substitute expansions in an argument or list of arguments.
-
-            This serves as a wrapper for splitting up a string into
-            separate tokens.
-            """
-            if is_String(args) and not isinstance(args, CmdStringHolder):
-                args = str(args)        # In case it's a UserString.
-                try:
-                    def sub_match(match):
-                        return self.conv(self.expand(match.group(1), lvars))
-                    result = _dollar_exps.sub(sub_match, args)
-                except TypeError:
-                    # If the internal conversion routine doesn't return
-                    # strings (it could be overridden to return Nodes, for
-                    # example), then the 1.5.2 re module will throw this
-                    # exception.  Back off to a slower, general-purpose
-                    # algorithm that works for all data types.
-                    args = _separate_args.findall(args)
-                    result = []
-                    for a in args:
-                        result.append(self.conv(self.expand(a, lvars)))
-                    if len(result) == 1:
-                        result = result[0]
-                    else:
-                        result = ''.join(map(str, result))
-                return result
-            else:
-                return self.expand(args, lvars)
+    # Command strings being substituted for signatures the usual way
+    # can use (and build) signature templates.
+    use_templates = mode == SUBST_SIG and conv is None and \
+                    isinstance(strSubst, str)
 
     if conv is None:
         conv = _strconv[mode]
@@ -548,7 +812,10 @@ def scons_subst(strSubst, env, mode=SUBST_RAW, target=None, source=None, gvars={
     gvars['__builtins__'] = __builtins__
 
     ss = StringSubber(env, mode, conv, gvars)
-    result = ss.substitute(strSubst, lvars)
+    if use_templates:
+        result = _sig_substitute(ss, env, strSubst, lvars)
+    else:
+        result = ss.substitute(strSubst, lvars)
 
     try:
         del gvars['__builtins__']
@@ -572,249 +839,249 @@ def scons_subst(strSubst, env, mode=SUBST_RAW, target=None, source=None, gvars={
 
     return result
 
-#Subst_List_Strings = {}
-
-def scons_subst_list(strSubst, env, mode=SUBST_RAW, target=None, source=None, gvars={}, lvars={}, conv=None):
-    """Substitute construction variables in a string (or list or other
-    object) and separate the arguments into a command list.
-
-    The companion scons_subst() function (above) handles basic
-    substitutions within strings, so see that function instead
-    if that's what you're looking for.
+class ListSubber(collections.UserList):
+    """A class to construct the results of a scons_subst_list() call.
+
+    Like StringSubber, this class binds a specific construction
+    environment, mode, target and source with two methods
+    (substitute() and expand()) that handle the expansion.
+
+    In addition, however, this class is used to track the state of
+    the result(s) we're gathering so we can do the appropriate thing
+    whenever we have to append another word to the result--start a new
+    line, start a new word, append to the current word, etc.  We do
+    this by setting the "append" attribute to the right method so
+    that our wrapper methods only need ever call ListSubber.append(),
+    and the rest of the object takes care of doing the right thing
+    internally.
     """
-#    try:
-#        Subst_List_Strings[strSubst] = Subst_List_Strings[strSubst] + 1
-#    except KeyError:
-#        Subst_List_Strings[strSubst] = 1
-#    import SCons.Debug
-#    SCons.Debug.caller_trace(1)
-    class ListSubber(collections.UserList):
-        """A class to construct the results of a scons_subst_list() call.
-
-        Like StringSubber, this class binds a specific construction
-        environment, mode, target and source with two methods
-        (substitute() and expand()) that handle the expansion.
-
-        In addition, however, this class is used to track the state of
-        the result(s) we're gathering so we can do the appropriate thing
-        whenever we have to append another word to the result--start a new
-        line, start a new word, append to the current word, etc.  We do
-        this by setting the "append" attribute to the right method so
-        that our wrapper methods only need ever call ListSubber.append(),
-        and the rest of the object takes care of doing the right thing
-        internally.
+    def __init__(self, env, mode, conv, gvars):
+        collections.UserList.__init__(self, [])
+        self.env = env
+        self.mode = mode
+        self.conv = conv
+        self.gvars = gvars
+
+        if self.mode == SUBST_RAW:
+            self.add_strip = lambda x: self.append(x)
+        else:
+            self.add_strip = lambda x: None
+        self.in_strip = None
+        self.next_line()
+
+    def expand(self, s, lvars, within_list):
+        """Expand a single "token" as necessary, appending the
+        expansion to the current result.
+
+        This handles expanding different types of things (strings,
+        lists, callables) appropriately.  It calls the wrapper
+        substitute() method to re-expand things as necessary, so that
+        the results of expansions of side-by-side strings still get
+        re-evaluated separately, not smushed together.
         """
-        def __init__(self, env, mode, conv, gvars):
-            collections.UserList.__init__(self, [])
-            self.env = env
-            self.mode = mode
-            self.conv = conv
-            self.gvars = gvars
-
-            if self.mode == SUBST_RAW:
-                self.add_strip = lambda x: self.append(x)
+
+        if is_String(s):
+            try:
+                s0, s1 = s[:2]
+            except (IndexError, ValueError):
+                self.append(s)
+                return
+            if s0 != '$':
+                self.append(s)
+                return
+            if s1 == '$':
+                self.append('$')
+            elif s1 == '(':
+                self.open_strip('$(')
+            elif s1 == ')':
+                self.close_strip('$)')
             else:
-                self.add_strip = lambda x: None
-            self.in_strip = None
-            self.next_line()
-
-        def expand(self, s, lvars, within_list):
-            """Expand a single "token" as necessary, appending the
-            expansion to the current result.
-
-            This handles expanding different types of things (strings,
-            lists, callables) appropriately.  It calls the wrapper
-            substitute() method to re-expand things as necessary, so that
-            the results of expansions of side-by-side strings still get
-            re-evaluated separately, not smushed together.
-            """
-
-            if is_String(s):
-                try:
-                    s0, s1 = s[:2]
-                except (IndexError, ValueError):
-                    self.append(s)
-                    return
-                if s0 != '$':
-                    self.append(s)
-                    return
-                if s1 == '$':
-                    self.append('$')
-                elif s1 == '(':
-                    self.open_strip('$(')
-                elif s1 == ')':
-                    self.close_strip('$)')
+                key = s[1:]
+                if key[0] == '{' or key.find('.') >= 0:
+                    if key[0] == '{':
+                        key = key[1:-1]
+                    try:
+                        s = _eval(key, self.gvars, lvars)
+                    except KeyboardInterrupt:
+                        raise
+                    except Exception, e:
+                        if e.__class__ in AllowableExceptions:
+                            return
+                        raise_exception(e, lvars['TARGETS'], s)
                 else:
-                    key = s[1:]
-                    if key[0] == '{' or key.find('.') >= 0:
-                        if key[0] == '{':
-                            key = key[1:-1]
-                        try:
-                            s = eval(key, self.gvars, lvars)
-                        except KeyboardInterrupt:
-                            raise
-                        except Exception, e:
-                            if e.__class__ in AllowableExceptions:
-                                return
-                            raise_exception(e, lvars['TARGETS'], s)
+                    if key in lvars:
+                        s = lvars[key]
+                    elif key in self.gvars:
+                        s = self.gvars[key]
+                    elif not NameError in AllowableExceptions:
+                        raise_exception(NameError(), lvars['TARGETS'], s)
                     else:
-                        if key in lvars:
-                            s = lvars[key]
-                        elif key in self.gvars:
-                            s = self.gvars[key]
-                        elif not NameError in AllowableExceptions:
-                            raise_exception(NameError(), lvars['TARGETS'], s)
-                        else:
-                            return
-
-                    # Before re-expanding the result, handle
-                    # recursive expansion by copying the local
-                    # variable dictionary and overwriting a null
-                    # string for the value of the variable name
-                    # we just expanded.
-                    lv = lvars.copy()
-                    var = key.split('.')[0]
-                    lv[var] = ''
-                    self.substitute(s, lv, 0)
-                    self.this_word()
-            elif is_Sequence(s):
-                for a in s:
-                    self.substitute(a, lvars, 1)
-                    self.next_word()
-            elif callable(s):
-                try:
-                    s = s(target=lvars['TARGETS'],
-                         source=lvars['SOURCES'],
-                         env=self.env,
-                         for_signature=(self.mode != SUBST_CMD))
-                except TypeError:
-                    # This probably indicates that it's a callable
-                    # object that doesn't match our calling arguments
-                    # (like an Action).
-                    if self.mode == SUBST_RAW:
-                        self.append(s)
                         return
-                    s = self.conv(s)
-                self.substitute(s, lvars, within_list)
-            elif s is None:
+
+                # Before re-expanding the result, handle
+                # recursive expansion by copying the local
+                # variable dictionary and overwriting a null
+                # string for the value of the variable name
+                # we just expanded.
+                lv = lvars.copy()
+                var = key.split('.')[0]
+                lv[var] = ''
+                self.substitute(s, lv, 0)
                 self.this_word()
-            else:
-                self.append(s)
+        elif is_Sequence(s):
+            for a in s:
+                self.substitute(a, lvars, 1)
+                self.next_word()
+        elif callable(s):
+            try:
+                s = s(target=lvars['TARGETS'],
+                     source=lvars['SOURCES'],
+                     env=self.env,
+                     for_signature=(self.mode != SUBST_CMD))
+            except TypeError:
+                # This probably indicates that it's a callable
+                # object that doesn't match our calling arguments
+                # (like an Action).
+                if self.mode == SUBST_RAW:
+                    self.append(s)
+                    return
+                s = self.conv(s)
+            self.substitute(s, lvars, within_list)
+        elif s is None:
+            self.this_word()
+        else:
+            self.append(s)
 
-        def substitute(self, args, lvars, within_list):
-            """Substitute expansions in an argument or list of arguments.
+    def substitute(self, args, lvars, within_list):
+        """Substitute expansions in an argument or list of arguments.
 
-            This serves as a wrapper for splitting up a string into
-            separate tokens.
-            """
+        This serves as a wrapper for splitting up a string into
+        separate tokens.
+        """
 
-            if is_String(args) and not isinstance(args, CmdStringHolder):
-                args = str(args)        # In case it's a UserString.
-                args = _separate_args.findall(args)
-                for a in args:
-                    if a[0] in ' \t\n\r\f\v':
-                        if '\n' in a:
-                            self.next_line()
-                        elif within_list:
-                            self.append(a)
-                        else:
-                            self.next_word()
+        if is_String(args) and not isinstance(args, CmdStringHolder):
+            args = str(args)        # In case it's a UserString.
+            args = _separate(args)
+            for a in args:
+                if a[0] in ' \t\n\r\f\v':
+                    if '\n' in a:
+                        self.next_line()
+                    elif within_list:
+                        self.append(a)
                     else:
-                        self.expand(a, lvars, within_list)
+                        self.next_word()
+                else:
+                    self.expand(a, lvars, within_list)
+        else:
+            self.expand(args, lvars, within_list)
+
+    def next_line(self):
+        """Arrange for the next word to start a new line.  This
+        is like starting a new word, except that we have to append
+        another line to the result."""
+        collections.UserList.append(self, [])
+        self.next_word()
+
+    def this_word(self):
+        """Arrange for the next word to append to the end of the
+        current last word in the result."""
+        self.append = self.add_to_current_word
+
+    def next_word(self):
+        """Arrange for the next word to start a new word."""
+        self.append = self.add_new_word
+
+    def add_to_current_word(self, x):
+        """Append the string x to the end of the current last word
+        in the result.  If that is not possible, then just add
+        it as a new word.  Make sure the entire concatenated string
+        inherits the object attributes of x (in particular, the
+        escape function) by wrapping it as CmdStringHolder."""
+
+        if not self.in_strip or self.mode != SUBST_SIG:
+            try:
+                current_word = self[-1][-1]
+            except IndexError:
+                self.add_new_word(x)
             else:
-                self.expand(args, lvars, within_list)
-
-        def next_line(self):
-            """Arrange for the next word to start a new line.  This
-            is like starting a new word, except that we have to append
-            another line to the result."""
-            collections.UserList.append(self, [])
-            self.next_word()
-
-        def this_word(self):
-            """Arrange for the next word to append to the end of the
-            current last word in the result."""
-            self.append = self.add_to_current_word
-
-        def next_word(self):
-            """Arrange for the next word to start a new word."""
-            self.append = self.add_new_word
-
-        def add_to_current_word(self, x):
-            """Append the string x to the end of the current last word
-            in the result.  If that is not possible, then just add
-            it as a new word.  Make sure the entire concatenated string
-            inherits the object attributes of x (in particular, the
-            escape function) by wrapping it as CmdStringHolder."""
-
-            if not self.in_strip or self.mode != SUBST_SIG:
+                # All right, this is a hack and it should probably
+                # be refactored out of existence in the future.
+                # The issue is that we want to smoosh words together
+                # and make one file name that gets escaped if
+                # we're expanding something like foo$EXTENSION,
+                # but we don't want to smoosh them together if
+                # it's something like >$TARGET, because then we'll
+                # treat the '>' like it's part of the file name.
+                # So for now, just hard-code looking for the special
+                # command-line redirection characters...
                 try:
-                    current_word = self[-1][-1]
+                    last_char = str(current_word)[-1]
                 except IndexError:
+                    last_char = '\0'
+                if last_char in '<>|':
                     self.add_new_word(x)
                 else:
-                    # All right, this is a hack and it should probably
-                    # be refactored out of existence in the future.
-                    # The issue is that we want to smoosh words together
-                    # and make one file name that gets escaped if
-                    # we're expanding something like foo$EXTENSION,
-                    # but we don't want to smoosh them together if
-                    # it's something like >$TARGET, because then we'll
-                    # treat the '>' like it's part of the file name.
-                    # So for now, just hard-code looking for the special
-                    # command-line redirection characters...
-                    try:
-                        last_char = str(current_word)[-1]
-                    except IndexError:
-                        last_char = '\0'
-                    if last_char in '<>|':
-                        self.add_new_word(x)
-                    else:
-                        y = current_word + x
-
-                        # We used to treat a word appended to a literal
-                        # as a literal itself, but this caused problems
-                        # with interpreting quotes around space-separated
-                        # targets on command lines.  Removing this makes
-                        # none of the "substantive" end-to-end tests fail,
-                        # so we'll take this out but leave it commented
-                        # for now in case there's a problem not covered
-                        # by the test cases and we need to resurrect this.
-                        #literal1 = self.literal(self[-1][-1])
-                        #literal2 = self.literal(x)
-                        y = self.conv(y)
-                        if is_String(y):
-                            #y = CmdStringHolder(y, literal1 or literal2)
-                            y = CmdStringHolder(y, None)
-                        self[-1][-1] = y
-
-        def add_new_word(self, x):
-            if not self.in_strip or self.mode != SUBST_SIG:
-                literal = self.literal(x)
-                x = self.conv(x)
-                if is_String(x):
-                    x = CmdStringHolder(x, literal)
-                self[-1].append(x)
-            self.append = self.add_to_current_word
-
-        def literal(self, x):
-            try:
-                l = x.is_literal
-            except AttributeError:
-                return None
-            else:
-                return l()
+                    y = current_word + x
+
+                    # We used to treat a word appended to a literal
+                    # as a literal itself, but this caused problems
+                    # with interpreting quotes around space-separated
+                    # targets on command lines.  Removing this makes
+                    # none of the "substantive" end-to-end tests fail,
+                    # so we'll take this out but leave it commented
+                    # for now in case there's a problem not covered
+                    # by the test cases and we need to resurrect this.
+                    #literal1 = self.literal(self[-1][-1])
+                    #literal2 = self.literal(x)
+                    y = self.conv(y)
+                    if is_String(y):
+                        #y = CmdStringHolder(y, literal1 or literal2)
+                        y = CmdStringHolder(y, None)
+                    self[-1][-1] = y
+
+    def add_new_word(self, x):
+        if not self.in_strip or self.mode != SUBST_SIG:
+            literal = self.literal(x)
+            x = self.conv(x)
+            if is_String(x):
+                x = CmdStringHolder(x, literal)
+            self[-1].append(x)
+        self.append = self.add_to_current_word
+
+    def literal(self, x):
+        try:
+            l = x.is_literal
+        except AttributeError:
+            return None
+        else:
+            return l()
+
+    def open_strip(self, x):
+        """Handle the "open strip" $( token."""
+        self.add_strip(x)
+        self.in_strip = 1
 
-        def open_strip(self, x):
-            """Handle the "open strip" $( token."""
-            self.add_strip(x)
-            self.in_strip = 1
+    def close_strip(self, x):
+        """Handle the "close strip" $) token."""
+        self.add_strip(x)
+        self.in_strip = None
 
-        def close_strip(self, x):
-            """Handle the "close strip" $) token."""
-            self.add_strip(x)
-            self.in_strip = None
+#Subst_List_Strings = {}
 
+def scons_subst_list(strSubst, env, mode=SUBST_RAW, target=None, source=None, gvars={}, lvars={}, conv=None):
+    """Substitute construction variables in a string (or list or other
+    object) and separate the arguments into a command list.
+
+    The companion scons_subst() function (above) handles basic
+    substitutions within strings, so see that function instead
+    if that's what you're looking for.
+    """
+#    try:
+#        Subst_List_Strings[strSubst] = Subst_List_Strings[strSubst] + 1
+#    except KeyError:
+#        Subst_List_Strings[strSubst] = 1
+#    import SCons.Debug
+#    SCons.Debug.caller_trace(1)
     if conv is None:
         conv = _strconv[mode]
 
@@ -619,6 +619,71 @@ class scons_subst_TestCase(SubstTestCase):
         result = scons_subst('$XXX', env, gvars={'XXX' : 'yyy'})
         assert result == 'yyy', result
 
+    def test_subst_compiled(self):
+        """Test scons_subst():  reusing compiled templates"""
+        env = DummyEnv()
+        strSubst = '<$XXX $$ ${XXX[:1]}>'
+        gvars = {'XXX' : 'x $YYY ${ZZZ.upper()} x', 'YYY' : 'y', 'ZZZ' : 'z'}
+        result = scons_subst(strSubst, env, gvars=gvars)
+        assert result == '<x y Z x $ x>', result
+        assert SCons.Subst._dollar_split_cache[strSubst] == \
+               ['<', '$XXX', ' ', '$$', ' ', '${XXX[:1]}', '>']
+        assert 'ZZZ.upper()' in SCons.Subst._eval_code_cache
+        # The same template gives the right answer for other values.
+        gvars.update({'YYY' : 'w', 'ZZZ' : 'v'})
+        result = scons_subst(strSubst, env, gvars=gvars)
+        assert result == '<x w V x $ x>', result
+        result = scons_subst(strSubst, env, gvars={'XXX' : 'abc'})
+        assert result == '<abc $ a>', result
+
+    def test_subst_sig_templates(self):
+        """Test scons_subst():  signature templates"""
+        env = DummyEnv()
+        strSubst = 'cc $CCFLAGS ${X.upper()} -o $TARGET $( $Y $) $SOURCES'
+        flags = ['-O', '$X']
+        gvars = {'CCFLAGS' : flags, 'X' : 'x', 'Y' : 'y'}
+        def subst(target, source):
+            lvars = subst_dict([DummyNode(target)], [DummyNode(source)])
+            return scons_subst(strSubst, env, mode=SUBST_SIG,
+                               gvars=gvars, lvars=lvars)
+
+        result = subst('a.o', 'a.c')
+        assert result == 'cc -O x X -o a.o a.c', result
+        assert SCons.Subst._sig_templates[env][strSubst] is None
+        result = subst('b.o', 'b.c')
+        assert result == 'cc -O x X -o b.o b.c', result
+        template = SCons.Subst._sig_templates[env][strSubst]
+        expect = ['cc ', '-O', ' ', 'x', ' ', 'X', ' -o ',
+                  ('$TARGET', {}), ' ', '$(', ' ', 'y', ' ', '$)', ' ',
+                  ('$SOURCES', {})]
+        assert template.pieces == expect, template.pieces
+        result = subst('c.o', 'c.c')
+        assert result == 'cc -O x X -o c.o c.c', result
+        assert SCons.Subst._sig_templates[env][strSubst] is template
+
+        # Changing a variable, or a list in place, gets a new template.
+        gvars['X'] = 'z'
+        result = subst('d.o', 'd.c')
+        assert result == 'cc -O z Z -o d.o d.c', result
+        template = SCons.Subst._sig_templates[env][strSubst]
+        flags.append('-g')
+        result = subst('e.o', 'e.c')
+        assert result == 'cc -O z -g Z -o e.o e.c', result
+        assert SCons.Subst._sig_templates[env][strSubst] is not template
+
+        # Callables get called every time.
+        calls = []
+        def func(target, source, env, for_signature):
+            calls.append(str(target[0]))
+            return '-D' + str(target[0])
+        gvars['CCFLAGS'] = func
+        subst('f.o', 'f.c')
+        result = subst('g.o', 'g.c')
+        assert result == 'cc -Dg.o Z -o g.o g.c', result
+        result = subst('h.o', 'h.c')
+        assert result == 'cc -Dh.o Z -o h.o h.c', result
+        assert calls == ['f.o', 'g.o', 'h.o'], calls
+
 class CLVar_TestCase(unittest.TestCase):
     def test_CLVar(self):
         """Test scons_subst() and scons_subst_list() with CLVar objects"""
@@ -1030,6 +1095,21 @@ class scons_subst_list_TestCase(SubstTestCase):
         result = scons_subst_list('$XXX', env, gvars={'XXX' : 'yyy'})
         assert result == [['yyy']], result
 
+    def test_subst_list_compiled(self):
+        """Test scons_subst_list():  reusing compiled templates"""
+        env = DummyEnv()
+        strSubst = '$XXX -o ${YYY}.o'
+        result = scons_subst_list(strSubst, env, gvars={'XXX' : 'cc -c', 'YYY' : 'f'})
+        assert result == [['cc', '-c', '-o', 'f.o']], result
+        assert SCons.Subst._separate_args_cache[strSubst] == \
+               ['$XXX', ' ', '-o', ' ', '${YYY}', '.o']
+        result = scons_subst_list(strSubst, env, gvars={'XXX' : 'ld', 'YYY' : 'g'})
+        assert result == [['ld', '-o', 'g.o']], result
+        # Strings with nothing to substitute aren't kept.
+        result = scons_subst_list('a b', env, gvars={})
+        assert result == [['a', 'b']], result
+        assert 'a b' not in SCons.Subst._separate_args_cache
+
 class scons_subst_once_TestCase(unittest.TestCase):
 
     loc = {
@@ -50,8 +50,10 @@ interface and the SCons build engine.  There are two key classes here:
 __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 from itertools import chain
+import heapq
 import operator
 import sys
+import time
 import traceback
 
 import SCons.Errors
@@ -68,6 +70,22 @@ NODE_FAILED = SCons.Node.failed
 
 print_prepare = 0               # set by option --debug=prepare
 
+# The orders in which the Taskmaster can hand out tasks that are ready
+# to execute:
+#
+#   dfs             The order in which a depth-first walk of the
+#                   dependency graph finds them.
+#
+#   critical-path   Longest estimated remaining critical path first,
+#                   using how long each target took to build the last
+#                   time, so the slow steps everything else is waiting
+#                   on (links, code generators) get started early.
+schedule_types = ['dfs', 'critical-path']
+
+# How many ready tasks the critical-path schedule gathers up (by walking
+# further ahead in the dependency graph) to choose from.
+ready_window = 256
+
 # A subsystem for recording stats about how different Nodes are handled by
 # the main Taskmaster loop.  There's no external control here (no need for
 # a --debug= option); enable it by changing the value of CollectStats.
@@ -130,6 +148,12 @@ class Task(object):
     these methods explicitly to update state, etc., rather than
     roll their own interaction with Taskmaster from scratch.
     """
+
+    # A pool of worker processes (set by the job that runs this task)
+    # that can run a target's Python function actions without holding
+    # up the other jobs on the global interpreter lock.
+    process_pool = None
+
     def __init__(self, tm, targets, top, node):
         self.tm = tm
         self.targets = targets
@@ -240,7 +264,13 @@ class Task(object):
                     everything_was_cached = 0
                     break
             if not everything_was_cached:
-                self.targets[0].build()
+                start_time = time.time()
+                pool = self.process_pool
+                if pool is None or not pool.build(self.targets[0]):
+                    self.targets[0].build()
+                exectime = time.time() - start_time
+                for t in self.targets:
+                    t.exectime = exectime
         except SystemExit:
             exc_value = sys.exc_info()[1]
             raise SCons.Errors.ExplicitExit(self.targets[0], exc_value.code)
@@ -399,6 +429,10 @@ class Task(object):
                 for s in t.side_effects:
                     # add disambiguate here to mirror the call on targets in first loop above
                     s.disambiguate().set_state(NODE_EXECUTING)
+            # Our build signatures are known now, so start looking
+            # for the targets in the cache while we wait to execute.
+            for t in self.targets:
+                t.prefetch_cache()
         else:
             for t in self.targets:
                 # We must invoke visited() to ensure that the node
@@ -455,6 +489,7 @@ class Task(object):
                     if p.ref_count == 0:
                         self.tm.candidates.append(p)
 
+        ready = []
         for p, subtract in parents.items():
             p.ref_count = p.ref_count - subtract
             if T: T.write(self.trace_message(u'Task.postprocess()',
@@ -462,10 +497,18 @@ class Task(object):
                                              'adjusted parent ref count'))
             if p.ref_count == 0:
                 self.tm.candidates.append(p)
+                ready.append(p)
 
         for t in targets:
             t.postprocess()
 
+        if SCons.Node.prefetch_caches:
+            # The parents' children are all built, so their build
+            # signatures can be worked out:  start looking for them
+            # in the cache while they wait for a job slot.
+            for p in ready:
+                p.prefetch_cache(early=1)
+
     # Exception handling subsystem.
     #
     # Exceptions that occur while walking the DAG or examining Nodes
@@ -563,7 +606,8 @@ class Taskmaster(object):
     The Taskmaster for walking the dependency DAG.
     """
 
-    def __init__(self, targets=[], tasker=None, order=None, trace=None):
+    def __init__(self, targets=[], tasker=None, order=None, trace=None,
+                 schedule='dfs'):
         self.original_top = targets
         self.top_targets_left = targets[:]
         self.top_targets_left.reverse()
@@ -578,6 +622,18 @@ class Taskmaster(object):
         self.trace = trace
         self.next_candidate = self.find_next_candidate
         self.pending_children = set()
+        # The ready nodes gathered by the critical-path schedule: a heap
+        # of (-estimated critical path, sequence number, node) entries,
+        # and a set of the nodes for skipping duplicates.  The sequence
+        # number keeps nodes with the same estimate in DAG-walk order.
+        self.ready_heap = []
+        self.ready_set = set()
+        self.ready_sequence = 0
+        self.critical_path_memo = {}
+        if schedule == 'critical-path':
+            self.find_next_ready_node = self._find_next_ready_node_by_priority
+        else:
+            self.find_next_ready_node = self._find_next_ready_node
 
     def find_next_candidate(self):
         """
@@ -627,6 +683,11 @@ class Taskmaster(object):
             candidates = self.candidates
             self.candidates = []
             self.will_not_build(candidates)
+        if self.ready_heap:
+            nodes = [entry[2] for entry in self.ready_heap]
+            self.ready_heap = []
+            self.ready_set = set()
+            self.will_not_build(nodes)
         return None
 
     def _validate_pending_children(self):
@@ -812,6 +873,8 @@ class Taskmaster(object):
 
                 if childstate == NODE_NO_STATE:
                     children_not_visited.append(child)
+                    child.prefetch_csig()
+                    child.prefetch_scan()
                 elif childstate == NODE_PENDING:
                     children_pending.add(child)
                 elif childstate == NODE_FAILED:
@@ -908,6 +971,80 @@ class Taskmaster(object):
 
         return None
 
+    def critical_path(self, node):
+        """
+        Returns an estimate of how long it will take to build the
+        specified node and everything that (as far as we know so far)
+        is waiting on it:  the node's own build time from the last
+        build, plus the longest such estimate of its waiting parents.
+        """
+        memo = self.critical_path_memo
+        try:
+            return memo[node]
+        except KeyError:
+            pass
+        # Walk up the waiting parents without recursing, since chains
+        # of targets can be deeper than Python's recursion limit.
+        stack = [node]
+        visiting = set()
+        while stack:
+            n = stack[-1]
+            if n in memo:
+                stack.pop()
+                continue
+            if not n in visiting:
+                visiting.add(n)
+                stack.extend([p for p in n.waiting_parents
+                                if not p in memo and not p in visiting])
+                continue
+            stack.pop()
+            longest = 0
+            for p in n.waiting_parents:
+                # A parent still being visited is part of a cycle,
+                # which will be reported on its own; count it as 0.
+                longest = max(longest, memo.get(p, 0))
+            exectime = n.get_stored_exectime() or 0
+            memo[n] = exectime + longest
+        return memo[node]
+
+    def _find_next_ready_node_by_priority(self):
+        """
+        Finds the ready node with the longest estimated critical path.
+
+        This gathers up to ready_window nodes from the normal DAG walk
+        and hands out the one that the most (estimated) build time is
+        waiting on.  Nodes we couldn't even evaluate are handed out
+        right away, so their errors get reported.
+        """
+        ready_heap = self.ready_heap
+        while len(ready_heap) < ready_window:
+            node = self._find_next_ready_node()
+            if node is None:
+                break
+            if self.ready_exc:
+                return node
+            if node in self.ready_set:
+                continue
+            self.ready_set.add(node)
+            priority = -self.critical_path(node)
+            heapq.heappush(ready_heap, (priority, self.ready_sequence, node))
+            self.ready_sequence = self.ready_sequence + 1
+        if self.next_candidate == self.no_next_candidate:
+            # We've been stopped; clean up what we'd gathered.
+            return self.no_next_candidate()
+        try:
+            priority, sequence, node = heapq.heappop(ready_heap)
+        except IndexError:
+            return None
+        self.ready_set.remove(node)
+        # The DAG walk keeps adding waiting parents as it goes, so
+        # estimates made before now may be too short.
+        self.critical_path_memo = {}
+        if self.trace:
+            self.trace.write(self.trace_message(u'Scheduling %s (critical path %s)\n' %
+                                                (self.trace_node(node), -priority)))
+        return node
+
     def next_task(self):
         """
         Returns the next task to be executed.
@@ -915,7 +1052,7 @@ class Taskmaster(object):
         This simply asks for the next Node to be evaluated, and then wraps
         it in the specific Task subclass with which we were initialized.
         """
-        node = self._find_next_ready_node()
+        node = self.find_next_ready_node()
 
         if node is None:
             return None
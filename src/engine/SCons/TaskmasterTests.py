@@ -65,16 +65,27 @@ class Node(object):
         self.side_effects = []
         self.alttargets = []
         self.postprocessed = None
+        self.prefetched = []
         self._bsig_val = None
         self._current_val = 0
         self.always_build = None
+        self.stored_exectime = None
 
     def disambiguate(self):
         return self
 
+    def prefetch_csig(self):
+        pass
+
+    def prefetch_scan(self):
+        pass
+
     def push_to_cache(self):
         pass
 
+    def prefetch_cache(self, early=0):
+        self.prefetched.append(early)
+
     def retrieve_from_cache(self):
         global cache_text
         if self.cached:
@@ -134,6 +145,9 @@ class Node(object):
     def get_state(self):
         return self.state
 
+    def get_stored_exectime(self):
+        return self.stored_exectime
+
     def set_state(self, state):
         self.state = state
 
@@ -708,6 +722,76 @@ class TaskmasterTestCase(unittest.TestCase):
         assert built_text == "MyTM.stop()"
         assert tm.next_task() is None
 
+    def test_critical_path(self):
+        """Test the critical-path schedule
+        """
+        global built_text
+
+        def build_order(tm):
+            result = []
+            while True:
+                t = tm.next_task()
+                if t is None:
+                    return result
+                t.prepare()
+                t.execute()
+                result.append(built_text.split()[0])
+                t.executed()
+                t.postprocess()
+
+        def make_nodes(n1_time, n2_time, n3_time):
+            n1 = Node("n1")
+            n2 = Node("n2")
+            n3 = Node("n3")
+            n1.stored_exectime = n1_time
+            n2.stored_exectime = n2_time
+            n3.stored_exectime = n3_time
+            return [Node("n4", [n1, n2, n3])]
+
+        tm = SCons.Taskmaster.Taskmaster(make_nodes(1, 10, 5))
+        order = build_order(tm)
+        assert order == ['n1', 'n2', 'n3', 'n4'], order
+
+        tm = SCons.Taskmaster.Taskmaster(make_nodes(1, 10, 5),
+                                         schedule='critical-path')
+        order = build_order(tm)
+        assert order == ['n2', 'n3', 'n1', 'n4'], order
+
+        # Nodes we know nothing about are built in the usual order.
+        tm = SCons.Taskmaster.Taskmaster(make_nodes(None, None, None),
+                                         schedule='critical-path')
+        order = build_order(tm)
+        assert order == ['n1', 'n2', 'n3', 'n4'], order
+
+        # A quick node that a slow one is waiting on goes first.
+        n1 = Node("n1")
+        n2 = Node("n2", [n1])
+        n3 = Node("n3")
+        n4 = Node("n4", [n3])
+        n1.stored_exectime = 1
+        n2.stored_exectime = 20
+        n3.stored_exectime = 5
+        n4.stored_exectime = 1
+        tm = SCons.Taskmaster.Taskmaster([Node("n5", [n4, n2])],
+                                         schedule='critical-path')
+        order = build_order(tm)
+        assert order == ['n1', 'n2', 'n3', 'n4', 'n5'], order
+
+        # Executing a task records how long it took.
+        assert isinstance(n1.exectime, float), n1.exectime
+
+        # Stopping cleans up the ready nodes we'd gathered.
+        n1 = Node("n1")
+        n2 = Node("n2")
+        n3 = Node("n3", [n1, n2])
+        tm = SCons.Taskmaster.Taskmaster([n3], schedule='critical-path')
+        t = tm.next_task()
+        assert len(tm.ready_heap) == 1, tm.ready_heap
+        tm.stop()
+        assert tm.next_task() is None
+        assert tm.ready_heap == [], tm.ready_heap
+        assert n3.ref_count == 1, n3.ref_count
+
     def test_executed(self):
         """Test when a task has been executed
         """
@@ -1054,6 +1138,30 @@ class TaskmasterTestCase(unittest.TestCase):
         assert n2.postprocessed
         assert n3.postprocessed
 
+    def test_postprocess_prefetch_cache(self):
+        """Test looking for parents in the cache once they're ready
+        """
+        n1 = Node("n1")
+        n2 = Node("n2")
+        n3 = Node("n3", [n1, n2])
+        tm = SCons.Taskmaster.Taskmaster([n3])
+
+        save_prefetch_caches = SCons.Node.prefetch_caches
+        SCons.Node.prefetch_caches = 1
+        try:
+            t = tm.next_task()
+            t.prepare()
+            t.executed()
+            t.postprocess()
+            assert n3.prefetched == [], n3.prefetched
+            t = tm.next_task()
+            t.prepare()
+            t.executed()
+            t.postprocess()
+            assert n3.prefetched == [1], n3.prefetched
+        finally:
+            SCons.Node.prefetch_caches = save_prefetch_caches
+
     def test_trace(self):
         """Test Taskmaster tracing
         """
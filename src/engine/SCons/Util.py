@@ -1392,6 +1392,11 @@ def MD5filesignature(fname, chunksize=65536):
     f.close()
     return result
 
+# The name of the hashlib algorithm the MD5*signature() functions use
+# (despite their names), and the function that creates its hash objects.
+hash_format = 'md5'
+_hash_new = None
+
 try:
     import hashlib
 except ImportError:
@@ -1399,13 +1404,14 @@ except ImportError:
 else:
     if hasattr(hashlib, 'md5'):
         md5 = True
+        _hash_new = hashlib.md5
         def MD5signature(s):
-            m = hashlib.md5()
+            m = _hash_new()
             m.update(str(s))
             return m.hexdigest()
 
         def MD5filesignature(fname, chunksize=65536):
-            m = hashlib.md5()
+            m = _hash_new()
             f = open(fname, "rb")
             while True:
                 blck = f.read(chunksize)
@@ -1414,7 +1420,48 @@ else:
                 m.update(str(blck))
             f.close()
             return m.hexdigest()
-            
+
+def set_hash_format(name):
+    """
+    Sets the hash algorithm used for content signatures and CacheDir
+    file names.  The name can be any algorithm hashlib knows about
+    (for example sha1, sha256, or blake2b512 if OpenSSL provides it);
+    None means the default, md5.  Raises ValueError for an algorithm
+    that isn't available.
+    """
+    global hash_format, _hash_new
+    if name is None:
+        name = 'md5'
+    name = name.lower()
+    if not md5:
+        if name == 'md5':
+            return
+        raise ValueError("no hashlib module available")
+    import hashlib
+    try:
+        hashlib.new(name)
+    except ValueError:
+        raise ValueError("unsupported hash format: %s" % name)
+    # The named constructors (hashlib.md5, hashlib.sha1, ...) are
+    # quite a bit faster than going through hashlib.new() each time.
+    constructor = getattr(hashlib, name, None)
+    if constructor is None or name == 'new':
+        def constructor(name=name, new=hashlib.new):
+            return new(name)
+    hash_format = name
+    _hash_new = constructor
+
+def hash_format_suffix():
+    """
+    Returns the suffix that keeps the file names of .sconsign files
+    and CacheDir() subdirectories written with the current hash
+    format from colliding with those of other formats.  It's empty
+    for the default md5 format, so existing files keep their names.
+    """
+    if hash_format == 'md5':
+        return ''
+    return '_' + hash_format
+
 def MD5collect(signatures):
     """
     Collects a list of signatures into an aggregate signature.
@@ -721,6 +721,28 @@ class MD5TestCase(unittest.TestCase):
         s = MD5signature('222')
         assert 'bcbe3365e6ac95ea2c0343a2395834dd' == s, s
 
+    def test_set_hash_format(self):
+        """Test changing the hash format"""
+        import SCons.Util
+        try:
+            SCons.Util.set_hash_format('SHA1')
+            assert SCons.Util.hash_format == 'sha1', SCons.Util.hash_format
+            assert SCons.Util.hash_format_suffix() == '_sha1'
+            s = SCons.Util.MD5signature('111')
+            assert '6216f8a75fd5bb3d5f22b6f9958cdede3fc086c2' == s, s
+            test = TestCmd.TestCmd(workdir = '')
+            test.write('f', '111')
+            s = SCons.Util.MD5filesignature(test.workpath('f'))
+            assert '6216f8a75fd5bb3d5f22b6f9958cdede3fc086c2' == s, s
+            self.assertRaises(ValueError, SCons.Util.set_hash_format, 'no-such')
+            self.assertRaises(ValueError, SCons.Util.set_hash_format, 'new')
+            assert SCons.Util.hash_format == 'sha1', SCons.Util.hash_format
+        finally:
+            SCons.Util.set_hash_format(None)
+        assert SCons.Util.hash_format_suffix() == ''
+        s = SCons.Util.MD5signature('111')
+        assert '698d51a19d8a121ce581499d7b701668' == s, s
+
 class NodeListTestCase(unittest.TestCase):
     def test_simple_attributes(self):
         """Test simple attributes of a NodeList class"""
@@ -42,6 +42,9 @@ class WarningOnByDefault(Warning):
 
 # NOTE:  If you add a new warning class, add it to the man page, too!
 
+class CacheServerWarning(WarningOnByDefault):
+    pass
+
 class CacheWriteErrorWarning(Warning):
     pass
 
@@ -78,6 +81,9 @@ class NoObjectCountWarning(WarningOnByDefault):
 class NoParallelSupportWarning(WarningOnByDefault):
     pass
 
+class RemoteExecWarning(WarningOnByDefault):
+    pass
+
 class ReservedVariableWarning(WarningOnByDefault):
     pass
 
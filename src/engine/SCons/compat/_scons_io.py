@@ -36,6 +36,7 @@ import imp
 
 _cStringIO = imp.load_module('cStringIO', *imp.find_module('cStringIO'))
 StringIO = _cStringIO.StringIO
+BytesIO = _cStringIO.StringIO
 del _cStringIO
 
 # Local Variables:
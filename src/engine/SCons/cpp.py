@@ -294,18 +294,24 @@ class PreProcessor(object):
         This is the main public entry point.
         """
         self.current_file = file
-        return self.process_contents(self.read_file(file), file)
+        return self.process_tuples(self.read_tuples(file), file)
 
     def process_contents(self, contents, fname=None):
         """
         Pre-processes a file contents.
+        """
+        return self.process_tuples(self.tupleize(contents), fname)
+
+    def process_tuples(self, tuples, fname=None):
+        """
+        Pre-processes the tupleized contents of a file.
 
         This is the main internal entry point.
         """
         self.stack = []
         self.dispatch_table = self.default_table.copy()
         self.current_file = fname
-        self.tuples = self.tupleize(contents)
+        self.tuples = list(tuples)
 
         self.initialize_result(fname)
         while self.tuples:
@@ -381,6 +387,14 @@ class PreProcessor(object):
     def read_file(self, file):
         return open(file).read()
 
+    def read_tuples(self, file):
+        """
+        Returns the tupleized contents of a file.  Subclasses can
+        override this to avoid reading and tupleizing the same file
+        over and over.
+        """
+        return self.tupleize(self.read_file(file))
+
     # Start and stop processing include lines.
 
     def start_handling_includes(self, t=None):
@@ -511,9 +525,8 @@ class PreProcessor(object):
         if include_file:
             #print "include_file =", include_file
             self.result.append(include_file)
-            contents = self.read_file(include_file)
             new_tuples = [('scons_current_file', include_file)] + \
-                         self.tupleize(contents) + \
+                         self.read_tuples(include_file) + \
                          [('scons_current_file', self.current_file)]
             self.tuples[:] = new_tuples + self.tuples
 
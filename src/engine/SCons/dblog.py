@@ -0,0 +1,381 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+__doc__ = """
+A log-structured dbm-like module for the SConsignFile() database.
+
+Unlike dblite, which unpickles the whole database when it's opened and
+re-pickles all of it when it's synced, this keeps the values in an
+append-only log file (NAME.dblog) and only a small index of key =>
+(offset, length) in memory (saved in NAME.dblog.index).  Values are
+read from the log the first time they're asked for, and sync() only
+appends the values that were set since the last sync().  When enough
+of the log is taken up by values that have since been overwritten,
+sync() compacts it by copying the live records to a new log.
+
+SConsign stores one value per directory, so the cost of opening and
+syncing the database scales with the number of directories a build
+actually looks at and changes, not with the size of the whole tree.
+
+Use it with:
+
+    import SCons.dblog
+    SConsignFile('.sconsign', SCons.dblog)
+"""
+
+import SCons.compat
+
+import builtins
+import os
+# compat layer imports "cPickle" for us if it's available.
+import pickle
+import struct
+
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
+dblog_suffix = '.dblog'
+index_suffix = '.index'
+tmp_suffix = '.tmp'
+
+# The version of the index file format.  An index with any other
+# version is ignored and rebuilt by reading the log.
+index_version = 1
+
+# Compact the log on sync() once it's at least this big and less than
+# this fraction of it holds live records.
+compact_min_size = 1024 * 1024
+compact_live_ratio = 0.5
+
+# Each log record is a 4-byte big-endian length followed by that many
+# bytes of pickled (key, value) tuple.
+_record_format = '>L'
+_record_header_size = struct.calcsize(_record_format)
+
+try: unicode
+except NameError:
+    def is_string(s):
+        return isinstance(s, str)
+else:
+    def is_string(s):
+        return type(s) in (str, unicode)
+
+class dblog(object):
+
+    # Squirrel away references to the functions we'll use when our
+    # __del__() method calls our sync() method during shutdown, for
+    # the same reasons dblite does.
+    _open = builtins.open
+    _pickle_dump = staticmethod(pickle.dump)
+    _pickle_dumps = staticmethod(pickle.dumps)
+    _os_fsync = os.fsync
+    _os_rename = os.rename
+    _os_unlink = os.unlink
+
+    def __init__(self, file_base_name, flag, mode):
+        # Keys whose values have been set since the last sync().
+        self._dirty = {}
+        assert flag in (None, "r", "w", "c", "n")
+        if flag is None:
+            flag = "r"
+        if os.path.splitext(file_base_name)[1] == dblog_suffix:
+            self._file_name = file_base_name
+        else:
+            self._file_name = file_base_name + dblog_suffix
+        self._index_name = self._file_name + index_suffix
+        self._flag = flag
+        self._mode = mode
+        # key => (offset, length) of its latest record in the log.
+        self._index = {}
+        # Values read from (or about to be written to) the log.
+        self._cache = {}
+        self._size = 0
+        self._live = 0
+        # A read-only memory map of the log, so fetching a value is a
+        # slice instead of an open(), seek() and read() of the file.
+        self._map = None
+
+        if flag == "n":
+            self._create()
+            return
+        try:
+            st = os.stat(self._file_name)
+        except OSError, e:
+            if flag != "c":
+                raise IOError(e.errno, e.strerror, self._file_name)
+            self._create()
+            return
+        self._read_index(st.st_size)
+
+    def _create(self):
+        fd = os.open(self._file_name,
+                     os.O_WRONLY | os.O_CREAT | os.O_TRUNC, self._mode)
+        os.close(fd)
+        try:
+            self._os_unlink(self._index_name)
+        except OSError:
+            pass
+
+    def _read_index(self, log_size):
+        """
+        Reads the saved index, then reads any records that were
+        appended to the log after the index was saved (or the whole
+        log, if the index is missing or doesn't match the log).
+        """
+        try:
+            f = self._open(self._index_name, "rb")
+            try:
+                saved = pickle.load(f)
+            finally:
+                f.close()
+            if saved['version'] != index_version or saved['size'] > log_size:
+                raise ValueError
+        except KeyboardInterrupt:
+            raise
+        except Exception:
+            saved = {'size' : 0, 'live' : 0, 'index' : {}}
+        self._index = saved['index']
+        self._size = saved['size']
+        self._live = saved['live']
+        if self._size < log_size:
+            self._scan_log(log_size)
+
+    def _scan_log(self, log_size):
+        f = self._open(self._file_name, "rb")
+        try:
+            f.seek(self._size)
+            offset = self._size
+            while offset + _record_header_size <= log_size:
+                header = f.read(_record_header_size)
+                length = struct.unpack(_record_format, header)[0]
+                data = f.read(length)
+                if len(data) < length:
+                    # A partially-written record from an interrupted
+                    # sync(); the next sync() will write over it.
+                    break
+                try:
+                    key, value = pickle.loads(data)
+                except KeyboardInterrupt:
+                    raise
+                except Exception:
+                    break
+                self._add_to_index(key, offset, _record_header_size + length)
+                offset = offset + _record_header_size + length
+            self._size = offset
+        finally:
+            f.close()
+
+    def _add_to_index(self, key, offset, length):
+        try:
+            old_offset, old_length = self._index[key]
+        except KeyError:
+            pass
+        else:
+            self._live = self._live - old_length
+        self._index[key] = (offset, length)
+        self._live = self._live + length
+
+    def _mapping(self, end):
+        """
+        Returns a memory map of the log that covers everything up to
+        the specified offset, or None if the log can't be mapped.
+        """
+        if self._map is not None:
+            if len(self._map) >= end:
+                return self._map
+            self._unmap()
+        if mmap is None or self._size < end:
+            return None
+        f = self._open(self._file_name, "rb")
+        try:
+            try:
+                self._map = mmap.mmap(f.fileno(), self._size,
+                                      access=mmap.ACCESS_READ)
+            except (EnvironmentError, ValueError):
+                self._map = None
+        finally:
+            f.close()
+        return self._map
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _read_value(self, key):
+        offset, length = self._index[key]
+        start = offset + _record_header_size
+        end = offset + length
+        m = self._mapping(end)
+        if m is not None:
+            data = m[start:end]
+        else:
+            f = self._open(self._file_name, "rb")
+            try:
+                f.seek(start)
+                data = f.read(end - start)
+            finally:
+                f.close()
+        return pickle.loads(data)[1]
+
+    def close(self):
+        if self._dirty:
+            self.sync()
+        self._unmap()
+
+    def __del__(self):
+        self.close()
+
+    def _check_writable(self):
+        if self._flag == "r":
+            raise IOError("Read-only database: %s" % self._file_name)
+
+    def _record(self, key, value):
+        data = self._pickle_dumps((key, value), 1)
+        return struct.pack(_record_format, len(data)) + data
+
+    def sync(self):
+        self._check_writable()
+        if self._dirty:
+            f = self._open(self._file_name, "r+b")
+            try:
+                # Write over any partial record left at the end of
+                # the log by an interrupted sync().
+                f.seek(self._size)
+                offset = self._size
+                for key in sorted(self._dirty.keys()):
+                    record = self._record(key, self._cache[key])
+                    f.write(record)
+                    self._add_to_index(key, offset, len(record))
+                    offset = offset + len(record)
+                f.truncate(offset)
+                f.flush()
+                self._os_fsync(f.fileno())
+            finally:
+                f.close()
+            self._size = offset
+            self._dirty = {}
+        if self._size >= compact_min_size and \
+           self._live < self._size * compact_live_ratio:
+            self._compact()
+        self._write_index()
+
+    def _compact(self):
+        """
+        Rewrites the log with just the latest record for each key.
+        """
+        tmp_name = self._file_name + tmp_suffix
+        # Windows won't replace a file that's mapped, and the mapping
+        # would be of the old log anyway.
+        self._unmap()
+        old = self._open(self._file_name, "rb")
+        new = self._open(tmp_name, "wb")
+        try:
+            index = {}
+            offset = 0
+            for key, (old_offset, length) in sorted(self._index.items(),
+                                                    key=lambda t: t[1]):
+                old.seek(old_offset)
+                new.write(old.read(length))
+                index[key] = (offset, length)
+                offset = offset + length
+            new.flush()
+            self._os_fsync(new.fileno())
+        finally:
+            old.close()
+            new.close()
+        try:
+            self._os_rename(tmp_name, self._file_name)
+        except OSError:
+            # Windows won't rename on top of an existing file.
+            self._os_unlink(self._file_name)
+            self._os_rename(tmp_name, self._file_name)
+        self._index = index
+        self._size = offset
+        self._live = offset
+
+    def _write_index(self):
+        tmp_name = self._index_name + tmp_suffix
+        f = self._open(tmp_name, "wb")
+        try:
+            self._pickle_dump({'version' : index_version,
+                               'size' : self._size,
+                               'live' : self._live,
+                               'index' : self._index}, f, 1)
+        finally:
+            f.close()
+        try:
+            self._os_rename(tmp_name, self._index_name)
+        except OSError:
+            self._os_unlink(self._index_name)
+            self._os_rename(tmp_name, self._index_name)
+
+    def __getitem__(self, key):
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        value = self._read_value(key)
+        self._cache[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._check_writable()
+        if not is_string(key):
+            raise TypeError("key `%s' must be a string but is %s" % (key, type(key)))
+        if not is_string(value):
+            raise TypeError("value `%s' must be a string but is %s" % (value, type(value)))
+        self._cache[key] = value
+        self._dirty[key] = 1
+
+    def _all_keys(self):
+        keys = set(self._index.keys())
+        keys.update(self._dirty.keys())
+        return keys
+
+    def keys(self):
+        return list(self._all_keys())
+
+    def has_key(self, key):
+        return key in self._index or key in self._dirty
+
+    __contains__ = has_key
+
+    def __iter__(self):
+        return iter(self._all_keys())
+
+    def __len__(self):
+        return len(self._all_keys())
+
+def open(file, flag=None, mode=0666):
+    return dblog(file, flag, mode)
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,240 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import os
+import sys
+import unittest
+
+import TestCmd
+
+import SCons.dblog
+
+class dblogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.test = TestCmd.TestCmd(workdir = '')
+        self.name = self.test.workpath('db')
+
+    def test_open_flags(self):
+        """Test opening a dblog database with the different flags"""
+        try:
+            SCons.dblog.open(self.name, "r")
+        except IOError:
+            pass
+        else:
+            raise AssertionError("expected IOError")
+        try:
+            SCons.dblog.open(self.name, "w")
+        except IOError:
+            pass
+        else:
+            raise AssertionError("expected IOError")
+        db = SCons.dblog.open(self.name, "c")
+        assert len(db) == 0, len(db)
+        assert os.path.exists(self.name + '.dblog')
+        db["foo"] = "bar"
+        db.sync()
+        db = SCons.dblog.open(self.name + '.dblog', "r")
+        assert db["foo"] == "bar", db["foo"]
+        try:
+            db["foo"] = "baz"
+        except IOError, e:
+            assert str(e) == "Read-only database: %s.dblog" % self.name, e
+        else:
+            raise AssertionError("expected IOError")
+        db = SCons.dblog.open(self.name, "n")
+        assert len(db) == 0, len(db)
+
+    def test_get_set(self):
+        """Test setting and fetching values across syncs"""
+        db = SCons.dblog.open(self.name, "c")
+        db["foo"] = "bar"
+        db[u"ufoo"] = u"ubar"
+        assert db["foo"] == "bar"
+        assert "foo" in db
+        assert db.has_key(u"ufoo")
+        assert not "bar" in db
+        db.sync()
+        db["bar"] = "foo"
+        db.close()
+
+        db = SCons.dblog.open(self.name, "w")
+        assert sorted(db.keys()) == ["bar", "foo", u"ufoo"], db.keys()
+        assert len(db) == 3, len(db)
+        assert db["foo"] == "bar", db["foo"]
+        assert db[u"ufoo"] == u"ubar", db[u"ufoo"]
+        assert db["bar"] == "foo", db["bar"]
+        try:
+            db["nope"]
+        except KeyError:
+            pass
+        else:
+            raise AssertionError("expected KeyError")
+
+        try:
+            db[(1,2)] = "tuple"
+        except TypeError, e:
+            assert str(e) == "key `(1, 2)' must be a string but is <type 'tuple'>", str(e)
+        else:
+            raise AssertionError("expected TypeError")
+        try:
+            db["list"] = [1,2]
+        except TypeError, e:
+            assert str(e) == "value `[1, 2]' must be a string but is <type 'list'>", str(e)
+        else:
+            raise AssertionError("expected TypeError")
+
+    def test_append_only(self):
+        """Test that sync() only appends the values that changed"""
+        db = SCons.dblog.open(self.name, "c")
+        db["a"] = "a" * 100
+        db["b"] = "b" * 100
+        db.sync()
+        size1 = os.path.getsize(self.name + '.dblog')
+        db.sync()
+        assert os.path.getsize(self.name + '.dblog') == size1
+        db["a"] = "A" * 100
+        db.sync()
+        size2 = os.path.getsize(self.name + '.dblog')
+        assert size1 < size2 < 2 * size1, (size1, size2)
+        db = SCons.dblog.open(self.name, "r")
+        assert db["a"] == "A" * 100, db["a"]
+        assert db["b"] == "b" * 100, db["b"]
+
+    def test_lazy_read(self):
+        """Test that values aren't read until they're asked for"""
+        db = SCons.dblog.open(self.name, "c")
+        db["a"] = "aaa"
+        db["b"] = "bbb"
+        db.close()
+        db = SCons.dblog.open(self.name, "r")
+        assert db._cache == {}, db._cache
+        assert db["b"] == "bbb"
+        assert list(db._cache.keys()) == ["b"], db._cache
+
+    def test_mapped_read(self):
+        """Test reading values through a memory map of the log"""
+        db = SCons.dblog.open(self.name, "c")
+        db["a"] = "aaa"
+        db.close()
+        db = SCons.dblog.open(self.name, "c")
+        assert db["a"] == "aaa", db["a"]
+        if SCons.dblog.mmap is not None:
+            assert db._map is not None
+            size = len(db._map)
+        db["b"] = "bbb"
+        db.sync()
+        db._cache = {}
+        assert db["b"] == "bbb", db["b"]
+        assert db["a"] == "aaa", db["a"]
+        if SCons.dblog.mmap is not None:
+            assert len(db._map) > size, (len(db._map), size)
+        db.close()
+        assert db._map is None, db._map
+
+        save_mmap = SCons.dblog.mmap
+        SCons.dblog.mmap = None
+        try:
+            db = SCons.dblog.open(self.name, "r")
+            assert db["a"] == "aaa", db["a"]
+            assert db["b"] == "bbb", db["b"]
+            assert db._map is None, db._map
+        finally:
+            SCons.dblog.mmap = save_mmap
+
+    def test_missing_index(self):
+        """Test recovering when the index is missing or stale"""
+        db = SCons.dblog.open(self.name, "c")
+        db["a"] = "aaa"
+        db.sync()
+        index = self.test.read(self.name + '.dblog.index')
+        db["b"] = "bbb"
+        db["a"] = "AAA"
+        db.sync()
+
+        # An index that's older than the log.
+        self.test.write(self.name + '.dblog.index', index)
+        db = SCons.dblog.open(self.name, "r")
+        assert db["a"] == "AAA", db["a"]
+        assert db["b"] == "bbb", db["b"]
+
+        # No index at all.
+        os.unlink(self.name + '.dblog.index')
+        db = SCons.dblog.open(self.name, "r")
+        assert db["a"] == "AAA", db["a"]
+        assert db["b"] == "bbb", db["b"]
+
+        # A corrupt index.
+        self.test.write(self.name + '.dblog.index', "not a pickle")
+        db = SCons.dblog.open(self.name, "r")
+        assert db["a"] == "AAA", db["a"]
+        assert db["b"] == "bbb", db["b"]
+
+    def test_partial_record(self):
+        """Test ignoring and overwriting a partially-written record"""
+        db = SCons.dblog.open(self.name, "c")
+        db["a"] = "aaa"
+        db.sync()
+        os.unlink(self.name + '.dblog.index')
+        f = open(self.name + '.dblog', 'ab')
+        f.write('\0\0\1\0partial')
+        f.close()
+        db = SCons.dblog.open(self.name, "c")
+        assert db.keys() == ["a"], db.keys()
+        db["b"] = "bbb"
+        db.close()
+        os.unlink(self.name + '.dblog.index')
+        db = SCons.dblog.open(self.name, "r")
+        assert db["a"] == "aaa", db["a"]
+        assert db["b"] == "bbb", db["b"]
+
+    def test_compact(self):
+        """Test compacting a log that's mostly overwritten values"""
+        save_compact_min_size = SCons.dblog.compact_min_size
+        SCons.dblog.compact_min_size = 1000
+        try:
+            db = SCons.dblog.open(self.name, "c")
+            db["keep"] = "k" * 100
+            for i in range(20):
+                db["a"] = str(i) * 100
+                db.sync()
+            size = os.path.getsize(self.name + '.dblog')
+            assert size < 1000, size
+            db = SCons.dblog.open(self.name, "r")
+            assert db["a"] == "19" * 100, db["a"]
+            assert db["keep"] == "k" * 100, db["keep"]
+        finally:
+            SCons.dblog.compact_min_size = save_compact_min_size
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(dblogTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
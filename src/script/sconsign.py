@@ -180,12 +180,20 @@ import SCons.SConsign
 def my_whichdb(filename):
     if filename[-7:] == ".dblite":
         return "SCons.dblite"
+    if filename[-6:] == ".dblog":
+        return "SCons.dblog"
     try:
         f = open(filename + ".dblite", "rb")
         f.close()
         return "SCons.dblite"
     except IOError:
         pass
+    try:
+        f = open(filename + ".dblog", "rb")
+        f.close()
+        return "SCons.dblog"
+    except IOError:
+        pass
     return _orig_whichdb(filename)
 
 _orig_whichdb = whichdb.whichdb
@@ -403,7 +411,7 @@ class Do_SConsignDB(object):
 
     def printentries(self, dir, val):
         print '=== ' + dir + ':'
-        printentries(pickle.loads(val), dir)
+        printentries(SCons.SConsign.decode_entries(val), dir)
 
 def Do_SConsignDir(name):
     try:
@@ -463,6 +471,7 @@ for o, a in opts:
         Print_Entries.append(a)
     elif o in ('-f', '--format'):
         Module_Map = {'dblite'   : 'SCons.dblite',
+                      'dblog'    : 'SCons.dblog',
                       'sconsign' : None}
         dbm_name = Module_Map.get(a, a)
         if dbm_name:
@@ -498,7 +507,8 @@ else:
     for a in args:
         dbm_name = whichdb.whichdb(a)
         if dbm_name:
-            Map_Module = {'SCons.dblite' : 'dblite'}
+            Map_Module = {'SCons.dblite' : 'dblite',
+                          'SCons.dblog'  : 'dblog'}
             dbm = my_import(dbm_name)
             Do_SConsignDB(Map_Module.get(dbm_name, dbm_name), dbm)(a)
         else:
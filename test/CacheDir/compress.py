@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that a CacheDir() with a compress format stores files
+compressed, retrieves them intact, and reports the compression
+ratio in --cache-debug output.
+"""
+
+import gzip
+import os
+import re
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+cache = test.workpath('cache')
+
+test.write('SConstruct', """\
+CacheDir(r'%(cache)s', compress = 'gzip')
+def cat(env, source, target):
+    f = open(str(target[0]), "wb")
+    for src in source:
+        f.write(open(str(src), "rb").read())
+    f.close()
+env = Environment(BUILDERS={'Cat':Builder(action=cat)})
+env.Cat('f1.out', 'f1.in')
+""" % locals())
+
+contents = "f1.in\n" * 10000
+test.write('f1.in', contents)
+
+def cache_files():
+    result = []
+    for subdir in os.listdir(cache):
+        dir = os.path.join(cache, subdir)
+        if os.path.isdir(dir):
+            result.extend([os.path.join(dir, f) for f in os.listdir(dir)])
+    return result
+
+test.run(arguments = '--cache-debug=- .')
+
+expr = r'^CachePush\(f1.out\):  compressed 60000 bytes to (\d+) \(([\d.]+)%\) in [0-9a-f]+\.gz$'
+m = re.search(expr, test.stdout(), re.M)
+if not m:
+    print test.stdout()
+    test.fail_test()
+test.fail_test(float(m.group(2)) > 10)
+
+files = cache_files()
+test.fail_test(len(files) != 1 or not files[0].endswith('.gz'))
+test.fail_test(os.path.getsize(files[0]) != int(m.group(1)))
+test.fail_test(gzip.open(files[0]).read() != contents)
+
+test.run(arguments = '-c .')
+test.must_not_exist('f1.out')
+
+test.run(arguments = '.',
+         stdout = test.wrap_stdout("Retrieved `f1.out' from cache\n"))
+test.must_match('f1.out', contents)
+
+test.up_to_date(arguments = '.')
+
+# An uncompressed cache in the same directory doesn't see the
+# compressed file.
+test.write('SConstruct', test.read('SConstruct').replace(", compress = 'gzip'", ""))
+test.run(arguments = '-c .')
+test.run(arguments = '.',
+         stdout = test.wrap_stdout("cat([\"f1.out\"], [\"f1.in\"])\n"))
+test.must_match('f1.out', contents)
+test.fail_test(len(cache_files()) != 2)
+
+test.write('SConstruct', """\
+CacheDir('cache', compress = 'zip')
+""")
+
+test.run(arguments = '.',
+         stderr = None,
+         status = 2)
+test.must_contain_all_lines(test.stderr(), ["Invalid CacheDir compress format: 'zip'"])
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that a CacheDir() given an http:// URL pushes files to and
+retrieves them from a cache server, on its own and as the slower tier
+behind a local cache directory, and that builds go on with a warning
+when the server can't be reached.
+"""
+
+import os
+import threading
+
+import TestSCons
+
+import SCons.HTTPCache
+
+test = TestSCons.TestSCons()
+
+test.subdir('root')
+
+root = test.workpath('root')
+local = test.workpath('local')
+
+server = SCons.HTTPCache.Server(root, ('127.0.0.1', 0))
+t = threading.Thread(target=server.serve_forever)
+t.setDaemon(1)
+t.start()
+url = 'http://127.0.0.1:%d/' % server.server_address[1]
+
+test.write('SConstruct', """\
+if ARGUMENTS.get('local'):
+    CacheDir([r'%(local)s', ARGUMENTS['url']])
+else:
+    CacheDir(ARGUMENTS['url'])
+def cat(env, source, target):
+    f = open(str(target[0]), "wb")
+    for src in source:
+        f.write(open(str(src), "rb").read())
+    f.close()
+env = Environment(BUILDERS={'Cat':Builder(action=cat)})
+env.Cat('f1.out', 'f1.in')
+env.Cat('f2.out', 'f2.in')
+""" % locals())
+
+test.write('f1.in', "f1.in\n")
+test.write('f2.in', "f2.in\n")
+
+def cache_files(dir):
+    result = []
+    for subdir in os.listdir(dir):
+        if len(subdir) == 1:
+            result.extend(os.listdir(os.path.join(dir, subdir)))
+    return sorted(result)
+
+test.run(arguments = '-j 2 url=%s .' % url)
+
+server_files = cache_files(root)
+test.fail_test(len(server_files) != 2)
+
+test.run(arguments = '-c url=%s .' % url)
+test.run(arguments = 'url=%s .' % url)
+test.must_contain_all_lines(test.stdout(), [
+    "Retrieved `f1.out' from cache\n",
+    "Retrieved `f2.out' from cache\n",
+])
+test.must_match('f1.out', "f1.in\n")
+test.must_match('f2.out', "f2.in\n")
+
+test.up_to_date(options = 'url=%s' % url, arguments = '.')
+
+# Behind a local cache directory, the files come from the server and
+# end up in the local one.
+test.run(arguments = '-c url=%s .' % url)
+test.run(arguments = 'local=1 url=%s .' % url)
+test.must_contain_all_lines(test.stdout(), [
+    "Retrieved `f1.out' from cache\n",
+    "Retrieved `f2.out' from cache\n",
+])
+test.fail_test(cache_files(local) != server_files)
+
+# Without the server, everything gets built after a warning.
+server.shutdown()
+server.server_close()
+
+test.run(arguments = '-c url=%s .' % url)
+
+expect = r"""
+scons: warning: Could not reach CacheDir server %s \(.*\); not using it.
+File "[^"]*", line \d+, in \S+
+""" % url
+
+test.run(arguments = 'url=%s .' % url,
+         stderr = expect,
+         match = TestSCons.match_re_dotall)
+test.must_not_contain_any_line(test.stdout(), ["Retrieved"])
+test.must_match('f1.out', "f1.in\n")
+test.must_match('f2.out', "f2.in\n")
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Test that a CacheDir() with a max_size evicts files to stay under it,
+and that --cache-stats reports on it.
+"""
+
+import os
+import re
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+cache = test.workpath('cache')
+
+test.subdir('cache')
+
+test.write('SConstruct', """\
+CacheDir(r'%(cache)s', max_size = '2500')
+def cat(env, source, target):
+    f = open(str(target[0]), "wb")
+    for src in source:
+        f.write(open(str(src), "rb").read())
+    f.close()
+env = Environment(BUILDERS={'Cat':Builder(action=cat)})
+for i in range(5):
+    env.Cat('f%%d.out' %% i, 'f%%d.in' %% i)
+""" % locals())
+
+for i in range(5):
+    test.write('f%d.in' % i, ('%d' % i) * 1000)
+
+def cache_files():
+    result = []
+    for subdir in os.listdir(cache):
+        dir = os.path.join(cache, subdir)
+        if os.path.isdir(dir):
+            result.extend(os.listdir(dir))
+    return result
+
+def stat(name):
+    m = re.search(r'^  %s: +(\d+)' % name, test.stdout(), re.M)
+    if not m:
+        print test.stdout()
+        test.fail_test()
+    return int(m.group(1))
+
+test.run(arguments = '--cache-stats .')
+
+test.fail_test(stat('Requests') != 5)
+test.fail_test(stat('Hits') != 0)
+test.fail_test(stat('Misses') != 5)
+test.fail_test(stat('Files pushed') != 5)
+test.fail_test(stat('Bytes pushed') != 5000)
+test.fail_test(stat('Files evicted') != 3)
+test.must_contain_all_lines(test.stdout(), [
+    "  %s:  2000 bytes in 2 files (max_size 2500)\n" % cache,
+])
+test.fail_test(len(cache_files()) != 2)
+test.must_exist(os.path.join(cache, 'index'))
+test.must_not_exist(os.path.join(cache, 'index.lock'))
+
+# With room for everything, the two files left in the cache get
+# retrieved, and the other three get built and pushed again.
+
+test.run(arguments = '-c .')
+test.write('SConstruct', test.read('SConstruct').replace("'2500'", "'10k'"))
+test.run(arguments = '--cache-stats .')
+
+test.fail_test(stat('Requests') != 5)
+test.fail_test(stat('Hits') != 2)
+test.fail_test(stat('Bytes retrieved') != 2000)
+test.fail_test(stat('Files pushed') != 3)
+test.fail_test(stat('Files evicted') != 0)
+test.must_contain_all_lines(test.stdout(), [
+    "  %s:  5000 bytes in 5 files (max_size 10240)\n" % cache,
+])
+test.fail_test(len(cache_files()) != 5)
+
+for i in range(5):
+    test.must_match('f%d.out' % i, ('%d' % i) * 1000)
+
+test.write('SConstruct', """\
+CacheDir(r'%(cache)s', max_size = 'lots')
+""" % locals())
+
+test.run(arguments = '.',
+         stderr = None,
+         status = 2)
+test.must_contain_all_lines(test.stderr(), ["Invalid CacheDir size: 'lots'"])
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that a CacheDir() with mode='link' reflinks files into the
+cache and reflinks or hard links them out of it instead of copying
+them, reports how in --cache-debug output, and keeps the cached files
+(but not the targets pushed to it) read-only.
+"""
+
+import os
+import re
+import stat
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+if not hasattr(os, 'link'):
+    import sys
+    test.skip_test('%s has no os.link() method; skipping test\n' % sys.executable)
+
+test.write('SConstruct', """\
+CacheDir('cache', mode = 'link')
+def cat(env, source, target):
+    f = open(str(target[0]), "wb")
+    for src in source:
+        f.write(open(str(src), "rb").read())
+    f.close()
+env = Environment(BUILDERS={'Cat':Builder(action=cat)})
+env.Cat('f1.out', 'f1.in')
+""")
+
+test.write('f1.in', "f1.in\n")
+
+def method(action):
+    expr = r'^%s\(f1.out\):  used (\w+) for [0-9a-f]+$' % action
+    m = re.search(expr, test.stdout(), re.M)
+    if not m:
+        print test.stdout()
+        test.fail_test()
+    return m.group(1)
+
+def cachefile():
+    for subdir in os.listdir(test.workpath('cache')):
+        dir = test.workpath('cache', subdir)
+        if len(subdir) == 1 and os.path.isdir(dir):
+            return os.path.join(dir, os.listdir(dir)[0])
+
+test.run(arguments = '--cache-debug=- .')
+pushed = method('CachePush')
+test.fail_test(not pushed in ['reflink', 'copy'])
+test.fail_test(os.stat(cachefile())[stat.ST_MODE] & stat.S_IWUSR)
+test.fail_test(os.path.samefile('f1.out', cachefile()))
+test.fail_test(not os.stat('f1.out')[stat.ST_MODE] & stat.S_IWUSR)
+
+test.run(arguments = '-c .')
+test.must_not_exist('f1.out')
+
+test.run(arguments = '--cache-debug=- .')
+retrieved = method('CacheRetrieve')
+test.fail_test(not retrieved in ['reflink', 'hardlink'])
+test.must_match('f1.out', "f1.in\n")
+if retrieved == 'hardlink':
+    test.fail_test(not os.path.samefile('f1.out', cachefile()))
+    test.fail_test(os.stat('f1.out')[stat.ST_MODE] & stat.S_IWUSR)
+else:
+    test.fail_test(not os.stat('f1.out')[stat.ST_MODE] & stat.S_IWUSR)
+
+test.up_to_date(arguments = '.')
+
+# Changing the source rebuilds the target without touching the
+# cached copy of the old one.
+test.write('f1.in', "f1.in 2\n")
+test.run(arguments = '.')
+test.must_match('f1.out', "f1.in 2\n")
+contents = []
+for subdir in os.listdir(test.workpath('cache')):
+    dir = test.workpath('cache', subdir)
+    for f in os.listdir(dir):
+        contents.append(open(os.path.join(dir, f)).read())
+contents.sort()
+test.fail_test(contents != ["f1.in\n", "f1.in 2\n"])
+
+test.write('SConstruct', """\
+CacheDir('cache', mode = 'symlink')
+""")
+
+test.run(arguments = '.',
+         stderr = None,
+         status = 2)
+test.must_contain_all_lines(test.stderr(), ["Invalid CacheDir mode: 'symlink'"])
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that a CacheDir() given a list of directories pushes files to
+all of them, retrieves them from the first one that has them, and
+copies files found in a later one into the earlier ones.
+"""
+
+import os
+import shutil
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+local = test.workpath('local')
+shared = test.workpath('shared')
+
+test.write('SConstruct', """\
+CacheDir([r'%(local)s', r'%(shared)s'], compress = [None, 'gzip'])
+def cat(env, source, target):
+    f = open(str(target[0]), "wb")
+    for src in source:
+        f.write(open(str(src), "rb").read())
+    f.close()
+env = Environment(BUILDERS={'Cat':Builder(action=cat)})
+env.Cat('f1.out', 'f1.in')
+env.Cat('f2.out', 'f2.in')
+""" % locals())
+
+test.write('f1.in', "f1.in\n")
+test.write('f2.in', "f2.in\n")
+
+def cache_files(dir):
+    result = []
+    for subdir in os.listdir(dir):
+        if len(subdir) == 1:
+            result.extend(os.listdir(os.path.join(dir, subdir)))
+    return sorted(result)
+
+test.run(arguments = '.')
+
+local_files = cache_files(local)
+shared_files = cache_files(shared)
+test.fail_test(len(local_files) != 2)
+test.fail_test(shared_files != [f + '.gz' for f in local_files])
+
+# With the local cache gone, the files come from the shared one,
+# and end up in the local one again.
+test.run(arguments = '-c .')
+shutil.rmtree(local)
+
+test.run(arguments = '--cache-debug=- .')
+test.must_contain_all_lines(test.stdout(), [
+    "Retrieved `f1.out' from cache\n",
+    "Retrieved `f2.out' from cache\n",
+])
+test.must_match('f1.out', "f1.in\n")
+test.must_match('f2.out', "f2.in\n")
+test.fail_test(cache_files(local) != local_files)
+
+test.up_to_date(arguments = '.')
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
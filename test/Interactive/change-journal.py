@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that the --change-journal= option keeps --interactive mode
+rebuilding targets when (and only when) their inputs change, for each
+of the journal types.
+"""
+
+import os
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+test.write('SConstruct', """\
+Command('foo.out', 'foo.in', Copy('$TARGET', '$SOURCE'))
+Command('bar.out', 'bar.in', Copy('$TARGET', '$SOURCE'))
+Command('1', [], Touch('$TARGET'))
+Command('2', [], Touch('$TARGET'))
+Command('3', [], Touch('$TARGET'))
+""")
+
+for journal in ['auto', 'poll', 'none']:
+
+    test.write('foo.in', "foo.in 1\n")
+    test.write('bar.in', "bar.in 1\n")
+    for f in ['foo.out', 'bar.out', '1', '2', '3']:
+        if os.path.exists(test.workpath(f)):
+            test.unlink(f)
+
+    scons = test.start(arguments = '-Q --interactive --change-journal=%s' % journal)
+
+    scons.send("build foo.out bar.out 1\n")
+
+    test.wait_for(test.workpath('1'))
+
+    test.must_match(test.workpath('foo.out'), "foo.in 1\n")
+    test.must_match(test.workpath('bar.out'), "bar.in 1\n")
+
+    test.write('foo.in', "foo.in 2\n")
+
+    scons.send("build foo.out bar.out 2\n")
+
+    test.wait_for(test.workpath('2'))
+
+    test.must_match(test.workpath('foo.out'), "foo.in 2\n")
+    test.must_match(test.workpath('bar.out'), "bar.in 1\n")
+
+    scons.send("build foo.out bar.out 3\n")
+
+    test.wait_for(test.workpath('3'))
+
+    expect_stdout = """\
+scons>>> Copy("foo.out", "foo.in")
+Copy("bar.out", "bar.in")
+Touch("1")
+scons>>> Copy("foo.out", "foo.in")
+scons: `bar.out' is up to date.
+Touch("2")
+scons>>> scons: `foo.out' is up to date.
+scons: `bar.out' is up to date.
+Touch("3")
+scons>>> 
+"""
+
+    test.finish(scons, stdout = expect_stdout)
+
+test.run(arguments = '--change-journal=bogus .',
+         status = 2,
+         stderr = None)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
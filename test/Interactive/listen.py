@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify basic operation of the --listen and --connect command line
+options:  a build server keeps its state between builds, and clients
+get back the output and exit status of each command they send.
+"""
+
+import socket
+import sys
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+if sys.platform == 'win32':
+    test.skip_test("Unix-domain sockets are not supported on Windows; skipping test.\n")
+
+test.write('wait.py', r"""\
+import os
+import sys
+import time
+while not os.path.exists('go'):
+    time.sleep(0.1)
+open(sys.argv[1], 'w').write('waited\\n')
+""")
+
+test.write('SConstruct', """\
+Command('foo.out', 'foo.in', Copy('$TARGET', '$SOURCE'))
+Command('fail.out', [], 'exit 1')
+Command('wait.out', [], r'%(_python_)s wait.py $TARGET')
+""" % locals())
+
+test.write('foo.in', "foo.in 1\n")
+
+sock = test.workpath('scons.sock')
+
+server = test.start(arguments = '-Q --listen=%s' % sock)
+
+test.wait_for(sock, popen=server)
+
+test.run(arguments = '--connect=%s build foo.out' % sock,
+         stdout = 'Copy("foo.out", "foo.in")\n')
+
+test.must_match('foo.out', "foo.in 1\n")
+
+test.run(arguments = '--connect=%s build foo.out' % sock,
+         stdout = "scons: `foo.out' is up to date.\n")
+
+test.write('foo.in', "foo.in 2\n")
+
+test.run(arguments = '--connect=%s foo.out' % sock,
+         stdout = "*** Unknown command: foo.out\n")
+
+test.run(arguments = '--connect=%s build foo.out' % sock,
+         stdout = 'Copy("foo.out", "foo.in")\n')
+
+test.must_match('foo.out', "foo.in 2\n")
+
+test.run(arguments = '--connect=%s build fail.out' % sock,
+         status = 2,
+         stderr = None)
+
+# A client that goes away in the middle of a command (like a --connect
+# client interrupted with Ctrl-C) doesn't take the server down.  The
+# command waits for the client to be gone before it finishes.
+client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+client.connect(sock)
+client.sendall('build wait.out\n')
+client.close()
+test.write('go', "")
+
+test.wait_for(test.workpath('wait.out'), popen=server)
+
+test.write('foo.in', "foo.in 3\n")
+
+test.run(arguments = '--connect=%s build foo.out' % sock,
+         stdout = 'Copy("foo.out", "foo.in")\n')
+
+test.must_match('foo.out', "foo.in 3\n")
+
+test.run(arguments = '--connect=%s exit' % sock)
+
+test.finish(server)
+
+test.must_not_exist(sock)
+
+test.run(arguments = '--connect=%s build foo.out' % sock,
+         status = 2,
+         stderr = None)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that FindPathDirs() finds the directories added in place to a
+cloned environment's path (env2['KPATH'].append(...)), and those in
+builder-call overrides, and not the original environment's.
+"""
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+test.subdir('inc1', 'inc2')
+
+test.write('build.py', r"""
+import os.path
+import sys
+path = sys.argv[1].split()
+output = open(sys.argv[3], 'wb')
+
+def find_file(f):
+    for dir in path:
+        p = dir + os.sep + f
+        if os.path.exists(p):
+            return open(p, 'rb')
+    return None
+
+def process(infp, outfp):
+    for line in infp.readlines():
+        if line[:8] == 'include ':
+            process(find_file(line[8:-1]), outfp)
+        else:
+            outfp.write(line)
+
+process(open(sys.argv[2], 'rb'), output)
+""")
+
+test.write('SConstruct', """\
+import os.path
+import re
+
+include_re = re.compile(r'^include\\s+(\\S+)$', re.M)
+
+def kfile_scan(node, env, path, arg):
+    results = []
+    for inc in include_re.findall(node.get_text_contents()):
+        for dir in path:
+            file = str(dir) + os.sep + inc
+            if os.path.exists(file):
+                results.append(file)
+                break
+    return results
+
+kscan = Scanner(name = 'kfile',
+                function = kfile_scan,
+                argument = None,
+                skeys = ['.k'],
+                path_function = FindPathDirs('KPATH'))
+
+build = r'%(_python_)s build.py "$KPATH" $SOURCE $TARGET'
+
+env = Environment(KPATH = ['inc1'])
+env.Append(SCANNERS = kscan)
+env2 = env.Clone()
+env2['KPATH'].append('inc2')
+
+env.Command('aaa', 'aaa.k', build)
+env2.Command('bbb', 'bbb.k', build)
+env.Command('ccc', 'ccc.k', build, KPATH = ['inc1', 'inc2'])
+env.Command('ddd', 'ddd.k', build, XXX = 'x')
+""" % locals())
+
+test.write('aaa.k', "aaa.k\ninclude xxx\n")
+test.write('bbb.k', "bbb.k\ninclude xxx\ninclude yyy\n")
+test.write('ccc.k', "ccc.k\ninclude xxx\ninclude yyy\n")
+test.write('ddd.k', "ddd.k\ninclude xxx\n")
+
+test.write(['inc1', 'xxx'], "inc1/xxx 1\n")
+test.write(['inc2', 'yyy'], "inc2/yyy 1\n")
+
+test.run(arguments = '.')
+test.must_match('aaa', "aaa.k\ninc1/xxx 1\n")
+test.must_match('bbb', "bbb.k\ninc1/xxx 1\ninc2/yyy 1\n")
+test.must_match('ccc', "ccc.k\ninc1/xxx 1\ninc2/yyy 1\n")
+test.must_match('ddd', "ddd.k\ninc1/xxx 1\n")
+
+test.up_to_date(arguments = '.')
+
+# The header only found along the clone's and the override's paths
+# is a dependency of their targets, even though aaa's path was found
+# first.
+test.write(['inc2', 'yyy'], "inc2/yyy 2\n")
+
+test.run(arguments = '.')
+test.must_match('bbb', "bbb.k\ninc1/xxx 1\ninc2/yyy 2\n")
+test.must_match('ccc', "ccc.k\ninc1/xxx 1\ninc2/yyy 2\n")
+
+test.write(['inc1', 'xxx'], "inc1/xxx 2\n")
+
+test.run(arguments = '.')
+test.must_match('ddd', "ddd.k\ninc1/xxx 2\n")
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
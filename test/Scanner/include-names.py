@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that a Classic scanner only searches files whose contents
+changed for include names, remembering the names found in the others
+from one build to the next, but still finds the files they refer to
+along the current path every time.
+"""
+
+import os.path
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+test.subdir('inc1', 'inc2')
+
+test.write('build.py', r"""
+import os.path
+import sys
+path = sys.argv[1].split()
+output = open(sys.argv[3], 'wb')
+
+def find_file(f):
+    for dir in path:
+        p = dir + os.sep + f
+        if os.path.exists(p):
+            return open(p, 'rb')
+    return None
+
+def process(infp, outfp):
+    for line in infp.readlines():
+        if line[:8] == 'include ':
+            process(find_file(line[8:-1]), outfp)
+        else:
+            outfp.write(line)
+
+process(open(sys.argv[2], 'rb'), output)
+""")
+
+test.write('SConstruct', """\
+import SCons.Scanner
+
+SetOption('save_parsed', 1)
+
+class KScanner(SCons.Scanner.Classic):
+    def find_include_names(self, node):
+        print "searching %%s" %% node
+        return SCons.Scanner.Classic.find_include_names(self, node)
+
+kscan = KScanner('kfile', ['.k'], 'KPATH', r'^include\\s+(\\S+)$')
+
+env = Environment(KPATH = ARGUMENTS.get('KPATH', 'inc1,inc2').split(','))
+env.Append(SCANNERS = kscan)
+env.Command('foo', 'foo.k', r'%(_python_)s build.py "$KPATH" $SOURCES $TARGET')
+""" % locals())
+
+test.write('foo.k', """\
+foo.k 1
+include xxx.k
+""")
+
+test.write(['inc1', 'xxx.k'], "inc1/xxx.k 1\n")
+test.write(['inc2', 'xxx.k'], "inc2/xxx.k 1\n")
+
+test.run(arguments = '.')
+test.must_contain_all_lines(test.stdout(), [
+    "searching foo.k\n",
+    "searching %s\n" % os.path.join('inc1', 'xxx.k'),
+])
+test.must_match('foo', "foo.k 1\ninc1/xxx.k 1\n")
+
+# Nothing changed, so nothing gets searched again.
+test.run(arguments = '.')
+test.must_not_contain_any_line(test.stdout(), ["searching"])
+test.must_contain_all_lines(test.stdout(), ["`.' is up to date.\n"])
+
+# A different path finds a different file for the same name, without
+# searching foo.k again.
+test.run(arguments = 'KPATH=inc2,inc1 .')
+test.must_not_contain_any_line(test.stdout(), ["searching foo.k"])
+test.must_match('foo', "foo.k 1\ninc2/xxx.k 1\n")
+
+# Only the file that changed gets searched.
+test.write('foo.k', """\
+foo.k 2
+include yyy.k
+""")
+test.write(['inc1', 'yyy.k'], "inc1/yyy.k 1\n")
+
+test.run(arguments = '.')
+test.must_contain_all_lines(test.stdout(), ["searching foo.k\n"])
+test.must_not_contain_any_line(test.stdout(), [
+    "searching %s" % os.path.join('inc1', 'xxx.k'),
+])
+test.must_match('foo', "foo.k 2\ninc1/yyy.k 1\n")
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that -j builds, which get source files read and searched for
+include lines in background threads ahead of their scans, find the
+same dependencies as serial builds, and search each file only once.
+"""
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+test.subdir('inc')
+
+test.write('build.py', r"""
+import os.path
+import sys
+output = open(sys.argv[2], 'wb')
+
+def process(infp, outfp):
+    for line in infp.readlines():
+        if line[:8] == 'include ':
+            process(open(os.path.join('inc', line[8:-1]), 'rb'), outfp)
+        else:
+            outfp.write(line)
+
+process(open(sys.argv[1], 'rb'), output)
+""")
+
+test.write('SConstruct', """\
+import atexit
+import SCons.Scanner
+
+SetOption('save_parsed', 1)
+
+searched = []
+def report():
+    print "searched %%d files" %% len(searched)
+atexit.register(report)
+
+class KScanner(SCons.Scanner.Classic):
+    def find_include_names_in(self, text):
+        searched.append(text)
+        return SCons.Scanner.Classic.find_include_names_in(self, text)
+
+kscan = KScanner('kfile', ['.k'], 'KPATH', r'^include\\s+(\\S+)$')
+
+env = Environment(KPATH = ['inc'])
+env.Append(SCANNERS = kscan)
+for i in range(10):
+    env.Command('f%%d' %% i, 'f%%d.k' %% i,
+                r'%(_python_)s build.py $SOURCES $TARGET')
+""" % locals())
+
+for i in range(10):
+    test.write('f%d.k' % i, "f%d.k\ninclude h%d.k\ninclude common.k\n" % (i, i))
+    test.write(['inc', 'h%d.k' % i], "h%d.k\ninclude nested.k\n" % i)
+test.write(['inc', 'common.k'], "common.k\n")
+test.write(['inc', 'nested.k'], "nested.k 1\n")
+
+def must_match_all(nested):
+    for i in range(10):
+        test.must_match('f%d' % i, "f%d.k\nh%d.k\n%scommon.k\n" % (i, i, nested))
+
+# 10 sources, 10 headers, common.k and nested.k.
+test.run(arguments = '-j4 .')
+test.must_contain_all_lines(test.stdout(), ["searched 22 files\n"])
+must_match_all("nested.k 1\n")
+
+test.run(arguments = '-j4 .')
+test.must_contain_all_lines(test.stdout(), ["searched 0 files\n"])
+test.must_contain_all_lines(test.stdout(), ["`.' is up to date.\n"])
+
+# A change to a file the sources only include indirectly is found.
+test.write(['inc', 'nested.k'], "nested.k 2\n")
+test.run(arguments = '-j4 .')
+test.must_contain_all_lines(test.stdout(), ["searched 1 files\n"])
+must_match_all("nested.k 2\n")
+
+# Serial and parallel builds agree on the dependencies.
+test.run(arguments = '-c .')
+test.run(arguments = '-j1 .')
+must_match_all("nested.k 2\n")
+test.run(arguments = '-j4 .')
+test.must_contain_all_lines(test.stdout(), ["`.' is up to date.\n"])
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that --jobs-backend=process builds targets with picklable Python
+function actions in worker processes, and everything else in the
+main SCons process.
+"""
+
+import os
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+try:
+    import multiprocessing
+except ImportError:
+    test.skip_test("No multiprocessing module; skipping test.\n")
+if not hasattr(os, 'fork'):
+    test.skip_test("No fork() on this system; skipping test.\n")
+
+test.subdir('site_scons')
+
+test.write(['site_scons', 'mybuild.py'], """\
+import os
+def write_pid(target, source, env):
+    f = open(str(target[0]), 'w')
+    f.write('%d\\n' % os.getpid())
+    f.close()
+def fail(target, source, env):
+    return 7
+""")
+
+test.write('SConstruct', """\
+import os
+import mybuild
+f = open('scons.pid', 'w')
+f.write('%d\\n' % os.getpid())
+f.close()
+def local_write_pid(target, source, env):
+    f = open(str(target[0]), 'w')
+    f.write('%d\\n' % os.getpid())
+    f.close()
+env = Environment()
+env.Command('shipped.out', [], mybuild.write_pid)
+env.Command('local.out', [], local_write_pid)
+env.Install('inst', 'file.in')
+env.Command('fail.out', [], mybuild.fail)
+""")
+
+test.write('file.in', "file.in\n")
+
+test.run(arguments = '-j 2 --jobs-backend=process -k .',
+         stderr = "scons: *** [fail.out] Error 7\n",
+         status = 2)
+
+scons_pid = test.read('scons.pid')
+test.fail_test(test.read('shipped.out') == scons_pid)
+test.must_match('local.out', scons_pid)
+test.must_match(['inst', 'file.in'], "file.in\n")
+test.must_not_exist('fail.out')
+
+test.run(arguments = '-c .')
+
+# The default backend builds everything in the main SCons process.
+test.run(arguments = '-j 2 shipped.out local.out')
+
+scons_pid = test.read('scons.pid')
+test.must_match('shipped.out', scons_pid)
+test.must_match('local.out', scons_pid)
+
+test.run(arguments = '--jobs-backend=foo .',
+         stderr = r".*Warning:  foo is not a valid jobs backend type.*",
+         status = 2,
+         match = TestSCons.match_re_dotall)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that --remote-exec sends commands, with their sources and
+implicit dependencies, to a worker started with --remote-worker, and
+that builds fall back to running commands locally when the worker
+can't be reached.
+"""
+
+import os
+import re
+import signal
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+if not hasattr(os, 'kill'):
+    test.skip_test("No os.kill() on this system; skipping test.\n")
+
+test.subdir('sub')
+
+test.write('build.py', r"""
+import os
+import sys
+out = open(sys.argv[1], 'w')
+for f in sys.argv[2:]:
+    out.write(open(f).read())
+out.write('cwd=%s\n' % os.getcwd())
+out.close()
+""")
+
+test.write('SConstruct', """
+env = Environment()
+env.Command('f1.out', ['f1.in', 'build.py'],
+            r'%(_python_)s build.py $TARGET ${SOURCES[0]} inc.h')
+env.Depends('f1.out', 'inc.h')
+env.Command('sub/f2.out', ['sub/f2.in', 'build.py'],
+            r'%(_python_)s build.py $TARGET ${SOURCES[0]}')
+env.Command('sub/f3.out', ['sub/f2.in', 'build.py'],
+            r'%(_python_)s ../build.py ${TARGET.file} ${SOURCES[0].file}',
+            chdir=1)
+env.Command('local.out', ['f1.in', 'build.py'],
+            r'%(_python_)s build.py $TARGET ${SOURCES[0]}',
+            REMOTE_EXEC=0)
+env.Command('fail.out', [], 'exit 3')
+""" % locals())
+
+test.write('f1.in', "f1.in\n")
+test.write(['sub', 'f2.in'], "sub/f2.in\n")
+test.write('inc.h', "inc.h\n")
+
+worker = test.start(arguments = '-j 2 --remote-worker=127.0.0.1:0')
+line = worker.stdout.readline()
+m = re.search(r'listening on ([\d.]+:\d+)', line)
+if not m:
+    os.kill(worker.pid, signal.SIGTERM)
+    worker.wait()
+    print "Unexpected worker output: %s" % repr(line)
+    test.fail_test()
+address = m.group(1)
+
+try:
+    test.run(arguments = '-j 4 -k --remote-exec=%s .' % address,
+             stderr = "scons: *** [fail.out] Error 3\n",
+             status = 2)
+finally:
+    os.kill(worker.pid, signal.SIGTERM)
+    worker.wait()
+
+def must_be_remote(file, contents, cwd=''):
+    remote_cwd = re.compile(r'cwd=.*scons-remote-[^/\\]*%s$' % cwd, re.M)
+    actual = test.read(file)
+    if not actual.startswith(contents) or not remote_cwd.search(actual):
+        print "Unexpected contents of %s:" % file
+        print actual
+        test.fail_test()
+
+must_be_remote('f1.out', "f1.in\ninc.h\ncwd=")
+must_be_remote(['sub', 'f2.out'], "sub/f2.in\ncwd=")
+# Outputs of chdir= actions land next to their sources, too.
+must_be_remote(['sub', 'f3.out'], "sub/f2.in\ncwd=", r'[/\\]sub')
+test.must_not_exist(['sub', 'sub', 'f3.out'])
+
+test.must_contain('local.out', "cwd=%s\n" % test.workpath())
+
+# With the worker gone, the commands run locally after a warning.
+
+test.run(arguments = '-c .')
+
+expect = r"""
+scons: warning: Could not use remote worker %s \(.*\); running commands locally.
+File "[^"]*", line \d+, in \S+
+scons: \*\*\* \[fail.out\] Error 3
+""" % re.escape(address)
+
+test.run(arguments = '-k --remote-exec=%s .' % address,
+         stderr = expect,
+         status = 2,
+         match = TestSCons.match_re_dotall)
+
+test.must_contain('f1.out', "cwd=%s\n" % test.workpath())
+test.must_contain(['sub', 'f2.out'], "cwd=%s\n" % test.workpath())
+
+test.run(arguments = '--remote-exec=nonsense .',
+         stderr = None,
+         status = 2)
+test.must_contain_all_lines(test.stderr(), ["Invalid remote worker address: nonsense"])
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that the --save-parsed option, and SetOption('save_parsed'),
+keep the include names found in a file in its .sconsign entry, so an
+unchanged file isn't searched again by the next build, and that
+nothing is kept without it.
+"""
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+test.write('build.py', r"""
+import sys
+open(sys.argv[1], 'wb').write(open(sys.argv[2], 'rb').read())
+""")
+
+test.write('SConstruct', """\
+import SCons.Scanner
+
+class KScanner(SCons.Scanner.Classic):
+    def find_include_names(self, node):
+        print "searching %%s" %% node
+        return SCons.Scanner.Classic.find_include_names(self, node)
+
+if ARGUMENTS.get('SAVE_PARSED'):
+    SetOption('save_parsed', 1)
+
+kscan = KScanner('kfile', ['.k'], 'KPATH', r'^include\\s+(\\S+)$')
+
+env = Environment(KPATH = ['.'])
+env.Append(SCANNERS = kscan)
+env.Command('foo', 'foo.k', r'%(_python_)s build.py $TARGET $SOURCE')
+""" % locals())
+
+test.write('foo.k', "include xxx.k\n")
+test.write('xxx.k', "xxx.k\n")
+
+# Without the option, every build searches the files again.
+test.run(arguments = '.')
+test.must_contain_all_lines(test.stdout(), ["searching foo.k\n"])
+
+test.run(arguments = '.')
+test.must_contain_all_lines(test.stdout(), ["searching foo.k\n"])
+
+test.run(arguments = '--save-parsed .')
+test.must_contain_all_lines(test.stdout(), ["searching foo.k\n"])
+
+test.run(arguments = '--save-parsed .')
+test.must_not_contain_any_line(test.stdout(), ["searching"])
+
+test.run(arguments = '-c .')
+test.run(arguments = 'SAVE_PARSED=1 .')
+test.must_not_contain_any_line(test.stdout(), ["searching"])
+
+# A file that changed is searched again.
+test.write('foo.k', "include yyy.k\n")
+test.write('yyy.k', "yyy.k\n")
+
+test.run(arguments = '--save-parsed .')
+test.must_contain_all_lines(test.stdout(), ["searching foo.k\n"])
+test.must_match('foo', "include yyy.k\n")
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that we build correctly using the --schedule option, and that
+--schedule=critical-path starts with the target that took the longest
+the last time it was built.
+"""
+
+import TestSCons
+
+test = TestSCons.TestSCons()
+
+test.write('SConstruct', """\
+import time
+def cat(env, source, target):
+    target = str(target[0])
+    if target == 'ccc.out':
+        time.sleep(1)
+    f = open(target, "wb")
+    for src in source:
+        f.write(open(str(src), "rb").read())
+    f.close()
+env = Environment(BUILDERS={'Cat':Builder(action=cat)})
+env.Cat('aaa.out', 'aaa.in')
+env.Cat('bbb.out', 'bbb.in')
+env.Cat('ccc.out', 'ccc.in')
+env.Cat('all', ['aaa.out', 'bbb.out', 'ccc.out'])
+""")
+
+test.write('aaa.in', "aaa.in\n")
+test.write('bbb.in', "bbb.in\n")
+test.write('ccc.in', "ccc.in\n")
+
+expect_dfs = """\
+cat(["aaa.out"], ["aaa.in"])
+cat(["bbb.out"], ["bbb.in"])
+cat(["ccc.out"], ["ccc.in"])
+cat(["all"], ["aaa.out", "bbb.out", "ccc.out"])
+"""
+
+# The quick aaa.out and bbb.out targets can come in either order.
+expect_critical_path = """\
+cat\\(\\["ccc.out"\\], \\["ccc.in"\\]\\)
+cat\\(\\["(aaa|bbb).out"\\], \\["(aaa|bbb).in"\\]\\)
+cat\\(\\["(aaa|bbb).out"\\], \\["(aaa|bbb).in"\\]\\)
+cat\\(\\["all"\\], \\["aaa.out", "bbb.out", "ccc.out"\\]\\)
+"""
+
+# Nothing's been built before, so there's nothing to go on.
+test.run(arguments = '-Q --schedule=critical-path .', stdout = expect_dfs)
+
+test.must_match('all', "aaa.in\nbbb.in\nccc.in\n")
+
+test.run(arguments = '-q --schedule=critical-path .')
+
+test.run(arguments = '-c .')
+
+test.run(arguments = '-Q --schedule=dfs .', stdout = expect_dfs)
+
+test.run(arguments = '-c .')
+
+test.run(arguments = '-Q --schedule=critical-path .',
+         stdout = expect_critical_path,
+         match = TestSCons.match_re)
+
+test.must_match('all', "aaa.in\nbbb.in\nccc.in\n")
+
+test.run(arguments = '-c .')
+
+test.write('SConstruct', """\
+SetOption('schedule', 'critical-path')
+""" + test.read('SConstruct'))
+
+test.run(arguments = '-Q .',
+         stdout = expect_critical_path,
+         match = TestSCons.match_re)
+
+test.run(arguments = '--schedule=foo .',
+         stderr = r".*Warning:  foo is not a valid schedule type.*",
+         status = 2,
+         match = TestSCons.match_re_dotall)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -22,19 +22,95 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
+"""
+Test the -l (--load-average, --max-load) and --min-free-memory options,
+which keep parallel builds from starting new jobs on a busy system.
+"""
+
 __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
+import sys
+
+import TestCmd
 import TestSCons
 
+_python_ = TestSCons._python_
+
+try:
+    import threading
+except ImportError:
+    # if threads are not supported, then
+    # there is nothing to test
+    TestCmd.no_result()
+    sys.exit()
+
+
 test = TestSCons.TestSCons()
 
-test.write('SConstruct', "")
+test.write('build.py', r"""
+import time
+import sys
+file = open(sys.argv[1], 'wb')
+file.write(str(time.time()) + '\n')
+time.sleep(1)
+file.write(str(time.time()))
+file.close()
+""")
+
+# Fake the system's load average and available memory so the test
+# doesn't depend on what else is running.
+test.write('SConstruct', """
+import SCons.Job
+SCons.Job.load_average = lambda: 4.0
+SCons.Job.meminfo_file = 'meminfo'
+MyBuild = Builder(action = r'%(_python_)s build.py $TARGETS')
+env = Environment(BUILDERS = { 'MyBuild' : MyBuild })
+env.MyBuild(target = 'f1', source = 'f1.in')
+env.MyBuild(target = 'f2', source = 'f2.in')
+""" % locals())
+
+test.write('meminfo', """\
+MemTotal:        8000000 kB
+MemFree:         1000000 kB
+MemAvailable:    2048000 kB
+""")
+
+def RunTest(args, extra):
+    """extra is used to make scons rebuild the output file"""
+    test.write('f1.in', 'f1.in'+extra)
+    test.write('f2.in', 'f2.in'+extra)
+
+    test.run(arguments = args)
+
+    str = test.read("f1")
+    start1,finish1 = list(map(float, str.split("\n")))
+
+    str = test.read("f2")
+    start2,finish2 = list(map(float, str.split("\n")))
+
+    return start2, finish1
+
+# The load is below the limit, so the jobs run in parallel.
+start2, finish1 = RunTest('-j 2 -l 8 f1 f2', "first")
+test.fail_test(not (start2 < finish1))
+
+# The load is above the limit, so the second job waits for the first.
+start2, finish1 = RunTest('-j 2 -l 2 f1 f2', "second")
+test.fail_test(start2 < finish1)
+
+start2, finish1 = RunTest('-j 2 --load-average=2 f1 f2', "third")
+test.fail_test(start2 < finish1)
 
-test.option_not_yet_implemented('-l', '1 .')
+start2, finish1 = RunTest('-j 2 --max-load=2.5 f1 f2', "fourth")
+test.fail_test(start2 < finish1)
 
-test.option_not_yet_implemented('--load-average', '=1 .')
+# There's enough memory available.
+start2, finish1 = RunTest('-j 2 --min-free-memory=1000 f1 f2', "fifth")
+test.fail_test(not (start2 < finish1))
 
-test.option_not_yet_implemented('--max-load', '=1 .')
+# There isn't enough memory available.
+start2, finish1 = RunTest('-j 2 --min-free-memory=3000 f1 f2', "sixth")
+test.fail_test(start2 < finish1)
 
 test.pass_test()
 
@@ -155,6 +155,9 @@ outside of the 15%% tolerance.
 
 if failures or warnings:
     print '\n'.join([test.stdout()] + failures + warnings)
+if re.search('dispatch latency', test.stdout()):
+    failures.append("SCons -j1 reported a job dispatch latency.\n")
+
 if failures:
     test.fail_test(1)
 
@@ -182,6 +185,14 @@ command_time    = get_command_time(stdout)
 
 failures = []
 
+for kind in ['Average', 'Maximum']:
+    latency = num(stdout, kind + r' job dispatch latency: (\d+\.\d+) seconds')
+    if latency > 1.0:
+        failures.append("""\
+SCons -j4 reported %(kind)s job dispatch latency of %(latency)s,
+more than the 1 second each command sleeps.
+""" % locals())
+
 added_times = sconscript_time+scons_time+command_time
 if not within_tolerance(total_time, added_times, 0.01):
     failures.append("""\
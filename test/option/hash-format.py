@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+"""
+Verify that --hash-format and SetOption('hash_format') change the
+algorithm used for content signatures, and that .sconsign information
+and CacheDir() files for different formats are kept apart.
+"""
+
+import os
+
+import TestSCons
+
+_python_ = TestSCons._python_
+
+test = TestSCons.TestSCons()
+
+test.write('build.py', r"""
+import sys
+contents = open(sys.argv[2], 'rb').read()
+file = open(sys.argv[1], 'wb')
+file.write(contents)
+file.close()
+""")
+
+test.write('SConstruct', """
+if ARGUMENTS.get('hash'):
+    SetOption('hash_format', ARGUMENTS['hash'])
+CacheDir('cache')
+B = Builder(action = r'%(_python_)s build.py $TARGETS $SOURCES')
+env = Environment(BUILDERS = { 'B' : B })
+env.B(target = 'f1.out', source = 'f1.in')
+""" % locals())
+
+test.write('f1.in', "f1.in\n")
+
+built = test.wrap_stdout("%(_python_)s build.py f1.out f1.in\n" % locals())
+retrieved = test.wrap_stdout("Retrieved `f1.out' from cache\n")
+
+def cached(dir):
+    result = []
+    for subdir in os.listdir(dir):
+        if len(subdir) == 1:
+            result.extend(os.listdir(os.path.join(dir, subdir)))
+    return result
+
+test.run(arguments = '.', stdout = built)
+test.must_exist('.sconsign.dblite')
+test.must_not_exist('.sconsign_sha1.dblite')
+sigs = cached(test.workpath('cache'))
+test.fail_test(len(sigs) != 1 or len(sigs[0]) != 32)
+
+# A different format gets its own .sconsign and cache files, so the
+# target is out of date the first time, and up to date after that.
+test.run(arguments = '--hash-format=sha1 .', stdout = built)
+test.must_exist('.sconsign_sha1.dblite')
+sigs = cached(test.workpath('cache', 'sha1'))
+test.fail_test(len(sigs) != 1 or len(sigs[0]) != 40)
+
+test.up_to_date(options = '--hash-format=sha1', arguments = '.')
+
+# The original format's information wasn't touched.
+test.up_to_date(arguments = '.')
+
+# SetOption() works, too, and the files come back from the
+# format's own cache.
+test.run(arguments = '-c .')
+test.run(arguments = 'hash=sha1 .', stdout = retrieved)
+test.up_to_date(options = '--hash-format=sha1', arguments = '.')
+
+test.run(arguments = '--hash-format=no-such-hash .',
+         stderr = None,
+         status = 2)
+test.must_contain_all_lines(test.stderr(),
+                            ["unsupported hash format: no-such-hash"])
+
+test.run(arguments = 'hash=no-such-hash .',
+         stderr = None,
+         status = 2)
+test.must_contain_all_lines(test.stderr(),
+                            ["unsupported hash format: no-such-hash"])
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,53 @@
+#
+# __COPYRIGHT__
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+"""
+This configuration times reading a lot of SConscript files.
+
+We create $SCONSCRIPT_COUNT subdirectories, each with a SConscript
+file that clones the exported construction environment and sets up
+ten Command() targets in it.  The SConstruct reads them all with a
+single SConscript() call.
+"""
+
+import TestSCons
+
+test = TestSCons.TimeSCons(variables={'SCONSCRIPT_COUNT':1200})
+
+sconscript = """\
+Import('env')
+e = env.Clone(CPPDEFINES = ['D%(d)04d'])
+for t in range(10):
+    e.Command('target_%%d' %% t, 'source_%%d' %% t, Copy('$TARGET', '$SOURCE'))
+"""
+
+for d in range(test.variables['SCONSCRIPT_COUNT']):
+    dir = 'dir_%04d' % d
+    test.subdir(dir)
+    test.write([dir, 'SConscript'], sconscript % locals())
+    for t in range(10):
+        test.write([dir, 'source_%d' % t], 'contents\n')
+
+test.main()
+
+test.pass_test()